@@ -1,27 +1,43 @@
 from firebase_admin import auth
 from fastapi import Depends, HTTPException
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from api.database import db
+from api.database import db, database_backend
 from api.utils.logger import get_logger
 from api.constraints import config
-import json
+import hashlib
+import time
+from api.database.cache import TTLCache
 from api.database.firebase import get_credentials
-import os
 
 logger = get_logger(__name__)
 
 security_bearer = HTTPBearer()
 DEFAULT_USER = config.get("APISettings", {}).get("test_user", "")
+# Tolerância de relógio da verificação permissiva (24 horas)
+CLOCK_SKEW_SECONDS = 86400
 
-# Obter o project_id do firebase.json para validação
-try:
-    
-    firebase_config = get_credentials()
+# Obter o project_id do firebase.json para validação (uma única vez, no startup)
+EXPECTED_PROJECT_ID = None
+if database_backend == "firebase":
+    try:
+        EXPECTED_PROJECT_ID = get_credentials().get('project_id')
+    except Exception as e:
+        logger.error(f"Erro ao carregar firebase.json: {e}")
+
+# Tokens já verificados: sha256 do token -> uid, válidos até o `exp` de cada token
+verified_tokens: TTLCache[str] = TTLCache(
+    max_size=config.get("APISettings", {}).get("token_cache_size", 4096),
+    ttl=0
+)
+
+def token_key(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
 
-    EXPECTED_PROJECT_ID = firebase_config.get('project_id')
-except Exception as e:
-    logger.error(f"Erro ao carregar firebase.json: {e}")
-    EXPECTED_PROJECT_ID = None
+def remember_token(token: str, decoded_token: dict, skew: int = 0) -> None:
+    """Guarda o uid do token verificado até ele expirar (considerando a tolerância usada)."""
+    expires_in = decoded_token.get('exp', 0) + skew - time.time()
+    if expires_in > 0:
+        verified_tokens.put(token_key(token), decoded_token['uid'], ttl=expires_in)
 
 def _verify_token_core(token: str) -> str:
     """
@@ -36,7 +52,7 @@ def _verify_token_core(token: str) -> str:
     Raises:
         HTTPException: Se o token for inválido
     """
-    if config.get("Database", {}).get("local", True):
+    if database_backend != "firebase":
         # Modo local
         if not db.verify_user(token):
             logger.warning(f"Usuário não verificado: {token}")
@@ -47,14 +63,9 @@ def _verify_token_core(token: str) -> str:
         if token == DEFAULT_USER:
             return token
 
-        try:
-            
-            firebase_config = get_credentials()
-            EXPECTED_PROJECT_ID = firebase_config.get('project_id')
-                        
-        except Exception as e:
-            logger.error(f"Erro ao carregar config do Firebase da variável de ambiente: {e}")
-            EXPECTED_PROJECT_ID = None
+        # Token já verificado e ainda não expirado: sem nova verificação de assinatura
+        if (uid := verified_tokens.get(token_key(token))) is not None:
+            return uid
             
         try:
             # Primeiro, tentar com verificação padrão
@@ -65,12 +76,13 @@ def _verify_token_core(token: str) -> str:
                 logger.warning(f"Token de projeto Firebase incorreto. Esperado: {EXPECTED_PROJECT_ID}, Recebido: {decoded_token.get('aud')}")
                 raise HTTPException(status_code=401, detail="Unauthorized - Invalid Firebase project")
             
+            remember_token(token, decoded_token)
             return decoded_token['uid']
         except auth.InvalidIdTokenError as e:
             # Se falhar por questões de tempo, tentar novamente sem verificação de tempo
             try:
                 logger.info(f"Token com problema de tempo, tentando verificação permissiva: {e}")
-                decoded_token = auth.verify_id_token(token, check_revoked=False, clock_skew_seconds=86400)  # 24 horas de tolerância
+                decoded_token = auth.verify_id_token(token, check_revoked=False, clock_skew_seconds=CLOCK_SKEW_SECONDS)
                 
                 # Verificar se o token pertence ao nosso projeto Firebase
                 if EXPECTED_PROJECT_ID and decoded_token.get('aud') != EXPECTED_PROJECT_ID:
@@ -78,6 +90,7 @@ def _verify_token_core(token: str) -> str:
                     raise HTTPException(status_code=401, detail="Unauthorized - Invalid Firebase project")
                 
                 logger.info(f"Token aceito com verificação permissiva para UID: {decoded_token['uid']}")
+                remember_token(token, decoded_token, CLOCK_SKEW_SECONDS)
                 return decoded_token['uid']
             except Exception as inner_e:
                 logger.warning(f"Token Firebase inválido mesmo com verificação permissiva: {inner_e}")
@@ -97,7 +110,7 @@ def verify_token_firebase(credentials: HTTPAuthorizationCredentials = Depends(se
     token = credentials.credentials
     return _verify_token_core(token)
 
-verify_token = verify_token_local if config.get("Database", {}).get("local", True) else verify_token_firebase
+verify_token = verify_token_local if database_backend != "firebase" else verify_token_firebase
 
 def verify_token_string(token: str) -> str:
     """
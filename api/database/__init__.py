@@ -1,6 +1,6 @@
 from api.constraints import config
 from api.utils.logger import get_logger
-from api.database.interface import DatabaseInterface
+from api.database.interface import DatabaseInterface, AsyncDatabaseInterface
 import traceback
 
 logger = get_logger("api.database")
@@ -12,21 +12,47 @@ def get_local_database():
     logger.info("Local database initialized successfully.")
     return database
 
+def get_sqlite_database():
+    logger.info("Using SQLite database configuration.")
+    from api.database.sqlite import SQLiteDatabase
+    database = SQLiteDatabase()
+    logger.info("SQLite database initialized successfully.")
+    return database
+
+# backend: local | sqlite | firebase (sem a chave, vale o antigo `local = true/false`)
+database_backend = config.get("Database", {}).get(
+    "backend",
+    "local" if config.get("Database", {}).get("local", True) else "firebase"
+)
+
 db : DatabaseInterface
+# Versão assíncrona usada pelas rotas (as threads de pré-geração continuam no `db`)
+adb : AsyncDatabaseInterface
+
+def get_async_database(database: DatabaseInterface) -> AsyncDatabaseInterface:
+    from api.database.threaded import ThreadedDatabase
+    return ThreadedDatabase(database)
 
 try:
-    if config.get("Database",{}).get("local", True):
+    if database_backend == "local":
         db = get_local_database()
+        adb = get_async_database(db)
+    elif database_backend == "sqlite":
+        db = get_sqlite_database()
+        adb = get_async_database(db)
     else:
         logger.info("Using Firebase database configuration.")
         try:
             from api.database.firebase import FirebaseDB
+            from api.database.firebase_async import AsyncFirebaseDB
             db = FirebaseDB()
+            adb = AsyncFirebaseDB(db)
             logger.info("Firebase database initialized successfully.")
         except:
             logger.error("Failed to import Firebase database module. Trying local database.")
             logger.error(traceback.format_exc())
             db = get_local_database()
+            adb = get_async_database(db)
             
 except Exception as e:
     logger.error(f"An error occurred while initializing the database: {e}")        
@@ -0,0 +1,32 @@
+import hashlib
+import re
+from datetime import datetime
+from typing import NamedTuple, Optional
+
+# Arquivos endereçados por conteúdo ficam sob um prefixo "cas/", com o sha256 no nome
+CAS_PATTERN = re.compile(r"cas/(?:[0-9a-f]{2}/)?([0-9a-f]{64})")
+
+def content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+def content_key(path_or_url: Optional[str]) -> Optional[str]:
+    """Extrai o hash de um caminho/URL endereçado por conteúdo (None para os demais)."""
+    if not path_or_url:
+        return None
+    match = CAS_PATTERN.search(path_or_url)
+    return match.group(1) if match else None
+
+def item_archives(item: dict) -> list[str]:
+    """Caminhos/URLs de arquivos referenciados por uma mensagem ou submissão."""
+    return [item[field] for field in ("image", "audio") if item.get(field)]
+
+def referenced_keys(item: dict) -> list[str]:
+    """Hashes dos arquivos referenciados por uma mensagem ou submissão."""
+    keys = [content_key(ref) for ref in item_archives(item)]
+    return [key for key in keys if key]
+
+class ArchiveInfo(NamedTuple):
+    """Arquivo armazenado: caminho local ou URL pública, tamanho em bytes e última modificação."""
+    ref: str
+    size: int
+    updated: datetime
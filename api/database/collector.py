@@ -0,0 +1,94 @@
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from pydantic import BaseModel
+
+from api.constraints import config
+from api.database.interface import DatabaseInterface
+from api.utils.logger import get_logger
+
+logger = get_logger(__name__)
+gc_configs = config.get("ArchiveGC", {})
+
+class CollectionReport(BaseModel):
+    """Resultado de uma execução da coleta de arquivos."""
+    scanned: int = 0
+    retired: int = 0
+    bytes_reclaimed: int = 0
+    action: str = "delete"
+    duration: float = 0.0
+
+def normalize_ref(ref: str) -> str:
+    # Caminhos locais podem ter sido gravados como "./temp/..." ou "temp/..."
+    return ref if ref.startswith(("http://", "https://")) else os.path.normpath(ref)
+
+class ArchiveCollector:
+    """
+    Coleta de lixo dos arquivos gerados e enviados.
+
+    Marca todos os arquivos referenciados por mensagens, submissões e mensagens
+    pendentes e depois percorre o armazenamento em lotes, removendo (ou movendo
+    para o armazenamento frio) os que não são referenciados e já passaram do
+    período de retenção. Entre os lotes a thread dorme, para não competir com a API.
+    """
+
+    def __init__(self, database: DatabaseInterface) -> None:
+        self.database = database
+        self.retention = timedelta(days=gc_configs.get("retention_days", 7))
+        self.cold = gc_configs.get("action", "cold") == "cold"
+        self.batch_size = gc_configs.get("batch_size", 100)
+        self.pause = gc_configs.get("pause_seconds", 0.5)
+        self.stopped = threading.Event()
+        self.thread: Optional[threading.Thread] = None
+        self.last_report: Optional[CollectionReport] = None
+
+    def run_once(self) -> CollectionReport:
+        start_time = time.time()
+        report = CollectionReport(action="cold" if self.cold else "delete")
+        referenced = {normalize_ref(ref) for ref in self.database.archive_references()}
+        # Arquivos recentes podem pertencer a uma geração ainda em andamento
+        cutoff = datetime.now(tz=timezone.utc) - self.retention
+
+        for archive in self.database.list_archives():
+            if self.stopped.is_set():
+                break
+            report.scanned += 1
+            if report.scanned % self.batch_size == 0:
+                time.sleep(self.pause)
+            if archive.updated > cutoff or normalize_ref(archive.ref) in referenced:
+                continue
+            try:
+                self.database.retire_archive(archive, self.cold)
+            except Exception as e:
+                logger.warning(f"Não foi possível coletar o arquivo {archive.ref}: {e}")
+                continue
+            report.retired += 1
+            report.bytes_reclaimed += archive.size
+
+        report.duration = time.time() - start_time
+        self.last_report = report
+        logger.info(
+            f"Coleta de arquivos concluída em {report.duration:.2f} segundos: "
+            f"{report.retired}/{report.scanned} arquivos ({report.action}), {report.bytes_reclaimed} bytes liberados"
+        )
+        return report
+
+    def run(self, interval: float) -> None:
+        while not self.stopped.is_set():
+            try:
+                self.run_once()
+            except Exception as e:
+                logger.error(f"Erro durante a coleta de arquivos: {e}")
+            self.stopped.wait(interval)
+
+    def start(self) -> None:
+        interval = gc_configs.get("interval_hours", 24) * 3600
+        self.thread = threading.Thread(target=self.run, args=(interval,), name="archive-collector", daemon=True)
+        self.thread.start()
+        logger.info(f"Coleta de arquivos agendada a cada {interval / 3600:.1f} horas")
+
+    def stop(self) -> None:
+        self.stopped.set()
@@ -0,0 +1,38 @@
+from typing import Optional
+
+# Contexto de geração de um chat, mantido incrementalmente pelos bancos:
+# {"history": str, "painted_items": str, "last_image": str, "last_index": int}
+
+def build_context(messages: list[dict]) -> Optional[dict]:
+    """Reconstrói o contexto a partir de todas as mensagens (usado só uma vez por chat)."""
+    if not messages:
+        return None
+
+    ordered = sorted(messages, key=lambda x: x['message_index'])
+    return {
+        "history": "\n".join(item["text_voice"] for item in ordered),
+        "painted_items": ", ".join(item["paint_image"] for item in ordered),
+        "last_image": ordered[-1]["image"],
+        "last_index": ordered[-1]["message_index"],
+    }
+
+def append_context(context: Optional[dict], message: dict) -> Optional[dict]:
+    """
+    Acrescenta uma mensagem ao contexto sem revisitar o histórico.
+
+    Retorna None quando a mensagem chega fora de ordem ou depois de uma
+    lacuna (uma mensagem gravada no chat que nunca chegou ao contexto),
+    indicando que o contexto precisa ser reconstruído com build_context.
+    """
+    if context is None:
+        return build_context([message])
+
+    if not context["last_index"] <= message["message_index"] <= context["last_index"] + 1:
+        return None
+
+    return {
+        "history": context["history"] + "\n" + message["text_voice"],
+        "painted_items": context["painted_items"] + ", " + message["paint_image"],
+        "last_image": message["image"],
+        "last_index": message["message_index"],
+    }
@@ -0,0 +1,88 @@
+import asyncio
+import functools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, TypeVar
+
+from api.constraints import config
+from api.utils.logger import get_logger
+
+logger = get_logger(__name__)
+database_configs = config.get("Database", {})
+
+T = TypeVar("T")
+
+class DatabaseExecutor:
+    """
+    Pool de threads limitado para as chamadas bloqueantes ao banco.
+
+    As rotas aguardam `run` em vez de chamar o banco síncrono diretamente,
+    então o disco, o SQLite e as idas à rede do Firestore nunca seguram o
+    loop de eventos. Com um pool próprio, o banco não disputa threads com o
+    resto da aplicação (geração de áudio, pré-geração). A fila é medida:
+    profundidade atual e máxima e o tempo de espera por uma thread mostram
+    quando o pool está pequeno para a carga.
+    """
+
+    def __init__(self, max_workers: int = 16) -> None:
+        self.max_workers = max_workers
+        self.pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="database")
+        self.lock = threading.Lock()
+        self.queued = 0
+        self.active = 0
+        self.completed = 0
+        self.max_queued = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    async def run(self, func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        """Executa `func` no pool e aguarda o resultado sem bloquear o loop."""
+        submitted = time.monotonic()
+        with self.lock:
+            self.queued += 1
+            self.max_queued = max(self.max_queued, self.queued)
+
+        def _call() -> T:
+            waited = time.monotonic() - submitted
+            with self.lock:
+                self.queued -= 1
+                self.active += 1
+                self.total_wait += waited
+                self.max_wait = max(self.max_wait, waited)
+            try:
+                return func(*args, **kwargs)
+            finally:
+                with self.lock:
+                    self.active -= 1
+                    self.completed += 1
+
+        future = self.pool.submit(_call)
+        # Cancelada antes de começar: `_call` nunca roda, então sai da fila aqui
+        future.add_done_callback(lambda done: done.cancelled() and self.dequeue())
+        return await asyncio.wrap_future(future)
+
+    def dequeue(self) -> None:
+        with self.lock:
+            self.queued -= 1
+
+    def stats(self) -> dict[str, Any]:
+        with self.lock:
+            return {
+                "workers": self.max_workers,
+                "queued": self.queued,
+                "active": self.active,
+                "completed": self.completed,
+                "max_queued": self.max_queued,
+                "avg_wait_ms": round(self.total_wait / self.completed * 1000, 2) if self.completed else 0.0,
+                "max_wait_ms": round(self.max_wait * 1000, 2),
+            }
+
+    def shutdown(self) -> None:
+        logger.info(f"Pool de threads do banco: {self.stats()}")
+        self.pool.shutdown(wait=True)
+
+@functools.lru_cache(maxsize=None)
+def get_database_executor() -> DatabaseExecutor:
+    """Pool compartilhado pelas versões assíncronas do banco (criado no primeiro uso)."""
+    return DatabaseExecutor(database_configs.get("database_workers", 16))
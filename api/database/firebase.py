@@ -1,14 +1,24 @@
 import firebase_admin
 from firebase_admin import credentials, firestore, storage  # type:ignore
+from google.api_core.exceptions import NotFound
 from fastapi import HTTPException, UploadFile
 import uuid
 import os
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import datetime, timezone
 import json
-from typing import Optional, Any, Dict, cast
+import mimetypes
+from urllib.parse import unquote
+from typing import Optional, Any, Dict, Iterable, Iterator, cast
 from api.database.interface import DatabaseInterface
+from api.database.context import build_context, append_context
+from api.database.cache import TTLCache
+from api.database.listeners import HotChatCache
+from api.database.pending import get_pending_store
+from api.database.pagination import CHATS_PAGE_SIZE, MINI_CHAT_FIELDS, decode_cursor, make_page
+from api.database.archives import ArchiveInfo, content_hash, content_key, item_archives, referenced_keys
 from api.schemas.users import User, CreateUser, UserDB
-from api.schemas.messages import Chat, ChatItems, MiniChatBase, MiniChat, SubmitImageMessage, Message
+from api.schemas.messages import Chat, ChatItems, ChatPage, MiniChatBase, MiniChat, SubmitImageMessage, Message
 from api.utils import get_mime_extension, generate_filename
 from api.utils.logger import get_logger
 from api.constraints import config
@@ -36,6 +46,105 @@ def get_credentials() -> dict:
 
 # Obter usuário de teste do config
 TEST_USER = config.get("APISettings", {}).get("test_user", "")
+database_configs = config.get("Database", {})
+
+def user_chats_query(client: Any, user_id: str, limit: Optional[int], cursor: Optional[str]) -> Any:
+    """
+    Consulta paginada dos chats do usuário, igual para o cliente síncrono e o assíncrono.
+
+    Ordenada no servidor por (last_update, chat_id) decrescente, o que exige o
+    índice composto user_id ASC, last_update DESC, chat_id DESC, definido em
+    firestore.indexes.json (ver o deploy no README).
+    """
+    query = (client.collection('chats')
+             .where('user_id', '==', user_id)
+             .order_by('last_update', direction=firestore.Query.DESCENDING)
+             .order_by('chat_id', direction=firestore.Query.DESCENDING)
+             .select(MINI_CHAT_FIELDS))
+    if cursor is not None:
+        last_update, chat_id = decode_cursor(cursor)
+        query = query.start_after({'last_update': last_update, 'chat_id': chat_id})
+    if limit is not None:
+        # Um chat a mais indica se existe próxima página
+        query = query.limit(limit + 1)
+    return query
+
+# Consultas, batches e mapeamentos compartilhados pelo FirebaseDB e pelo AsyncFirebaseDB:
+# os dois clientes do Firestore têm a mesma API, só a execução (síncrona ou await) muda
+
+def chat_messages_query(client: Any, chat_id: str) -> Any:
+    return client.collection('messages').where('chat_id', '==', chat_id)
+
+def chat_submits_query(client: Any, chat_id: str) -> Any:
+    # Só as submissões corretas fazem parte do chat
+    return (client.collection('submits')
+            .where('chat_id', '==', chat_id)
+            .where('data.is_correct', '==', True))
+
+def owned_chat(chat_data: dict, user_id: str) -> MiniChat:
+    if chat_data.get('user_id') != user_id:
+        raise HTTPException(status_code=403, detail="Unauthorized access")
+    return MiniChat(**chat_data)
+
+def build_chat(chat: MiniChat, messages: Iterable[dict], submits: Iterable[dict]) -> Chat:
+    """Monta o Chat com as mensagens e submissões em ordem."""
+    return Chat(
+        messages=sorted((Message(**item) for item in messages), key=lambda x: x.message_index),
+        subimits=sorted((SubmitImageMessage(**item) for item in submits), key=lambda x: x.message_index),
+        **chat.model_dump()
+    )
+
+def chat_from_hot(hot: dict, user_id: str) -> Chat:
+    """Monta o Chat a partir da cópia mantida pelos snapshot listeners."""
+    return build_chat(owned_chat(hot["chat"], user_id), hot["messages"], hot["submits"])
+
+def chat_items_from_context(context: Optional[dict]) -> ChatItems:
+    if context is None:
+        raise ValueError("Chat has no messages")
+    return ChatItems(**context)
+
+def new_user(user_data: CreateUser, user_id: str, existing: Optional[dict]) -> tuple[UserDB, bool]:
+    """Usuário retornado pelo create_user e se ele ainda precisa ser gravado."""
+    if existing is not None:
+        # Usuário já existe, retorna o existente
+        return UserDB(user_id=user_id, name=existing.get('name', user_data.name)), False
+    return UserDB(user_id=user_id, name=user_data.name), True
+
+def user_with_chats(user_data: Optional[dict], page: ChatPage) -> User:
+    if user_data is None:
+        raise ValueError("User not found")
+    return User(**user_data, chats=page.chats, next_cursor=page.next_cursor)
+
+def chat_item_document(chat_id: str, item: SubmitImageMessage | Message) -> tuple[str, dict, str]:
+    """ID do novo documento, o item serializado e o novo last_update do chat."""
+    item_json = item.model_dump()
+    item_json["chat_id"] = chat_id
+    return str(uuid.uuid4()), item_json, datetime.now(tz=timezone.utc).isoformat()
+
+def chat_update_writes(writes: Any, client: Any, chat_ref: Any, target: str, message_id: str, item_json: dict,
+                       last_update: str, context: Optional[dict] = None) -> None:
+    """Escritas do update_chat em um batch ou transação; com `context`, também o contexto do chat."""
+    # update falha se o chat tiver sido removido, descartando todas as escritas
+    writes.update(chat_ref, {'last_update': last_update})
+    writes.set(client.collection(target).document(message_id), item_json)
+    for key in referenced_keys(item_json):
+        writes.set(client.collection('archive_refs').document(key), {'refs': firestore.Increment(1)}, merge=True)
+    if context is not None:
+        writes.set(client.collection('chat_contexts').document(chat_ref.id), context)
+
+def chat_update_batch(client: Any, chat_ref: Any, target: str, message_id: str, item_json: dict, last_update: str) -> Any:
+    """Escrita de uma submissão em um único batch (uma ida ao Firestore, sem leituras)."""
+    batch = client.batch()
+    chat_update_writes(batch, client, chat_ref, target, message_id, item_json, last_update)
+    return batch
+
+def appended_context(snapshot: Any, item_json: dict) -> Optional[dict]:
+    """Contexto com a mensagem nova, ou None se precisar ser reconstruído (sem contexto, fora de ordem ou com lacuna)."""
+    return append_context(snapshot.to_dict(), item_json) if snapshot.exists else None
+
+def rebuilt_context(messages: list[dict], item_json: dict) -> dict:
+    # A mensagem nova só é gravada no commit: entra junto com as já gravadas
+    return cast(dict, build_context(messages + [item_json]))
 
 
 
@@ -56,95 +165,282 @@ class FirebaseDB(DatabaseInterface):
             self.db = firestore.client()
             self.bucket = storage.bucket()
             self.temp_chat_ids: Dict[str, str] = {}
-            # Armazena mensagens pré-geradas (pending) em memória, similar ao LocalDatabase
-            # Estrutura: { chat_id: Message.dict() }
-            self.pending_messages: Dict[str, dict] = {}
+            # Mensagens pré-geradas (pending), por padrão na coleção pending_messages
+            self.pending = get_pending_store('firestore', firestore_client=self.db)
+            self.content_addressed = database_configs.get('content_addressed', False)
+            # Pool para leituras concorrentes ao Firestore (ex: get_chat)
+            self.read_pool = ThreadPoolExecutor(
+                max_workers=database_configs.get('firestore_read_workers', 16),
+                thread_name_prefix="firestore-read"
+            )
+            # Uploads para o Cloud Storage em um pool limitado
+            self.upload_pool = ThreadPoolExecutor(
+                max_workers=database_configs.get('storage_upload_workers', 8),
+                thread_name_prefix="storage-upload"
+            )
+            # Os nomes dos arquivos são únicos (uuid ou hash), então podem ficar em cache indefinidamente
+            self.cache_control = database_configs.get('storage_cache_control', "public, max-age=31536000, immutable")
+            self.public_per_object = not self.bucket_is_public()
+            # Caches read-through dos documentos de usuário e de chat (posse e metadados)
+            cache_size = database_configs.get('cache_size', 1024)
+            cache_ttl = database_configs.get('cache_ttl', 300)
+            self.user_cache: TTLCache[dict] = TTLCache(cache_size, cache_ttl)
+            self.chat_cache: TTLCache[dict] = TTLCache(cache_size, cache_ttl)
+            # Chats ativos mantidos em memória por snapshot listeners (opcional)
+            self.hot_chats: Optional[HotChatCache] = None
+            if database_configs.get('hot_chats', False):
+                self.hot_chats = HotChatCache(
+                    self.db,
+                    idle_minutes=database_configs.get('hot_chat_minutes', 15),
+                    max_bytes=database_configs.get('hot_chats_memory_mb', 64) * 1024 * 1024,
+                    sweep_seconds=database_configs.get('hot_chats_sweep_seconds')
+                )
 
         except Exception as e:
             logger.error(f"Erro ao inicializar o Firebase: {e}")
             raise HTTPException(
                 status_code=500, detail="Não foi possível conectar ao Firebase.")
 
+    def close(self) -> None:
+        logger.info(f"Cache do Firestore: {self.cache_stats()}")
+        logger.info(f"Mensagens pré-geradas: {self.pending.stats()}")
+        if self.hot_chats is not None:
+            logger.info(f"Chats ativos: {self.hot_chats.stats()}")
+            self.hot_chats.close()
+        self.read_pool.shutdown(wait=False)
+        # Aguarda uploads e ACLs pendentes
+        self.upload_pool.shutdown(wait=True)
+
+    def cache_stats(self) -> dict[str, dict]:
+        return {'users': self.user_cache.stats(), 'chats': self.chat_cache.stats()}
+
+    def stats(self) -> dict[str, Any]:
+        stats = {'cache': self.cache_stats(), 'pending': self.pending.stats()}
+        if self.hot_chats is not None:
+            stats['hot_chats'] = self.hot_chats.stats()
+        return stats
+
     # --- Pending Message Helpers (para pre-generation) ---
     def set_pending_message(self, chat_id: str, message: Any) -> None:
-        """Salva/atualiza mensagem pré-gerada em memória."""
-        self.pending_messages[chat_id] = message
+        """Salva/atualiza a mensagem pré-gerada do chat."""
+        self.pending.set(chat_id, message)
 
     def pop_pending_message(self, chat_id: str) -> Optional[Any]:
         """Retorna e remove a mensagem pré-gerada do chat, se existir."""
-        return self.pending_messages.pop(chat_id, None)
+        return self.pending.pop(chat_id)
 
     # --- User Functions ---
 
+    # Estado compartilhado com o AsyncFirebaseDB (caches, IDs reservados, chats acompanhados)
+
+    def remember_user(self, user_id: str, user_doc: Any) -> Optional[dict]:
+        """Guarda no cache o documento de usuário lido (None se não existir)."""
+        if not user_doc.exists:
+            return None
+        user_data = user_doc.to_dict() or {}
+        self.user_cache.put(user_id, user_data)
+        return user_data
+
+    def user_created(self, user: UserDB) -> None:
+        self.user_cache.put(user.user_id, user.model_dump())
+        logger.info(f"Usuário criado no Firestore com ID: {user.user_id}")
+
+    def remember_chat(self, chat_id: str, chat_doc: Any) -> dict:
+        """Guarda no cache o documento do chat lido (404 se não existir)."""
+        if not chat_doc.exists:
+            raise HTTPException(status_code=404, detail="Chat not found")
+        chat_data = chat_doc.to_dict() or {}
+        self.chat_cache.put(chat_id, chat_data)
+        return chat_data
+
+    def hot_items(self, chat_id: str) -> Optional[ChatItems]:
+        if self.hot_chats is not None and (context := self.hot_chats.get_items(chat_id)) is not None:
+            return ChatItems(**context)
+        return None
+
+    def hot_chat(self, chat_id: str, user_id: str) -> Optional[Chat]:
+        if self.hot_chats is not None and (hot := self.hot_chats.get(chat_id)) is not None:
+            return chat_from_hot(hot, user_id)
+        return None
+
+    def new_chat_document(self, user_id: str, chat: MiniChatBase) -> dict:
+        """Documento do novo chat, com o ID reservado pelo get_new_chat_id (ou um novo)."""
+        chat_json = chat.model_dump()
+        chat_json['user_id'] = user_id
+        chat_id = self.temp_chat_ids.pop(user_id, None)
+        if chat_id is None:
+            chat_id = self.generate_new_chat_id()
+        chat_json['chat_id'] = chat_id
+        chat_json['last_update'] = datetime.now(tz=timezone.utc).isoformat()
+        return chat_json
+
+    def chat_saved(self, chat_json: dict) -> MiniChat:
+        self.chat_cache.put(chat_json['chat_id'], chat_json)
+        return MiniChat(**chat_json)
+
+    def chat_missing(self, chat_id: str) -> HTTPException:
+        # A escrita do update_chat falhou: o chat foi removido
+        self.chat_cache.invalidate(chat_id)
+        return HTTPException(status_code=404, detail="Chat not found")
+
+    def chat_updated(self, user_id: str, chat: MiniChat, target: str, message_id: str, item_json: dict, last_update: str) -> None:
+        self.chat_cache.put(chat.chat_id, {**chat.model_dump(mode='json'), 'user_id': user_id, 'last_update': last_update})
+        if self.hot_chats is not None:
+            self.hot_chats.record(chat.chat_id, target, message_id, item_json, last_update)
+
+    def cached_user(self, user_id: str) -> Optional[dict]:
+        """Documento do usuário, lido do cache quando possível (None se não existir)."""
+        user_data = self.user_cache.get(user_id)
+        if user_data is None:
+            user_data = self.remember_user(user_id, self.db.collection('users').document(user_id).get())
+        return user_data
+
     def create_user(self, user_data: CreateUser, user_id: str) -> UserDB:
-        user_doc = self.db.collection('users').document(user_id).get()
-        if user_doc.exists:
-            # Usuário já existe, retorna o existente
-            user_data_db = user_doc.to_dict() or {}
-            return UserDB(user_id=user_id, name=user_data_db.get('name', user_data.name))
-        user = UserDB(
-            user_id=user_id,
-            name=user_data.name
-        )
-        self.db.collection('users').document(user_id).set(user.model_dump())
-        logger.info(f"Usuário criado no Firestore com ID: {user_id}")
+        user, created = new_user(user_data, user_id, self.cached_user(user_id))
+        if created:
+            self.db.collection('users').document(user_id).set(user.model_dump())
+            self.user_created(user)
         return user
 
     def get_user(self, user_id: str) -> User:
-        user_doc = self.db.collection('users').document(user_id).get()
-        if not user_doc.exists:
+        user_data = self.cached_user(user_id)
+        if user_data is None:
             raise ValueError("User not found")
-
-        user_data = cast(dict[str, Any], user_doc.to_dict())
-        return User(**user_data, chats=self.get_user_chats(user_id))
+        return user_with_chats(user_data, self.get_user_chats(user_id, CHATS_PAGE_SIZE))
     
     def verify_user(self, user_id: str) -> bool:
         # Sempre permitir usuário de teste do config
         if user_id == TEST_USER:
             return True
             
-        user_doc = self.db.collection('users').document(user_id).get()
-        return user_doc.exists
+        return self.cached_user(user_id) is not None
 
     # --- Chat Functions ---
 
-    def get_user_chats(self, user_id: str) -> list[MiniChat]:
-        chats_ref = self.db.collection('chats')
-        stream = chats_ref.where('user_id', '==', user_id).stream()
-        user_chats = [MiniChat(**(doc.to_dict() or {})) for doc in stream]
-        user_chats.sort(key=lambda x: x.last_update, reverse=True)
-        
-        return user_chats
+    def get_user_chats(self, user_id: str, limit: Optional[int] = None, cursor: Optional[str] = None) -> ChatPage:
+        stream = user_chats_query(self.db, user_id, limit, cursor).stream()
+        return make_page((MiniChat(**(doc.to_dict() or {})) for doc in stream), limit)
     
     def get_chat_items(self, chat_id: str) -> ChatItems:
-        messages_ref = self.db.collection("messages")
-        stream = messages_ref.where('chat_id', '==', chat_id).stream()
-        chat_items = [doc.to_dict() for doc in stream]
-        chat_items.sort(key=lambda x: x['message_index'])
-        
-        return ChatItems(
-            history="\n".join(item["text_voice"] for item in chat_items),
-            painted_items=", ".join(item["paint_image"] for item in chat_items),
-            last_image=chat_items[-1]["image"]
-        )
+        if (items := self.hot_items(chat_id)) is not None:
+            return items
+
+        context_doc = self.db.collection('chat_contexts').document(chat_id).get()
+        if context_doc.exists:
+            return ChatItems(**(context_doc.to_dict() or {}))
+
+        # Chats anteriores à coleção de contexto: reconstrói uma única vez
+        return chat_items_from_context(self.rebuild_chat_context(chat_id))
+
+    def rebuild_chat_context(self, chat_id: str) -> Optional[dict]:
+        stream = chat_messages_query(self.db, chat_id).stream()
+        context = build_context([doc.to_dict() or {} for doc in stream])
+        if context is not None:
+            self.db.collection('chat_contexts').document(chat_id).set(context)
+        return context
+
+    def append_chat_message(self, chat_ref: Any, message_id: str, item_json: dict, last_update: str) -> None:
+        """Grava a mensagem, o last_update do chat e o contexto em uma única transação."""
+        context_ref = self.db.collection('chat_contexts').document(chat_ref.id)
+
+        @firestore.transactional
+        def _append(transaction) -> None:
+            # O Firestore exige todas as leituras antes das escritas
+            context = appended_context(context_ref.get(transaction=transaction), item_json)
+            if context is None:
+                stream = chat_messages_query(self.db, chat_ref.id).stream(transaction=transaction)
+                context = rebuilt_context([doc.to_dict() or {} for doc in stream], item_json)
+            chat_update_writes(transaction, self.db, chat_ref, 'messages', message_id, item_json, last_update, context)
+
+        _append(self.db.transaction())
     
-    def upload_archive(self, file_bytes:bytes, blob_path:str, mime_type) ->str:
+    def bucket_is_public(self) -> bool:
+        """
+        Confere (só leitura) se o bucket já tem leitura pública via IAM.
+
+        Liberar o bucket é um passo manual de operação, feito uma única vez
+        (ver README); a aplicação nunca altera a política do bucket. Com o
+        bucket público, a ACL por arquivo é dispensada.
+        """
+        # storage_public_access: object (make_public em cada arquivo) | bucket (bucket já liberado pela operação)
+        if database_configs.get('storage_public_access', 'object') != 'bucket':
+            return False
+        try:
+            policy = self.bucket.get_iam_policy(requested_policy_version=3)
+            if any(binding['role'] == 'roles/storage.objectViewer' and 'allUsers' in binding['members']
+                   for binding in policy.bindings):
+                return True
+            logger.warning("Bucket do Cloud Storage sem leitura pública (allUsers: objectViewer), usando ACL por arquivo.")
+        except Exception as e:
+            logger.warning(f"Não foi possível ler a política do bucket, usando ACL por arquivo: {e}")
+        return False
+
+    def make_public(self, blob) -> None:
+        try:
+            blob.make_public()
+        except Exception as e:
+            logger.error(f"Erro ao tornar público o arquivo {blob.name}: {e}")
+
+    def upload_blob(self, file_bytes: bytes, blob_path: str, mime_type: str) -> str:
         blob = self.bucket.blob(blob_path)
+        blob.cache_control = self.cache_control
         
         blob.upload_from_string(
             file_bytes,
             content_type=mime_type
         )
         
-        blob.make_public()
+        if self.public_per_object:
+            # A URL pública é determinística: a ACL é aplicada em segundo plano
+            self.upload_pool.submit(self.make_public, blob)
         
         logger.info(f"Arquivo salvo/sobrescrito para o Cloud Storage (Firebase) em: {blob.public_url}")
         
         return blob.public_url
+
+    def submit_upload(self, file_bytes: bytes, blob_path: str, mime_type: str) -> Future[str]:
+        """Agenda o upload no pool e retorna um Future com a URL pública."""
+        return self.upload_pool.submit(self.upload_blob, file_bytes, blob_path, mime_type)
+
+    def upload_archive(self, file_bytes:bytes, blob_path:str, mime_type) ->str:
+        return self.submit_upload(file_bytes, blob_path, mime_type).result()
     
+    def submit_content(self, file_bytes: bytes, extension: str, mime_type: str) -> Future[str]:
+        """Agenda o upload endereçado por conteúdo no pool de uploads."""
+        return self.upload_pool.submit(self.upload_content, file_bytes, extension, mime_type)
+
+    def upload_content(self, file_bytes: bytes, extension: str, mime_type: str) -> str:
+        """Envia o arquivo endereçado pelo sha256; conteúdo repetido reutiliza a URL existente."""
+        key = content_hash(file_bytes)
+        ref = self.db.collection('archive_refs').document(key)
+        snapshot = ref.get()
+        blob_path = f"cas/{key}{extension}"
+        if snapshot.exists and snapshot.get('url'):
+            try:
+                # Reutilizado agora: atualiza o `updated` do blob para a coleta não retirar o arquivo
+                blob = self.bucket.blob(blob_path)
+                blob.metadata = {'last_used': datetime.now(tz=timezone.utc).isoformat()}
+                blob.patch()
+                if blob.storage_class == "COLDLINE":
+                    # Retirado para o frio e referenciado de novo: volta para a classe padrão e para a coleta
+                    blob.update_storage_class("STANDARD")
+                logger.info(f"Arquivo já armazenado no Cloud Storage, reutilizando: {snapshot.get('url')}")
+                return snapshot.get('url')
+            except NotFound:
+                logger.info(f"Arquivo {blob_path} foi coletado, enviando de novo")
+
+        # Já roda no pool de uploads (submit_content): envia direto, sem esperar outra thread do pool
+        url = self.upload_blob(file_bytes, blob_path, mime_type)
+        # merge para não sobrescrever o contador de referências
+        ref.set({'url': url, 'size': len(file_bytes), 'mime_type': mime_type}, merge=True)
+        return url
+
     async def store_user_archive(self, user_id: str, file: UploadFile) -> str:
         try:
             content, mime, extension = await get_mime_extension(file)
+
+            if self.content_addressed:
+                return self.submit_content(content, extension, mime).result()
             
             file_id = str(uuid.uuid4())
             blob_name = f"archives/{user_id}/{file_id}{extension}"
@@ -163,6 +459,9 @@ class FirebaseDB(DatabaseInterface):
         base_filename: Optional[str] = None
     ) -> str:
     
+        if self.content_addressed:
+            return self.submit_content(file_bytes, mimetypes.guess_extension(mime_type) or '.bin', mime_type).result()
+
         filename = generate_filename(mime_type, base_filename)
         blob_name = f"{destination_path}/{filename}"
         
@@ -172,38 +471,62 @@ class FirebaseDB(DatabaseInterface):
             logger.error(f"Erro ao fazer upload do arquivo gerado: {e}")
             raise e
 
+    def archive_references(self) -> Iterator[str]:
+        for collection in ('messages', 'submits'):
+            # Só os campos de arquivo são trazidos do Firestore
+            for doc in self.db.collection(collection).select(['image', 'audio']).stream():
+                yield from item_archives(doc.to_dict() or {})
+        for message in self.pending.messages():
+            yield from item_archives(message)
+
+    def list_archives(self) -> Iterator[ArchiveInfo]:
+        for blob in self.bucket.list_blobs():
+            # Arquivos já movidos para o armazenamento frio não são processados de novo
+            if blob.storage_class == "COLDLINE":
+                continue
+            yield ArchiveInfo(ref=blob.public_url, size=blob.size or 0, updated=blob.updated)
+
+    def retire_archive(self, archive: ArchiveInfo, cold: bool) -> None:
+        blob_name = archive.ref.removeprefix(f"https://storage.googleapis.com/{self.bucket.name}/")
+        blob = self.bucket.blob(unquote(blob_name))
+        if cold:
+            blob.update_storage_class("COLDLINE")
+        else:
+            blob.delete()
+        if key := content_key(archive.ref):
+            # Evita que o upload endereçado por conteúdo devolva a URL de um arquivo removido ou
+            # frio: o mesmo conteúdo é enviado de novo, em um objeto novo na classe padrão
+            self.db.collection('archive_refs').document(key).delete()
+
     def assert_chat_exists(self, chat_id: str, user_id: str) -> tuple[firestore.DocumentReference, MiniChat]:
         chat_ref = self.db.collection('chats').document(chat_id)
-        chat_doc = chat_ref.get()
-        
-        if not chat_doc.exists:
-            raise HTTPException(status_code=404, detail="Chat not found")
-        chat_data = chat_doc.to_dict() or {}
-        if chat_data.get('user_id') != user_id:
-            raise HTTPException(status_code=403, detail="Unauthorized access")
-        return chat_ref, MiniChat(**chat_data)
+        chat_data = self.chat_cache.get(chat_id)
+        if chat_data is None:
+            chat_data = self.remember_chat(chat_id, chat_ref.get())
+        return chat_ref, owned_chat(chat_data, user_id)
     
     def get_chat(self, chat_id: str, user_id: str) -> Chat:
-        _, chat_data = self.assert_chat_exists(chat_id, user_id)
-        messages_ref = self.db.collection('messages')
-        messages_docs = list(messages_ref.where('chat_id', '==', chat_id).stream())
-        messages = [Message(**(doc.to_dict() or {})) for doc in messages_docs]
-        messages.sort(key=lambda x: x.message_index)
-        submits_ref = self.db.collection('submits')
-        sub_docs = list(submits_ref.where('chat_id', '==', chat_id).stream())
-        subimits = [SubmitImageMessage(**(doc.to_dict() or {})) for doc in sub_docs]
-        subimits = [s for s in subimits if s.data.is_correct]
-        subimits.sort(key=lambda x: x.message_index)
-        return Chat(
-            messages=messages,
-            subimits=subimits,
-            **chat_data.model_dump()
+        if (hot := self.hot_chat(chat_id, user_id)) is not None:
+            return hot
+
+        # As três leituras são independentes: disparadas juntas, a latência é a da mais lenta
+        messages_query = chat_messages_query(self.db, chat_id)
+        submits_query = chat_submits_query(self.db, chat_id)
+        future_chat = self.read_pool.submit(self.assert_chat_exists, chat_id, user_id)
+        future_messages = self.read_pool.submit(lambda: list(messages_query.stream()))
+        future_submits = self.read_pool.submit(lambda: list(submits_query.stream()))
+
+        # A posse do chat é verificada antes de usar as demais leituras
+        _, chat_data = future_chat.result()
+        return build_chat(
+            chat_data,
+            (doc.to_dict() or {} for doc in future_messages.result()),
+            (doc.to_dict() or {} for doc in future_submits.result())
         )
     
-    def generate_new_chat_id(self) ->str:
-        while self.db.collection('chats').document(chat_id := str(uuid.uuid4())).get().exists:
-            pass
-        return chat_id
+    def generate_new_chat_id(self) -> str:
+        # ID automático do Firestore, gerado no cliente (20 caracteres aleatórios), sem consultar o banco
+        return self.db.collection('chats').document().id
 
     def get_new_chat_id(self, user_id: str) -> str:
         chat_id = self.generate_new_chat_id()
@@ -211,31 +534,21 @@ class FirebaseDB(DatabaseInterface):
         return chat_id
 
     def save_chat(self, user_id :str, chat: MiniChatBase) -> MiniChat:
-        chat_json = chat.model_dump()
-        
-        chat_json['user_id'] = user_id
-        
-        chat_id = self.temp_chat_ids.get(user_id)
-        if chat_id is None:
-            chat_id = self.generate_new_chat_id()
-        else:
-            del self.temp_chat_ids[user_id]
-        chat_json['chat_id'] = chat_id
-        
-        chat_json['last_update'] = datetime.now(tz=timezone.utc).isoformat()
-        
-        self.db.collection('chats').document(chat_json['chat_id']).set(chat_json)
-        
-        return MiniChat(**chat_json)
+        chat_json = self.new_chat_document(user_id, chat)
+        # create falha em vez de sobrescrever caso o ID já exista
+        self.db.collection('chats').document(chat_json['chat_id']).create(chat_json)
+        return self.chat_saved(chat_json)
 
     def update_chat(self, user_id: str, chat_id: str, target: str, item: SubmitImageMessage | Message) -> None:
+        # Posse verificada pelo cache; cada item é gravado em um único commit:
+        # mensagens junto com o contexto (transação), submissões em um batch
         doc_ref, doc_data = self.assert_chat_exists(chat_id, user_id)
-
-        doc_ref.update({'last_update': datetime.now(tz=timezone.utc).isoformat()})
-        
-        message_id = str(uuid.uuid4())
-        
-        item_json = item.model_dump()
-        item_json["chat_id"] = chat_id
-        
-        self.db.collection(target).document(message_id).set(item_json)
+        message_id, item_json, last_update = chat_item_document(chat_id, item)
+        try:
+            if target == 'messages':
+                self.append_chat_message(doc_ref, message_id, item_json, last_update)
+            else:
+                chat_update_batch(self.db, doc_ref, target, message_id, item_json, last_update).commit()
+        except NotFound:
+            raise self.chat_missing(chat_id)
+        self.chat_updated(user_id, doc_data, target, message_id, item_json, last_update)
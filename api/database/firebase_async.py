@@ -0,0 +1,202 @@
+import asyncio
+import mimetypes
+import uuid
+from typing import Any, Optional, cast
+
+from google.api_core.exceptions import NotFound
+from fastapi import UploadFile
+from firebase_admin import firestore, firestore_async  # type:ignore
+
+from api.database.executor import get_database_executor
+from api.database.context import build_context
+from api.database.firebase import (
+    FirebaseDB, TEST_USER, appended_context, build_chat, chat_item_document, chat_items_from_context, chat_messages_query,
+    chat_submits_query, chat_update_batch, chat_update_writes, new_user, owned_chat, rebuilt_context, user_chats_query,
+    user_with_chats
+)
+from api.database.pagination import CHATS_PAGE_SIZE, make_page
+from api.database.interface import AsyncDatabaseInterface
+from api.schemas.messages import Chat, ChatItems, ChatPage, Message, MiniChat, MiniChatBase, SubmitImageMessage
+from api.schemas.users import CreateUser, User, UserDB
+from api.utils import generate_filename, get_mime_extension
+from api.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+class AsyncFirebaseDB(AsyncDatabaseInterface):
+    """
+    FirebaseDB sobre o cliente assíncrono do Firestore, usado pelas rotas.
+
+    Reaproveita o app, os caches, as mensagens pendentes e os IDs
+    reservados do FirebaseDB síncrono, que continua atendendo as threads
+    de pré-geração. Uploads para o Cloud Storage, que não tem cliente
+    assíncrono, rodam em threads.
+    """
+
+    def __init__(self, database: FirebaseDB) -> None:
+        self.database = database
+        self.db = firestore_async.client()
+        # Armazenamento de pendentes continua síncrono; uploads vão para o pool de uploads do FirebaseDB
+        self.executor = get_database_executor()
+
+    async def close(self) -> None:
+        self.db.close()
+        # shutdown aguarda as chamadas em andamento: fora do loop de eventos
+        await asyncio.to_thread(self.executor.shutdown)
+
+    # --- Pending Message Helpers (armazenamento compartilhado com o FirebaseDB) ---
+    async def set_pending_message(self, chat_id: str, message: Any) -> None:
+        await self.executor.run(self.database.set_pending_message, chat_id, message)
+
+    async def pop_pending_message(self, chat_id: str) -> Optional[Any]:
+        return await self.executor.run(self.database.pop_pending_message, chat_id)
+
+    # --- User Functions ---
+    # Consultas, batches, mapeamentos e caches vêm do FirebaseDB; aqui só as chamadas ao cliente
+
+    async def cached_user(self, user_id: str) -> Optional[dict]:
+        """Documento do usuário, lido do cache compartilhado quando possível."""
+        user_data = self.database.user_cache.get(user_id)
+        if user_data is None:
+            user_data = self.database.remember_user(user_id, await self.db.collection('users').document(user_id).get())
+        return user_data
+
+    async def create_user(self, user_data: CreateUser, user_id: str) -> UserDB:
+        user, created = new_user(user_data, user_id, await self.cached_user(user_id))
+        if created:
+            await self.db.collection('users').document(user_id).set(user.model_dump())
+            self.database.user_created(user)
+        return user
+
+    async def get_user(self, user_id: str) -> User:
+        user_data, page = await asyncio.gather(
+            self.cached_user(user_id),
+            self.get_user_chats(user_id, CHATS_PAGE_SIZE)
+        )
+        return user_with_chats(user_data, page)
+
+    async def verify_user(self, user_id: str) -> bool:
+        # Sempre permitir usuário de teste do config
+        if user_id == TEST_USER:
+            return True
+
+        return await self.cached_user(user_id) is not None
+
+    # --- Chat Functions ---
+
+    async def get_user_chats(self, user_id: str, limit: Optional[int] = None, cursor: Optional[str] = None) -> ChatPage:
+        query = user_chats_query(self.db, user_id, limit, cursor)
+        return make_page([MiniChat(**(doc.to_dict() or {})) async for doc in query.stream()], limit)
+
+    async def get_chat_items(self, chat_id: str) -> ChatItems:
+        if (items := self.database.hot_items(chat_id)) is not None:
+            return items
+
+        context_doc = await self.db.collection('chat_contexts').document(chat_id).get()
+        if context_doc.exists:
+            return ChatItems(**(context_doc.to_dict() or {}))
+
+        # Chats anteriores à coleção de contexto: reconstrói uma única vez
+        return chat_items_from_context(await self.rebuild_chat_context(chat_id))
+
+    async def rebuild_chat_context(self, chat_id: str) -> Optional[dict]:
+        query = chat_messages_query(self.db, chat_id)
+        context = build_context([doc.to_dict() or {} async for doc in query.stream()])
+        if context is not None:
+            await self.db.collection('chat_contexts').document(chat_id).set(context)
+        return context
+
+    async def append_chat_message(self, chat_ref: Any, message_id: str, item_json: dict, last_update: str) -> None:
+        """Grava a mensagem, o last_update do chat e o contexto em uma única transação."""
+        context_ref = self.db.collection('chat_contexts').document(chat_ref.id)
+
+        @firestore.async_transactional
+        async def _append(transaction) -> None:
+            # O Firestore exige todas as leituras antes das escritas
+            context = appended_context(await context_ref.get(transaction=transaction), item_json)
+            if context is None:
+                stream = chat_messages_query(self.db, chat_ref.id).stream(transaction=transaction)
+                context = rebuilt_context([doc.to_dict() or {} async for doc in stream], item_json)
+            chat_update_writes(transaction, self.db, chat_ref, 'messages', message_id, item_json, last_update, context)
+
+        await _append(self.db.transaction())
+
+    async def store_user_archive(self, user_id: str, file: UploadFile) -> str:
+        try:
+            content, mime, extension = await get_mime_extension(file)
+
+            if self.database.content_addressed:
+                return await asyncio.wrap_future(self.database.submit_content(content, extension, mime))
+
+            blob_name = f"archives/{user_id}/{uuid.uuid4()}{extension}"
+            return await asyncio.wrap_future(self.database.submit_upload(content, blob_name, mime))
+
+        except Exception as e:
+            logger.error(f"Erro ao salvar arquivo no Cloud Storage: {e}")
+            raise e
+
+    async def upload_generated_archive(self, file_bytes: bytes, destination_path: str, mime_type: str, base_filename: Optional[str] = None) -> str:
+        if self.database.content_addressed:
+            extension = mimetypes.guess_extension(mime_type) or '.bin'
+            return await asyncio.wrap_future(self.database.submit_content(file_bytes, extension, mime_type))
+
+        blob_name = f"{destination_path}/{generate_filename(mime_type, base_filename)}"
+        try:
+            return await asyncio.wrap_future(self.database.submit_upload(file_bytes, blob_name, mime_type))
+        except Exception as e:
+            logger.error(f"Erro ao fazer upload do arquivo gerado: {e}")
+            raise e
+
+    async def assert_chat_exists(self, chat_id: str, user_id: str) -> tuple[Any, MiniChat]:
+        chat_ref = self.db.collection('chats').document(chat_id)
+        chat_data = self.database.chat_cache.get(chat_id)
+        if chat_data is None:
+            chat_data = self.database.remember_chat(chat_id, await chat_ref.get())
+        return chat_ref, owned_chat(chat_data, user_id)
+
+    async def get_chat(self, chat_id: str, user_id: str) -> Chat:
+        if (hot := self.database.hot_chat(chat_id, user_id)) is not None:
+            return hot
+
+        # As três leituras são independentes: disparadas juntas, a latência é a da mais lenta
+        chat_result, message_docs, submit_docs = await asyncio.gather(
+            self.assert_chat_exists(chat_id, user_id),
+            chat_messages_query(self.db, chat_id).get(),
+            chat_submits_query(self.db, chat_id).get(),
+            return_exceptions=True
+        )
+        # A posse do chat é verificada antes de usar as demais leituras
+        for result in (chat_result, message_docs, submit_docs):
+            if isinstance(result, BaseException):
+                raise result
+
+        _, chat_data = cast(tuple[Any, MiniChat], chat_result)
+        return build_chat(
+            chat_data,
+            (doc.to_dict() or {} for doc in cast(list, message_docs)),
+            (doc.to_dict() or {} for doc in cast(list, submit_docs))
+        )
+
+    async def get_new_chat_id(self, user_id: str) -> str:
+        # O ID é gerado no cliente, sem ida ao Firestore
+        return self.database.get_new_chat_id(user_id)
+
+    async def save_chat(self, user_id: str, chat: MiniChatBase) -> MiniChat:
+        chat_json = self.database.new_chat_document(user_id, chat)
+        # create falha em vez de sobrescrever caso o ID já exista
+        await self.db.collection('chats').document(chat_json['chat_id']).create(chat_json)
+        return self.database.chat_saved(chat_json)
+
+    async def update_chat(self, user_id: str, chat_id: str, target: str, item: SubmitImageMessage | Message) -> None:
+        # Posse verificada pelo cache; cada item é gravado em um único commit:
+        # mensagens junto com o contexto (transação), submissões em um batch
+        doc_ref, doc_data = await self.assert_chat_exists(chat_id, user_id)
+        message_id, item_json, last_update = chat_item_document(chat_id, item)
+        try:
+            if target == 'messages':
+                await self.append_chat_message(doc_ref, message_id, item_json, last_update)
+            else:
+                await chat_update_batch(self.db, doc_ref, target, message_id, item_json, last_update).commit()
+        except NotFound:
+            raise self.database.chat_missing(chat_id)
+        self.database.chat_updated(user_id, doc_data, target, message_id, item_json, last_update)
@@ -0,0 +1,49 @@
+import threading
+from typing import Callable
+
+from api.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+class BackgroundFlusher:
+    """
+    Thread que agrupa as escritas em disco do banco local.
+
+    As mutações só marcam o banco como sujo; a cada `interval` segundos, se
+    houver algo pendente, a função de flush é chamada uma única vez. Assim a
+    serialização sai do caminho das requisições.
+    """
+
+    def __init__(self, flush: Callable[[], None], interval: float = 2.0, name: str = "local-db-flusher") -> None:
+        self.flush = flush
+        self.interval = interval
+        self.dirty = threading.Event()
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, name=name, daemon=True)
+        self.thread.start()
+
+    def mark_dirty(self) -> None:
+        self.dirty.set()
+
+    def run(self) -> None:
+        while not self.stopped.wait(self.interval):
+            self.flush_if_dirty()
+
+    def flush_if_dirty(self) -> None:
+        if not self.dirty.is_set():
+            return
+        self.dirty.clear()
+        try:
+            self.flush()
+        except Exception as e:
+            # Mantém o banco sujo para tentar novamente no próximo ciclo
+            self.dirty.set()
+            logger.error(f"Erro ao gravar o banco local em background: {e}")
+
+    def stop(self) -> None:
+        """Encerra a thread e grava o que estiver pendente (usado no shutdown)."""
+        if self.stopped.is_set():
+            return
+        self.stopped.set()
+        self.thread.join()
+        self.flush_if_dirty()
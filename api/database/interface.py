@@ -1,11 +1,36 @@
 from abc import ABC, abstractmethod
 from api.schemas.users import User, CreateUser, UserDB
-from api.schemas.messages import Chat, MiniChatBase, MiniChat, SubmitImageMessage, Message, ChatItems
+from api.schemas.messages import Chat, ChatPage, MiniChatBase, MiniChat, SubmitImageMessage, Message, ChatItems
 from fastapi import UploadFile
-from typing import Literal, Optional, Any
+from typing import Literal, Optional, Any, Iterator
+from api.database.archives import ArchiveInfo
 
 class DatabaseInterface(ABC):
 
+    def close(self) -> None:
+        """Libera recursos e grava dados pendentes no encerramento da API."""
+        pass
+
+    def stats(self) -> dict[str, Any]:
+        """Métricas do banco em tempo de execução (caches, mensagens pré-geradas)."""
+        return {}
+
+    # Archive garbage collection helpers
+    @abstractmethod
+    def archive_references(self) -> Iterator[str]:
+        """Caminhos/URLs referenciados por mensagens, submissões e mensagens pendentes."""
+        pass
+
+    @abstractmethod
+    def list_archives(self) -> Iterator[ArchiveInfo]:
+        """Percorre os arquivos armazenados."""
+        pass
+
+    @abstractmethod
+    def retire_archive(self, archive: ArchiveInfo, cold: bool) -> None:
+        """Remove o arquivo ou o move para o armazenamento frio."""
+        pass
+
     # Pending message helpers
     @abstractmethod
     def set_pending_message(self, chat_id: str, message: Any) -> None:
@@ -31,8 +56,8 @@ class DatabaseInterface(ABC):
     
     # Chat Functions
     @abstractmethod
-    def get_user_chats(self, user_id: str) -> list[MiniChat]:
-        """Retrieve all chats for a given user."""
+    def get_user_chats(self, user_id: str, limit: Optional[int] = None, cursor: Optional[str] = None) -> ChatPage:
+        """Retrieve a page of a user's chats, newest first (all of them when limit is None)."""
         pass
     
     @abstractmethod
@@ -80,4 +105,68 @@ class DatabaseInterface(ABC):
     def update_chat(self, user_id: str, chat_id: str, target: Literal["messages", "submits"], item: SubmitImageMessage | Message) -> None:
         """Update a chat by adding a message or submission."""
         pass
-    
\ No newline at end of file
+    
+
+class AsyncDatabaseInterface(ABC):
+    """
+    Versão assíncrona do banco usada pelas rotas.
+
+    Nenhuma chamada bloqueia o loop de eventos: backends com cliente assíncrono
+    (Firestore) aguardam a rede diretamente; os demais rodam em threads.
+    """
+
+    async def close(self) -> None:
+        """Libera os clientes assíncronos (o banco síncrono é fechado à parte)."""
+        pass
+
+    @abstractmethod
+    async def set_pending_message(self, chat_id: str, message: Any) -> None:
+        pass
+
+    @abstractmethod
+    async def pop_pending_message(self, chat_id: str) -> Optional[Any]:
+        pass
+
+    @abstractmethod
+    async def create_user(self, user_data: CreateUser, user_id: str) -> UserDB:
+        pass
+
+    @abstractmethod
+    async def get_user(self, user_id: str) -> User:
+        pass
+
+    @abstractmethod
+    async def verify_user(self, user_id: str) -> bool:
+        pass
+
+    @abstractmethod
+    async def get_user_chats(self, user_id: str, limit: Optional[int] = None, cursor: Optional[str] = None) -> ChatPage:
+        pass
+
+    @abstractmethod
+    async def get_chat_items(self, chat_id: str) -> ChatItems:
+        pass
+
+    @abstractmethod
+    async def store_user_archive(self, user_id: str, file: UploadFile) -> str:
+        pass
+
+    @abstractmethod
+    async def upload_generated_archive(self, file_bytes: bytes, destination_path: str, mime_type: str, base_filename: Optional[str] = None) -> str:
+        pass
+
+    @abstractmethod
+    async def get_chat(self, chat_id: str, user_id: str) -> Chat:
+        pass
+
+    @abstractmethod
+    async def get_new_chat_id(self, user_id: str) -> str:
+        pass
+
+    @abstractmethod
+    async def save_chat(self, user_id: str, chat: MiniChatBase) -> MiniChat:
+        pass
+
+    @abstractmethod
+    async def update_chat(self, user_id: str, chat_id: str, target: Literal["messages", "submits"], item: SubmitImageMessage | Message) -> None:
+        pass
@@ -0,0 +1,70 @@
+import json
+import os
+from pathlib import Path
+from typing import Iterator
+
+from api.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+class Journal:
+    """
+    Journal append-only (write-ahead) do LocalDatabase.
+
+    Cada mutação vira uma linha JSON no arquivo, então o custo de escrita é
+    constante, independente do tamanho do banco. No startup o journal é
+    reaplicado sobre o último snapshot e, periodicamente, compactado.
+    """
+
+    def __init__(self, file_path: str, compact_every: int = 500) -> None:
+        self.file_path = Path(file_path)
+        self.file_path.parent.mkdir(parents=True, exist_ok=True)
+        self.compact_every = compact_every
+        self.pending_records = 0
+        self._file = open(self.file_path, "a", encoding="utf-8")
+
+    def replay(self) -> Iterator[dict]:
+        """Percorre os registros gravados, ignorando uma última linha corrompida."""
+        if not self.file_path.exists():
+            return
+
+        with open(self.file_path, "r", encoding="utf-8") as f:
+            for line_number, line in enumerate(f, start=1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # Escrita interrompida no meio (ex: crash); o resto é descartado
+                    logger.warning(f"Registro inválido na linha {line_number} do journal, ignorando o restante")
+                    break
+                self.pending_records += 1
+                yield record
+
+    def append(self, record: dict, flush: bool = True, fsync: bool = False) -> None:
+        self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self.pending_records += 1
+        if flush:
+            self.sync(fsync)
+
+    def sync(self, fsync: bool = False) -> None:
+        """Envia o buffer para o sistema operacional e, opcionalmente, para o disco."""
+        self._file.flush()
+        if fsync:
+            os.fsync(self._file.fileno())
+
+    def should_compact(self) -> bool:
+        return self.compact_every > 0 and self.pending_records >= self.compact_every
+
+    def truncate(self) -> None:
+        """Descarta os registros já consolidados em um snapshot."""
+        self._file.close()
+        self._file = open(self.file_path, "w", encoding="utf-8")
+        self.pending_records = 0
+
+    def close(self) -> None:
+        if not self._file.closed:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._file.close()
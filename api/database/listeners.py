@@ -0,0 +1,261 @@
+import json
+import queue
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Optional, cast
+
+from api.database.context import build_context
+from api.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+def document_size(data: dict) -> int:
+    # Estimativa da memória ocupada pelo documento (tamanho serializado)
+    return len(json.dumps(data, default=str))
+
+class HotChat:
+    """Cópia local de um chat ativo, mantida por três snapshot listeners."""
+
+    def __init__(self, chat_id: str) -> None:
+        self.chat_id = chat_id
+        self.chat: Optional[dict] = None
+        self.messages: dict[str, dict] = {}
+        self.submits: dict[str, dict] = {}
+        self.sizes: dict[str, int] = {}
+        self.context: Optional[dict] = None
+        self.ready = {"chat": threading.Event(), "messages": threading.Event(), "submits": threading.Event()}
+        self.watches: list[Any] = []
+        self.last_access = time.monotonic()
+
+    def is_ready(self) -> bool:
+        return all(event.is_set() for event in self.ready.values())
+
+    def size(self) -> int:
+        return sum(self.sizes.values())
+
+    def chat_items(self) -> Optional[dict]:
+        """Contexto de geração, recalculado só quando as mensagens mudam."""
+        if self.context is None:
+            self.context = build_context(list(self.messages.values()))
+        return self.context
+
+class HotChatCache:
+    """
+    Cache de chats ativos alimentado por snapshot listeners do Firestore.
+
+    O primeiro acesso a um chat abre listeners para o documento do chat, suas
+    mensagens e submissões corretas; a partir daí o Firestore envia só as
+    alterações e as leituras do chat são servidas da memória. Chats sem
+    acesso há mais de `idle_minutes` e, acima do limite de memória, os menos
+    usados são descartados e têm os listeners encerrados.
+
+    Abrir e encerrar listeners faz chamadas de rede bloqueantes, então fica
+    numa thread própria: as leituras só consultam a memória e, numa falta,
+    pedem a inscrição. A mesma thread varre os chats ociosos periodicamente.
+    """
+
+    def __init__(self, client: Any, idle_minutes: float = 15, max_bytes: int = 64 * 1024 * 1024,
+                 sweep_seconds: Optional[float] = None) -> None:
+        self.client = client
+        self.idle_seconds = idle_minutes * 60
+        self.max_bytes = max_bytes
+        self.sweep_seconds = sweep_seconds if sweep_seconds is not None else min(self.idle_seconds / 4, 60)
+        self.chats: OrderedDict[str, HotChat] = OrderedDict()
+        self.lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+        self.requests: queue.Queue[Optional[HotChat]] = queue.Queue()
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, name="hot-chats", daemon=True)
+        self.thread.start()
+
+    def lookup(self, chat_id: str) -> Optional[HotChat]:
+        # Chamado com o lock: atualiza o LRU e conta acerto/falta
+        hot = self.chats.get(chat_id)
+        if hot is not None:
+            hot.last_access = time.monotonic()
+            self.chats.move_to_end(chat_id)
+            if hot.is_ready() and hot.chat is not None:
+                self.hits += 1
+                return hot
+        self.misses += 1
+        return None
+
+    def get(self, chat_id: str) -> Optional[dict]:
+        """
+        Cópia do chat ({"chat", "messages", "submits"}) servida da memória.
+
+        Retorna None se o chat ainda não estiver acompanhado (e pede a
+        inscrição) ou se os listeners ainda não receberam o primeiro snapshot.
+        Nunca bloqueia em chamadas ao Firestore.
+        """
+        with self.lock:
+            hot = self.lookup(chat_id)
+            if hot is not None:
+                return {
+                    "chat": dict(cast(dict, hot.chat)),
+                    "messages": list(hot.messages.values()),
+                    "submits": list(hot.submits.values()),
+                }
+            self.touch(chat_id)
+        return None
+
+    def get_items(self, chat_id: str) -> Optional[dict]:
+        """Contexto de geração do chat servido da memória (None se não estiver pronto)."""
+        with self.lock:
+            hot = self.lookup(chat_id)
+            if hot is not None:
+                return hot.chat_items()
+            self.touch(chat_id)
+        return None
+
+    def touch(self, chat_id: str) -> None:
+        """Marca o chat como ativo; se ainda não for acompanhado, agenda a abertura dos listeners."""
+        with self.lock:
+            hot = self.chats.get(chat_id)
+            if hot is not None:
+                hot.last_access = time.monotonic()
+                self.chats.move_to_end(chat_id)
+                return
+            if self.stopped.is_set():
+                return
+            hot = HotChat(chat_id)
+            self.chats[chat_id] = hot
+        self.requests.put(hot)
+
+    def run(self) -> None:
+        # Inscreve os chats pedidos e, a cada pedido ou `sweep_seconds`, descarta os ociosos
+        while not self.stopped.is_set():
+            try:
+                hot = self.requests.get(timeout=self.sweep_seconds)
+            except queue.Empty:
+                hot = None
+            try:
+                if hot is not None:
+                    self.subscribe(hot)
+                self.evict_cold()
+            except Exception as e:
+                logger.error(f"Erro ao atualizar os chats acompanhados: {e}")
+
+    def subscribe(self, hot: HotChat) -> None:
+        # Na thread dos listeners: abre os três snapshot listeners do chat
+        chat_id = hot.chat_id
+        with self.lock:
+            if self.chats.get(chat_id) is not hot:
+                return
+        try:
+            chat_ref = self.client.collection('chats').document(chat_id)
+            messages_query = self.client.collection('messages').where('chat_id', '==', chat_id)
+            submits_query = (self.client.collection('submits')
+                             .where('chat_id', '==', chat_id)
+                             .where('data.is_correct', '==', True))
+            hot.watches = [
+                chat_ref.on_snapshot(lambda docs, changes, read_time: self.on_chat(hot, docs)),
+                messages_query.on_snapshot(lambda docs, changes, read_time: self.on_items(hot, "messages", changes)),
+                submits_query.on_snapshot(lambda docs, changes, read_time: self.on_items(hot, "submits", changes)),
+            ]
+        except Exception as e:
+            logger.warning(f"Não foi possível acompanhar o chat {chat_id}: {e}")
+            self.evict(chat_id)
+            return
+
+        with self.lock:
+            evicted = self.chats.get(chat_id) is not hot
+        if evicted:
+            # Descartado enquanto os listeners eram abertos
+            self.unsubscribe(hot)
+
+    def on_chat(self, hot: HotChat, docs: list) -> None:
+        with self.lock:
+            doc = docs[0] if docs else None
+            hot.chat = (doc.to_dict() or {}) if doc is not None and doc.exists else None
+            hot.sizes["chat"] = document_size(hot.chat) if hot.chat else 0
+            hot.ready["chat"].set()
+
+    def on_items(self, hot: HotChat, target: str, changes: list) -> None:
+        with self.lock:
+            items = hot.messages if target == "messages" else hot.submits
+            for change in changes:
+                key = f"{target}/{change.document.id}"
+                if change.type.name == "REMOVED":
+                    items.pop(change.document.id, None)
+                    hot.sizes.pop(key, None)
+                    continue
+                data = change.document.to_dict() or {}
+                items[change.document.id] = data
+                hot.sizes[key] = document_size(data)
+            if target == "messages":
+                hot.context = None
+            hot.ready[target].set()
+
+    def record(self, chat_id: str, target: str, doc_id: str, data: dict, last_update: str) -> None:
+        """
+        Aplica uma escrita do próprio processo antes de o listener confirmá-la.
+
+        Sem isso, uma leitura logo após update_chat (ex: a pré-geração da
+        próxima mensagem) poderia não ver o item recém-gravado. O evento do
+        listener chega depois com o mesmo ID e apenas sobrescreve o item.
+        """
+        with self.lock:
+            hot = self.chats.get(chat_id)
+            if hot is None:
+                return
+            if hot.chat is not None:
+                hot.chat["last_update"] = last_update
+            if target == "submits" and not data.get("data", {}).get("is_correct"):
+                return
+            items = hot.messages if target == "messages" else hot.submits
+            items[doc_id] = data
+            hot.sizes[f"{target}/{doc_id}"] = document_size(data)
+            if target == "messages":
+                hot.context = None
+
+    def evict_cold(self) -> None:
+        """Descarta chats ociosos e, se preciso, os menos usados até caber no limite de memória."""
+        victims = []
+        with self.lock:
+            now = time.monotonic()
+            total = sum(hot.size() for hot in self.chats.values())
+            # Em ordem LRU: o primeiro é sempre o acessado há mais tempo
+            for chat_id, hot in list(self.chats.items()):
+                if now - hot.last_access <= self.idle_seconds and total <= self.max_bytes:
+                    break
+                total -= hot.size()
+                victims.append(self.chats.pop(chat_id))
+        # Fora do lock: encerrar um listener espera a thread dele, que pode estar no callback
+        if victims:
+            logger.debug(f"{len(victims)} chats deixaram de ser acompanhados")
+        for hot in victims:
+            self.unsubscribe(hot)
+
+    def evict(self, chat_id: str) -> None:
+        with self.lock:
+            hot = self.chats.pop(chat_id, None)
+        if hot is not None:
+            self.unsubscribe(hot)
+
+    def unsubscribe(self, hot: HotChat) -> None:
+        for watch in hot.watches:
+            try:
+                watch.unsubscribe()
+            except Exception as e:
+                logger.warning(f"Erro ao encerrar listener do chat {hot.chat_id}: {e}")
+
+    def close(self) -> None:
+        self.stopped.set()
+        self.requests.put(None)
+        self.thread.join()
+        for chat_id in list(self.chats):
+            self.evict(chat_id)
+
+    def stats(self) -> dict[str, Any]:
+        with self.lock:
+            total = self.hits + self.misses
+            return {
+                "chats": len(self.chats),
+                "bytes": sum(hot.size() for hot in self.chats.values()),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+            }
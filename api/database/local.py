@@ -1,10 +1,15 @@
 from fastapi import UploadFile, HTTPException
+import atexit
 import json
+import mimetypes
 import os
-from functools import wraps
+import shutil
+import threading
 import uuid
+from itertools import islice
 from pathlib import Path
 from datetime import datetime, timezone
+from typing import Iterator
 
 from api.database.interface import *
 from api.utils.logger import get_logger
@@ -13,6 +18,13 @@ from api.schemas.messages import MiniChat, ChatItems
 from api.schemas.users import CreateUser
 from api.constraints import config
 from api.utils import get_mime_extension, generate_filename
+from api.database.journal import Journal
+from api.database.flusher import BackgroundFlusher
+from api.database.shards import ShardedChats
+from api.database.archives import ArchiveInfo, content_hash, item_archives, referenced_keys
+from api.database.context import build_context, append_context
+from api.database.pending import get_pending_store
+from api.database.pagination import CHATS_PAGE_SIZE, decode_cursor, make_page
 
 database_configs = config.get("Database", {})
 # Obter usuário de teste do config
@@ -27,73 +39,444 @@ def load_json(file_path: str):
     except Exception as e:
         return {}
 
-def save_json(file_path: str, data: dict):
+def write_atomic(file_path: str, content: str, fsync: bool = False):
+    # Escreve em um arquivo temporário e renomeia, para nunca deixar um snapshot pela metade
+    temp_path = f"{file_path}.tmp"
+    with open(temp_path, "w", encoding='utf-8') as f:
+        f.write(content)
+        if fsync:
+            f.flush()
+            os.fsync(f.fileno())
+    os.replace(temp_path, file_path)
+
+def save_json(file_path: str, data: dict, indent: Optional[int] = 4, fsync: bool = False):
+    write_atomic(file_path, json.dumps(data, indent=indent), fsync)
+
+def fsync_file(file_path: str) -> None:
+    # Leva ao disco um arquivo já gravado (o fsync vale para o arquivo, não para o descritor)
     try:
-        with open(file_path, "w", encoding='utf-8') as f:
-            json.dump(data, f, indent=4)
-    except Exception as e:
-        raise e
-
-def auto_save(func):
-    """Salva automaticamente os arquivos de usuários e chats"""
-    @wraps(func)
-    def wrapper(self, *args, **kwargs):
-        result = func(self, *args, **kwargs)
-        if hasattr(self, 'save') and self.save:
-            save_json("./temp/users.json", self.users)
-            save_json("./temp/chats.json", self.chats)
-        return result
-    return wrapper
-
-class LocalDatabase(DatabaseInterface):
+        fd = os.open(file_path, os.O_RDONLY)
+    except FileNotFoundError:
+        return
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+class LocalArchiveStore:
+    """Armazenamento de arquivos em ./temp/archives, compartilhado pelos bancos locais."""
+    content_addressed: bool = database_configs.get('content_addressed', False)
+
+    def store_content(self, file_bytes: bytes, extension: str) -> str:
+        """Grava o arquivo endereçado pelo sha256; conteúdo repetido reutiliza o arquivo existente."""
+        key = content_hash(file_bytes)
+        file_path = Path(f"./temp/archives/cas/{key[:2]}/{key}{extension}")
+        try:
+            # Reutilizado agora: atualiza o mtime para a coleta não retirar o arquivo
+            os.utime(file_path)
+            logger.info(f"Arquivo já armazenado, reutilizando: {file_path}")
+            return str(file_path)
+        except FileNotFoundError:
+            pass
+
+        file_path.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = file_path.with_name(f"{file_path.name}.{uuid.uuid4().hex}.tmp")
+        temp_path.write_bytes(file_bytes)
+        os.replace(temp_path, file_path)
+
+        logger.info(f"Arquivo salvo em: {file_path}")
+        return str(file_path)
+
+    async def store_user_archive(self, user_id: str, file: UploadFile) -> str:
+        content, mime, extension = await get_mime_extension(file)
+        return self.write_user_archive(user_id, content, mime, extension)
+
+    def write_user_archive(self, user_id: str, content: bytes, mime: str, extension: str) -> str:
+        """Parte bloqueante de store_user_archive (o ThreadedDatabase a roda no pool do banco)."""
+        try:
+            if self.content_addressed:
+                return self.store_content(content, extension)
+
+            user_path = Path(f"./temp/archives/{user_id}")
+            user_path.mkdir(parents=True, exist_ok=True)
+            
+            # Checa só o caminho candidato, sem precisar indexar todo o diretório de arquivos
+            while (file_path := user_path / f"{uuid.uuid4()}{extension}").exists():
+                continue
+            
+            with open(file_path, "wb") as f:
+                f.write(content)
+            
+            logger.info(f"Arquivo {mime} salvo em: {file_path}")
+            return str(file_path)
+        
+        except Exception as e:
+            logger.error(f"Error storing archive: {e}")
+            raise e
+    
+    def upload_generated_archive(
+            self, 
+            file_bytes: bytes, 
+            destination_path: str, 
+            mime_type: str,
+            base_filename: Optional[str] = None) -> str:
+        
+        if self.content_addressed:
+            return self.store_content(file_bytes, mimetypes.guess_extension(mime_type) or '.bin')
+
+        filename = generate_filename(mime_type, base_filename)
+        
+        file_path = Path(f'./temp/archives/{destination_path}') / filename
+        file_path.parent.mkdir(parents=True, exist_ok=True)
+        file_path.write_bytes(file_bytes)
+        
+        file_path_str = str(file_path)
+        logger.info(f"Arquivo {mime_type} salvo em: {file_path_str}")
+
+        return file_path_str
+
+    def list_archives(self) -> Iterator[ArchiveInfo]:
+        root = Path("./temp/archives")
+        if not root.exists():
+            return
+        # os.walk é preguiçoso: o coletor processa em lotes sem listar tudo antes
+        for directory, _, files in os.walk(root):
+            for name in files:
+                path = Path(directory) / name
+                if path.suffix == ".tmp":
+                    continue
+                stat = path.stat()
+                yield ArchiveInfo(
+                    ref=os.path.normpath(path),
+                    size=stat.st_size,
+                    updated=datetime.fromtimestamp(stat.st_mtime, tz=timezone.utc)
+                )
+
+    def retire_archive(self, archive: ArchiveInfo, cold: bool) -> None:
+        path = Path(archive.ref)
+        if not cold:
+            path.unlink(missing_ok=True)
+            return
+        cold_path = Path("./temp/archives_cold") / path.relative_to("temp/archives")
+        cold_path.parent.mkdir(parents=True, exist_ok=True)
+        shutil.move(str(path), str(cold_path))
+
+class LocalDatabase(LocalArchiveStore, DatabaseInterface):
     def __init__(self) -> None:
         self.save = database_configs.get('save_local', False)
+        self.storage = database_configs.get('local_storage', 'json')
         self.temp_chat_ids = {}
+        self.journal: Optional[Journal] = None
+        self.flusher: Optional[BackgroundFlusher] = None
+        # fsync, igual nos dois flush_mode:
+        # - none: nunca;
+        # - interval: o que foi gravado chega ao disco em até flush_interval segundos
+        #   (no modo background, no próprio flush; no sync, por uma thread que faz o fsync);
+        # - always: a escrita só retorna depois do fsync.
+        self.fsync_policy = database_configs.get('fsync', 'none')
+        self.syncer: Optional[BackgroundFlusher] = None
+        # Arquivos gravados sem fsync aguardando o syncer (protegido pelo flush_lock)
+        self.unsynced: set[str] = set()
+        self.closed = False
+        # Modelo de concorrência:
+        # - cada chat tem seu próprio lock, então histórias diferentes avançam em paralelo;
+        # - os dicts/listas de um chat nunca são alterados no lugar (copy-on-write), então
+        #   leituras e snapshots não precisam de lock e nunca veem uma estrutura mudando;
+        # - lock ordena o journal com o snapshot; index_lock protege índice e referências;
+        # - flush_lock serializa as gravações em disco.
+        self.chat_locks: dict[str, threading.Lock] = {}
+        self.chat_locks_guard = threading.Lock()
+        self.lock = threading.RLock()
+        self.index_lock = threading.Lock()
+        self.flush_lock = threading.Lock()
+        # Referências aos arquivos endereçados por conteúdo ({sha256: número de mensagens/submissões})
+        self.archive_refs: dict[str, int] = {}
+        # users.json / archive_refs.json alterados desde o último snapshot (protegido pelo index_lock)
+        self.dirty_files: set[str] = set()
+        # Contexto de geração por chat ({chat_id: dict}), montado sob demanda e mantido pelo update_chat
+        self.chat_contexts: dict[str, dict] = {}
         if self.save:
             self.load_db()
+            flush_interval = database_configs.get('flush_interval', 2.0)
+            if database_configs.get('flush_mode', 'sync') == 'background':
+                self.flusher = BackgroundFlusher(self.flush, flush_interval)
+                atexit.register(self.close)
+            elif self.fsync_policy == 'interval':
+                self.syncer = BackgroundFlusher(self.fsync_pending, flush_interval, name="local-db-fsync")
+                atexit.register(self.close)
         else:
             self.users = {}
             self.chats = {}
-            self.archives = set()
-        # pending_message: {chat_id: Message dict}
-        self.pending_messages = {}
-    def get_pending_message(self, chat_id: str):
-        return self.pending_messages.get(chat_id)
+            self.user_chats = {}
+        # Mensagens pré-geradas: {chat_id: Message dict}
+        self.pending = get_pending_store('memory')
 
     def set_pending_message(self, chat_id: str, message):
-        self.pending_messages[chat_id] = message
+        self.pending.set(chat_id, message)
 
     def pop_pending_message(self, chat_id: str):
-        return self.pending_messages.pop(chat_id, None)
+        return self.pending.pop(chat_id)
     
     def load_db(self):
         os.makedirs("./temp/", exist_ok=True)
-        self.chats = load_json("./temp/chats.json")
-        # Garantir que todos os chats tenham voice_name
-        for chat in self.chats.values():
-            if 'voice_name' not in chat or not chat['voice_name']:
-                chat['voice_name'] = "Kore"
         self.users = load_json("./temp/users.json")
-        self.archives = {
-                path.stem for path in Path("./temp/archives").glob("**/*") 
-                if path.is_file()
-            } if Path("./temp/archives").exists() else set()
-        
-    @auto_save
+        self.archive_refs = load_json("./temp/archive_refs.json")
+
+        if self.storage == 'sharded':
+            self.load_shards()
+        else:
+            self.chats = load_json("./temp/chats.json")
+            # Garantir que todos os chats tenham voice_name
+            for chat in self.chats.values():
+                if 'voice_name' not in chat or not chat['voice_name']:
+                    chat['voice_name'] = "Kore"
+
+        self.build_user_index()
+
+        if self.storage == 'journal':
+            self.journal = Journal(
+                "./temp/journal.jsonl",
+                compact_every=database_configs.get('compact_every', 500)
+            )
+            for record in self.journal.replay():
+                self.apply(record)
+            if self.journal.pending_records:
+                logger.info(f"{self.journal.pending_records} registros do journal reaplicados, compactando")
+                self.compact()
+
+    def load_shards(self) -> None:
+        """Abre o armazenamento com um arquivo por chat, migrando o chats.json antigo se existir."""
+        self.chats = ShardedChats(
+            capacity=database_configs.get('chat_cache_size', 256),
+            compact_every=database_configs.get('compact_every', 500)
+        )
+        if len(self.chats) or not Path("./temp/chats.json").exists():
+            return
+
+        legacy_chats = load_json("./temp/chats.json")
+        logger.info(f"Migrando {len(legacy_chats)} chats do chats.json para arquivos individuais")
+        for chat_id, chat in legacy_chats.items():
+            if not chat.get('voice_name'):
+                chat['voice_name'] = "Kore"
+            self.chats[chat_id] = chat
+        self.chats.flush(write_atomic)
+        Path("./temp/chats.json").rename("./temp/chats.json.migrated")
+
+    def chat_meta(self, chat_id: str) -> dict:
+        """Metadados do chat (campos do MiniChat), sem carregar mensagens no modo sharded."""
+        if isinstance(self.chats, ShardedChats):
+            return self.chats.meta(chat_id)
+        return self.chats[chat_id]
+
+    def build_user_index(self) -> None:
+        """Monta o índice {user_id: [chat_id, ...]} ordenado do chat mais recente para o mais antigo."""
+        self.user_chats: dict[str, list[str]] = {}
+        metas = self.chats.metas() if isinstance(self.chats, ShardedChats) else self.chats.items()
+        ordered = sorted(metas, key=lambda item: item[1]['last_update'], reverse=True)
+        for chat_id, chat in ordered:
+            self.user_chats.setdefault(chat['user_id'], []).append(chat_id)
+
+    def touch_user_index(self, user_id: str, chat_id: str) -> None:
+        """Move o chat para o início da lista do usuário (última atualização mais recente)."""
+        with self.index_lock:
+            chat_ids = self.user_chats.get(user_id, [])
+            # Nova lista em vez de alterar a atual, para leitores concorrentes
+            self.user_chats[user_id] = [chat_id] + [item for item in chat_ids if item != chat_id]
+
+    def chat_lock(self, chat_id: str) -> threading.Lock:
+        with self.chat_locks_guard:
+            return self.chat_locks.setdefault(chat_id, threading.Lock())
+
+    def apply(self, record: dict) -> None:
+        """Aplica uma mutação nos dicionários em memória (usado ao vivo e no replay do journal)."""
+        op = record["op"]
+        if op == "create_user":
+            self.users[record["user_id"]] = record["data"]
+            with self.index_lock:
+                self.dirty_files.add("users")
+        elif op == "save_chat":
+            self.chats[record["chat_id"]] = record["data"]
+            self.touch_user_index(record["data"]["user_id"], record["chat_id"])
+        elif op == "update_chat":
+            chat_id, target, item = record["chat_id"], record["target"], record["item"]
+            if chat_id not in self.chats:
+                # Só acontece no replay de um journal corrompido ou truncado: o resto do banco ainda abre
+                logger.warning(f"Registro do journal para o chat inexistente {chat_id}, ignorando")
+                return
+            chat = self.chats[chat_id]
+            items = chat.get(target, [])
+            # A posição torna o replay idempotente caso o snapshot já contenha o item
+            if len(items) != record["position"]:
+                return
+
+            # Copy-on-write: o chat é substituído por inteiro, nunca alterado no lugar
+            chat = {**chat, target: items + [item], "last_update": record["last_update"]}
+            self.chats[chat_id] = chat
+
+            with self.index_lock:
+                for key in referenced_keys(item):
+                    self.archive_refs[key] = self.archive_refs.get(key, 0) + 1
+                    self.dirty_files.add("archive_refs")
+            if target == "messages" and chat_id in self.chat_contexts:
+                context = append_context(self.chat_contexts[chat_id], item)
+                if context is None:
+                    self.chat_contexts.pop(chat_id, None)
+                else:
+                    self.chat_contexts[chat_id] = context
+            self.touch_user_index(chat["user_id"], chat_id)
+        else:
+            raise ValueError(f"Operação desconhecida no journal: {op}")
+
+    def mutate(self, record: dict) -> None:
+        """Aplica e persiste uma mutação; alterações no mesmo chat são serializadas pelo lock do chat."""
+        if record["op"] != "update_chat":
+            self.apply(record)
+            self.commit(record)
+            return
+
+        with self.chat_lock(record["chat_id"]):
+            chat = self.chats[record["chat_id"]]
+            record["position"] = len(chat.get(record["target"], []))
+            self.apply(record)
+            # Ainda com o lock do chat, para o journal manter a ordem das posições
+            self.commit(record)
+
+    def commit(self, record: dict) -> None:
+        """Persiste uma mutação: uma linha no journal ou o snapshot completo no modo json."""
+        if not self.save:
+            return
+        durable = self.fsync_policy == 'always'
+        if self.journal is not None:
+            with self.lock:
+                # Com always, a linha do journal chega ao disco antes de a escrita retornar, mesmo em background
+                self.journal.append(record, flush=self.flusher is None or durable, fsync=durable)
+        if self.flusher is not None and (self.journal is not None or not durable):
+            # Modo background: só marca como sujo, o flusher grava depois
+            self.flusher.mark_dirty()
+        elif self.journal is None or self.journal.should_compact():
+            # Sem journal, always grava o snapshot na hora também no modo background
+            self.compact()
+        if self.syncer is not None:
+            self.syncer.mark_dirty()
+
+    def flush(self) -> None:
+        """Grava as mutações acumuladas (chamado pelo BackgroundFlusher)."""
+        if self.journal is None:
+            self.compact()
+            return
+        with self.lock:
+            self.journal.sync(fsync=self.fsync_policy != 'none')
+            should_compact = self.journal.should_compact()
+        if should_compact:
+            self.compact()
+
+    def fsync_pending(self) -> None:
+        """Faz o fsync do que foi gravado sem fsync desde a última chamada (fsync = interval no modo sync)."""
+        if self.journal is not None:
+            with self.lock:
+                self.journal.sync(fsync=True)
+        if isinstance(self.chats, ShardedChats):
+            self.chats.sync_index(fsync=True)
+        with self.flush_lock:
+            paths, self.unsynced = self.unsynced, set()
+        for file_path in paths:
+            fsync_file(file_path)
+
+    def write_file(self, file_path: str, content: str, fsync: bool) -> None:
+        # Chamado com o flush_lock
+        write_atomic(file_path, content, fsync)
+        if not fsync and self.syncer is not None:
+            self.unsynced.add(file_path)
+
+    def compact(self) -> None:
+        """Grava o snapshot completo e descarta o journal já consolidado."""
+        # interval no modo sync: grava sem fsync e deixa o fsync para o syncer
+        fsync = self.fsync_policy == 'always' or (self.fsync_policy == 'interval' and self.syncer is None)
+        with self.flush_lock:
+            with self.lock:
+                indent = 4 if self.journal is None else None
+                # Cópias rasas são atômicas e os chats são copy-on-write, então
+                # nenhuma estrutura muda durante a serialização. As marcas de
+                # alteração são limpas antes das cópias: uma mutação concorrente
+                # entra na cópia ou marca o arquivo de novo para o próximo snapshot
+                with self.index_lock:
+                    dirty, self.dirty_files = self.dirty_files, set()
+                    archive_refs = dict(self.archive_refs)
+                # Só os arquivos que mudaram são reescritos
+                files = []
+                if "users" in dirty:
+                    files.append(("./temp/users.json", json.dumps(dict(self.users), indent=indent)))
+                if "archive_refs" in dirty:
+                    files.append(("./temp/archive_refs.json", json.dumps(archive_refs)))
+                try:
+                    if isinstance(self.chats, ShardedChats):
+                        # Só os chats alterados e suas entradas do índice são escritos
+                        self.chats.flush(lambda path, content: self.write_file(path, content, fsync), indent, fsync)
+                    else:
+                        files.append(("./temp/chats.json", json.dumps(dict(self.chats), indent=indent)))
+
+                    if self.journal is not None or isinstance(self.chats, ShardedChats):
+                        # O journal só pode ser truncado junto com o snapshot do mesmo estado
+                        for file_path, content in files:
+                            self.write_file(file_path, content, fsync)
+                        if self.journal is not None:
+                            self.journal.truncate()
+                        return
+                except Exception:
+                    with self.index_lock:
+                        self.dirty_files |= dirty
+                    raise
+            try:
+                for file_path, content in files:
+                    self.write_file(file_path, content, fsync)
+            except Exception:
+                with self.index_lock:
+                    self.dirty_files |= dirty
+                raise
+
+    def close(self) -> None:
+        """Grava o que estiver pendente e fecha os arquivos (shutdown)."""
+        # Chamado pelo shutdown da API e de novo pelo atexit
+        if self.closed:
+            return
+        self.closed = True
+        logger.info(f"Mensagens pré-geradas: {self.pending.stats()}")
+        if self.flusher is not None:
+            self.flusher.stop()
+        if self.syncer is not None:
+            self.syncer.stop()
+        if self.journal is not None:
+            self.journal.close()
+        if isinstance(self.chats, ShardedChats):
+            self.chats.close()
+
+    def stats(self) -> dict[str, Any]:
+        return {"pending": self.pending.stats()}
+
     def create_user(self, user_data: CreateUser, user_id: str) -> UserDB:
         user = UserDB(
             user_id=user_id,
             name=user_data.name
         )
-        self.users[user_id] = user.model_dump()
+        record = {"op": "create_user", "user_id": user_id, "data": user.model_dump()}
+        self.mutate(record)
         return user
     
+    def archive_references(self) -> Iterator[str]:
+        for chat_id in list(self.chats):
+            chat = self.chats[chat_id]
+            for item in chat.get('messages', []) + chat.get('submits', []):
+                yield from item_archives(item)
+        for message in self.pending.messages():
+            yield from item_archives(message)
+
     def get_user(self, user_id: str) -> User:
         temp_user = self.users.get(user_id)
         if not temp_user:
             raise ValueError("User not found")
         
-        return User(**temp_user, chats=self.get_user_chats(user_id))
+        page = self.get_user_chats(user_id, CHATS_PAGE_SIZE)
+        return User(**temp_user, chats=page.chats, next_cursor=page.next_cursor)
     
     def verify_user(self, user_id: str) -> bool:
         # Sempre permitir usuário de teste do config
@@ -101,13 +484,14 @@ class LocalDatabase(DatabaseInterface):
             return True
         return user_id in self.users
     
-    def get_user_chats(self, user_id: str) -> list[MiniChat]:
-        user_chats = [
-            MiniChat(**chat) for chat in self.chats.values()
-            if chat['user_id'] == user_id
-        ]
-        user_chats.sort(key=lambda x: x.last_update, reverse=True)
-        return user_chats
+    def get_user_chats(self, user_id: str, limit: Optional[int] = None, cursor: Optional[str] = None) -> ChatPage:
+        # O índice já está em ordem de last_update, sem varrer todos os chats
+        chats = (MiniChat(**self.chat_meta(chat_id)) for chat_id in self.user_chats.get(user_id, []))
+        if cursor is not None:
+            last_update, chat_id = decode_cursor(cursor)
+            after = (datetime.fromisoformat(last_update), chat_id)
+            chats = (chat for chat in chats if (chat.last_update, chat.chat_id) < after)
+        return make_page(islice(chats, limit + 1) if limit is not None else chats, limit)
     
     def get_chat_items(self, chat_id: str) -> ChatItems:
         chat = self.chats.get(chat_id)
@@ -115,58 +499,16 @@ class LocalDatabase(DatabaseInterface):
         if not chat:
             raise ValueError("Chat not found")
         
-        chat_messages = chat.get('messages')
-
-        chat_messages.sort(key=lambda x: x['message_index'])
-
-        return ChatItems(
-            history="\n".join(item["text_voice"] for item in chat_messages),
-            painted_items=", ".join(item["paint_image"] for item in chat_messages),
-            last_image=chat_messages[-1]["image"]
-        ) 
-    
-    async def store_user_archive(self, user_id: str, file: UploadFile) -> str:
-        try:
-            user_path = Path(f"./temp/archives/{user_id}")
-            user_path.mkdir(parents=True, exist_ok=True)
-            
-            content, mime, extension = await get_mime_extension(file)
-            
-            while (file_id := f"{uuid.uuid4()}") in self.archives:
-                continue
-
-            file_name = f"{file_id}{extension}"
-            file_path = user_path / file_name
-            
-            with open(file_path, "wb") as f:
-                f.write(content)
-            
-            del content
-            
-            logger.info(f"Arquivo {mime} salvo em: {file_path}")
-            return str(file_path)
-        
-        except Exception as e:
-            logger.error(f"Error storing archive: {e}")
-            raise e
-    
-    def upload_generated_archive(
-            self, 
-            file_bytes: bytes, 
-            destination_path: str, 
-            mime_type: str,
-            base_filename: Optional[str] = None) -> str:
-        
-        filename = generate_filename(mime_type, base_filename)
-        
-        file_path = Path(f'./temp/archives/{destination_path}') / filename
-        file_path.parent.mkdir(parents=True, exist_ok=True)
-        file_path.write_bytes(file_bytes)
-        
-        file_path_str = str(file_path)
-        logger.info(f"Arquivo {mime_type} salvo em: {file_path_str}")
+        context = self.chat_contexts.get(chat_id)
+        if context is None:
+            # Montado com o lock do chat para não perder uma mensagem adicionada no meio
+            with self.chat_lock(chat_id):
+                context = build_context(self.chats[chat_id].get('messages', []))
+                if context is None:
+                    raise ValueError("Chat has no messages")
+                self.chat_contexts[chat_id] = context
 
-        return file_path_str
+        return ChatItems(**context)
     
     def assert_chat_exists(self, chat_id: str, user_id: str) -> dict:
         if chat_id not in self.chats:
@@ -177,41 +519,55 @@ class LocalDatabase(DatabaseInterface):
     
     def get_chat(self, chat_id: str, user_id:str) -> Chat:
         temp_chat = self.assert_chat_exists(chat_id, user_id)
-        return Chat(**temp_chat)
+        # Assim como no Firebase, apenas as submissões corretas entram no chat
+        subimits = [item for item in temp_chat.get('submits', []) if item['data']['is_correct']]
+        return Chat(subimits=subimits, **temp_chat)
     
     def generate_new_chat_id(self) -> str:
-        while (chat_id := str(uuid.uuid4())) in self.chats:
-            continue
-        return chat_id
+        # uuid4 tem 122 bits aleatórios: a colisão é desprezível e não precisa de consulta
+        return str(uuid.uuid4())
     
     def get_new_chat_id(self, user_id:str) -> str:
         chat_id = self.generate_new_chat_id()
         self.temp_chat_ids[user_id] = chat_id
         return chat_id
     
-    @auto_save
     def save_chat(self, user_id: str, chat: MiniChatBase) -> MiniChat:
-        chat_id = self.temp_chat_ids.get(user_id)
+        chat_id = self.temp_chat_ids.pop(user_id, None)
         if chat_id is None:
             chat_id = self.generate_new_chat_id()
-        else:
-            del self.temp_chat_ids[user_id]
         # Garante que voice_name sempre está presente
         chat_data = chat.model_dump()
         if 'voice_name' not in chat_data or not chat_data['voice_name']:
             chat_data['voice_name'] = "Kore"
-        self.chats[chat_id] = Chat(chat_id=chat_id, **chat_data)
-        return self.chats[chat_id]
+        mini_chat = MiniChat(chat_id=chat_id, **chat_data)
+        record = {
+            "op": "save_chat",
+            "chat_id": chat_id,
+            "data": {
+                **mini_chat.model_dump(mode="json"),
+                "user_id": user_id,
+                "messages": [],
+                "submits": []
+            }
+        }
+        self.mutate(record)
+        return mini_chat
     
-    @auto_save
     def update_chat(self, user_id: str, chat_id: str, target: Literal["messages", "submits"], item: SubmitImageMessage | Message) -> None:
         assert target in ["messages", "submits"], "Target must be 'messages' or 'submits'"
         
         if chat_id not in self.chats:
             raise ValueError("Chat not found")
         
-        if self.chats[chat_id]["user_id"] != user_id:
+        if self.chat_meta(chat_id)["user_id"] != user_id:
             raise ValueError("Unauthorized access")
 
-        self.chats[chat_id][target].append(item.model_dump())
-        self.chats[chat_id]["last_update"] = datetime.now(tz=timezone.utc).isoformat()
\ No newline at end of file
+        record = {
+            "op": "update_chat",
+            "chat_id": chat_id,
+            "target": target,
+            "item": item.model_dump(mode="json"),
+            "last_update": datetime.now(tz=timezone.utc).isoformat()
+        }
+        self.mutate(record)
\ No newline at end of file
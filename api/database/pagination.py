@@ -0,0 +1,42 @@
+import base64
+import json
+from datetime import datetime
+from typing import Iterable, Optional
+
+from api.constraints import config
+from api.schemas.messages import ChatPage, MiniChat
+
+# Tamanho padrão da primeira página de chats (GET /api/chats e /api/users/me)
+CHATS_PAGE_SIZE = config.get("Database", {}).get("chats_page_size", 20)
+
+# Campos projetados na listagem: só o necessário para montar um MiniChat
+MINI_CHAT_FIELDS = list(MiniChat.model_fields)
+
+def encode_cursor(chat: MiniChat) -> str:
+    """Cursor opaco apontando para depois do chat (ordem: last_update desc, chat_id desc)."""
+    raw = json.dumps([chat.last_update.isoformat(), chat.chat_id])
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+class InvalidCursor(ValueError):
+    """Cursor de paginação malformado (a rota responde 400)."""
+
+def decode_cursor(cursor: str) -> tuple[str, str]:
+    """Retorna (last_update em ISO, chat_id) do cursor, ou InvalidCursor se for inválido."""
+    try:
+        last_update, chat_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        datetime.fromisoformat(last_update)
+        return str(last_update), str(chat_id)
+    except Exception:
+        raise InvalidCursor("Invalid cursor")
+
+def make_page(chats: Iterable[MiniChat], limit: Optional[int]) -> ChatPage:
+    """
+    Monta a página a partir de até limit + 1 chats já ordenados.
+
+    O chat excedente só indica que existe uma próxima página.
+    """
+    chats = list(chats)
+    if limit is None or len(chats) <= limit:
+        return ChatPage(chats=chats)
+    chats = chats[:limit]
+    return ChatPage(chats=chats, next_cursor=encode_cursor(chats[-1]))
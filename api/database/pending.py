@@ -0,0 +1,208 @@
+import json
+import os
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta, timezone
+from typing import Any, Iterator, Optional
+
+from api.constraints import config
+from api.utils.logger import get_logger
+
+logger = get_logger(__name__)
+database_configs = config.get("Database", {})
+
+class PendingStore(ABC):
+    """
+    Armazena as mensagens pré-geradas (pending) de cada chat.
+
+    A próxima mensagem da história é gerada em background e consumida na
+    submissão do desenho, que pode cair em outro worker ou acontecer depois
+    de um restart; por isso há opções persistentes além da memória. Mensagens
+    mais antigas que o TTL são descartadas. Os contadores medem quantas
+    submissões reaproveitaram a pré-geração.
+    """
+
+    def __init__(self, ttl: float) -> None:
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.stats_lock = threading.Lock()
+
+    @abstractmethod
+    def put(self, chat_id: str, message: dict, updated_at: datetime) -> None:
+        pass
+
+    @abstractmethod
+    def take(self, chat_id: str) -> Optional[tuple[dict, datetime]]:
+        """Remove e retorna a mensagem com o momento em que foi gravada."""
+        pass
+
+    @abstractmethod
+    def messages(self) -> Iterator[dict]:
+        """Mensagens armazenadas (usado para marcar os arquivos referenciados na coleta)."""
+        pass
+
+    def set(self, chat_id: str, message: Any) -> None:
+        self.put(chat_id, message, datetime.now(tz=timezone.utc))
+
+    def pop(self, chat_id: str) -> Optional[Any]:
+        taken = self.take(chat_id)
+        expired = taken is not None and taken[1] < datetime.now(tz=timezone.utc) - timedelta(seconds=self.ttl)
+        with self.stats_lock:
+            if taken is None or expired:
+                self.misses += 1
+                self.expired += expired
+                return None
+            self.hits += 1
+        return taken[0]
+
+    def stats(self) -> dict[str, Any]:
+        with self.stats_lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "expired": self.expired,
+                "hit_rate": self.hits / total if total else 0.0,
+            }
+
+class MemoryPendingStore(PendingStore):
+    """Dicionário do processo: rápido, mas perdido em restarts e não compartilhado entre workers."""
+
+    def __init__(self, ttl: float) -> None:
+        super().__init__(ttl)
+        self.entries: dict[str, tuple[dict, datetime]] = {}
+        self.lock = threading.Lock()
+
+    def put(self, chat_id: str, message: dict, updated_at: datetime) -> None:
+        with self.lock:
+            self.entries[chat_id] = (message, updated_at)
+            # Descarta as expiradas para não acumular chats abandonados
+            cutoff = updated_at - timedelta(seconds=self.ttl)
+            for key in [key for key, (_, when) in self.entries.items() if when < cutoff]:
+                del self.entries[key]
+
+    def take(self, chat_id: str) -> Optional[tuple[dict, datetime]]:
+        with self.lock:
+            return self.entries.pop(chat_id, None)
+
+    def messages(self) -> Iterator[dict]:
+        with self.lock:
+            entries = list(self.entries.values())
+        for message, _ in entries:
+            yield message
+
+class SQLitePendingStore(PendingStore):
+    """Tabela pending_messages em um arquivo SQLite (WAL), compartilhada pelos workers da máquina."""
+
+    def __init__(self, ttl: float, path: str) -> None:
+        super().__init__(ttl)
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.local = threading.local()
+        with self.connection() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS pending_messages (
+                    chat_id TEXT PRIMARY KEY,
+                    data TEXT NOT NULL,
+                    updated_at TEXT NOT NULL
+                )
+                """
+            )
+
+    def connection(self) -> sqlite3.Connection:
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self.local.conn = conn
+        return conn
+
+    def put(self, chat_id: str, message: dict, updated_at: datetime) -> None:
+        cutoff = updated_at - timedelta(seconds=self.ttl)
+        with self.connection() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO pending_messages (chat_id, data, updated_at) VALUES (?, ?, ?)",
+                (chat_id, json.dumps(message), updated_at.isoformat())
+            )
+            conn.execute("DELETE FROM pending_messages WHERE updated_at < ?", (cutoff.isoformat(),))
+
+    def take(self, chat_id: str) -> Optional[tuple[dict, datetime]]:
+        with self.connection() as conn:
+            row = conn.execute(
+                "DELETE FROM pending_messages WHERE chat_id = ? RETURNING data, updated_at", (chat_id,)
+            ).fetchone()
+        return (json.loads(row[0]), datetime.fromisoformat(row[1])) if row else None
+
+    def messages(self) -> Iterator[dict]:
+        for (data,) in self.connection().execute("SELECT data FROM pending_messages"):
+            yield json.loads(data)
+
+class FirestorePendingStore(PendingStore):
+    """
+    Coleção pending_messages no Firestore, compartilhada por todas as instâncias.
+
+    O campo expires_at permite configurar uma política de TTL do Firestore
+    para apagar documentos esquecidos.
+    """
+
+    def __init__(self, ttl: float, client: Any) -> None:
+        super().__init__(ttl)
+        self.collection = client.collection('pending_messages')
+        self.client = client
+
+    def put(self, chat_id: str, message: dict, updated_at: datetime) -> None:
+        self.collection.document(chat_id).set({
+            'data': message,
+            'updated_at': updated_at,
+            'expires_at': updated_at + timedelta(seconds=self.ttl),
+        })
+
+    def take(self, chat_id: str) -> Optional[tuple[dict, datetime]]:
+        from firebase_admin import firestore  # type:ignore
+
+        ref = self.collection.document(chat_id)
+
+        @firestore.transactional
+        def _take(transaction) -> Optional[dict]:
+            snapshot = ref.get(transaction=transaction)
+            if not snapshot.exists:
+                return None
+            transaction.delete(ref)
+            return snapshot.to_dict()
+
+        document = _take(self.client.transaction())
+        return (document['data'], document['updated_at']) if document else None
+
+    def messages(self) -> Iterator[dict]:
+        for doc in self.collection.select(['data.image', 'data.audio']).stream():
+            yield (doc.to_dict() or {}).get('data', {})
+
+def get_pending_store(default: str, sqlite_path: Optional[str] = None, firestore_client: Any = None) -> PendingStore:
+    """
+    Cria o armazenamento configurado em `pending_store` (memory | sqlite | firestore).
+
+    Sem a chave, cada banco usa o seu padrão: memória no local, o próprio
+    arquivo no SQLite e a coleção no Firestore.
+    """
+    kind = database_configs.get('pending_store', default)
+    ttl = database_configs.get('pending_ttl', 3600)
+
+    if kind == 'firestore' and firestore_client is None:
+        logger.warning("pending_store = firestore requer o banco Firebase, usando sqlite")
+        kind = 'sqlite'
+
+    if kind == 'firestore':
+        store: PendingStore = FirestorePendingStore(ttl, firestore_client)
+    elif kind == 'sqlite':
+        path = database_configs.get('pending_sqlite_path', sqlite_path or './temp/pending.db')
+        store = SQLitePendingStore(ttl, path)
+    else:
+        store = MemoryPendingStore(ttl)
+
+    logger.info(f"Mensagens pré-geradas armazenadas em: {kind} (TTL de {ttl} segundos)")
+    return store
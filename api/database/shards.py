@@ -0,0 +1,140 @@
+import json
+import threading
+from collections import OrderedDict
+from collections.abc import MutableMapping
+from pathlib import Path
+from typing import Callable, Iterator, Optional
+
+from api.database.journal import Journal
+from api.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Campos do chat mantidos no índice (o suficiente para montar um MiniChat)
+INDEX_FIELDS = ("chat_id", "user_id", "title", "chat_image", "last_update", "voice_name")
+
+class ShardedChats(MutableMapping):
+    """
+    Chats do LocalDatabase em um arquivo por chat mais um índice pequeno.
+
+    O índice (metadados de todos os chats) é lido no startup; o conteúdo de
+    cada chat só é carregado no primeiro acesso e fica em um LRU limitado.
+    Chats alterados ficam marcados como sujos até a próxima gravação e não
+    são removidos do LRU antes disso.
+
+    Uma gravação escreve só os arquivos dos chats alterados. As entradas do
+    índice que mudaram vão para um journal (uma linha por chat); o índice
+    completo só é reescrito quando o journal é compactado.
+    """
+
+    def __init__(self, root: str = "./temp/chats", index_path: str = "./temp/chats_index.json",
+                 capacity: int = 256, compact_every: int = 500) -> None:
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.index_path = Path(index_path)
+        self.capacity = capacity
+        self.cache: OrderedDict[str, dict] = OrderedDict()
+        self.dirty: set[str] = set()
+        # Entradas do índice alteradas desde a última gravação (None: chat removido)
+        self.index_changes: dict[str, Optional[dict]] = {}
+        self.lock = threading.RLock()
+
+        try:
+            self.index: dict[str, dict] = json.loads(self.index_path.read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            self.index = {}
+        self.index_journal = Journal(f"{self.index_path.with_suffix('')}.jsonl", compact_every=compact_every)
+        for entry in self.index_journal.replay():
+            if entry.get("removed"):
+                self.index.pop(entry["chat_id"], None)
+            else:
+                self.index[entry["chat_id"]] = entry
+
+    def shard_path(self, chat_id: str) -> Path:
+        return self.root / f"{chat_id}.json"
+
+    def meta(self, chat_id: str) -> dict:
+        """Metadados do chat sem carregar o arquivo completo."""
+        return self.index[chat_id]
+
+    def metas(self) -> Iterator[tuple[str, dict]]:
+        return iter(list(self.index.items()))
+
+    def __contains__(self, chat_id: object) -> bool:
+        return chat_id in self.index
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(list(self.index))
+
+    def __getitem__(self, chat_id: str) -> dict:
+        with self.lock:
+            if chat_id in self.cache:
+                self.cache.move_to_end(chat_id)
+                return self.cache[chat_id]
+            if chat_id not in self.index:
+                raise KeyError(chat_id)
+
+            chat = json.loads(self.shard_path(chat_id).read_text(encoding="utf-8"))
+            self.cache[chat_id] = chat
+            self.evict()
+            return chat
+
+    def __setitem__(self, chat_id: str, chat: dict) -> None:
+        with self.lock:
+            self.cache[chat_id] = chat
+            self.cache.move_to_end(chat_id)
+            self.index[chat_id] = {field: chat.get(field) for field in INDEX_FIELDS}
+            self.index[chat_id]["chat_id"] = chat_id
+            self.index_changes[chat_id] = self.index[chat_id]
+            self.dirty.add(chat_id)
+            self.evict()
+
+    def __delitem__(self, chat_id: str) -> None:
+        with self.lock:
+            del self.index[chat_id]
+            self.cache.pop(chat_id, None)
+            self.dirty.discard(chat_id)
+            self.index_changes[chat_id] = None
+            self.shard_path(chat_id).unlink(missing_ok=True)
+
+    def evict(self) -> None:
+        # Remove os chats menos usados que já estão gravados em disco
+        for chat_id in list(self.cache):
+            if len(self.cache) <= self.capacity:
+                break
+            if chat_id not in self.dirty:
+                del self.cache[chat_id]
+
+    def flush(self, write: Callable[[str, str], None], indent: Optional[int] = None, fsync: bool = False) -> None:
+        """Grava os chats alterados e as entradas do índice usando a função de escrita do banco."""
+        # A gravação acontece com o lock para que um chat não seja descartado
+        # do LRU e relido do disco antes de o arquivo novo estar completo
+        with self.lock:
+            for chat_id in list(self.dirty):
+                write(str(self.shard_path(chat_id)), json.dumps(self.cache[chat_id], indent=indent))
+                self.dirty.discard(chat_id)
+            if self.index_changes:
+                # Depois dos arquivos dos chats: uma entrada nunca aponta para um chat ainda não gravado
+                for chat_id, entry in self.index_changes.items():
+                    self.index_journal.append(entry if entry is not None else {"chat_id": chat_id, "removed": True}, flush=False)
+                self.index_journal.sync(fsync)
+                self.index_changes.clear()
+                if self.index_journal.should_compact():
+                    self.compact_index(write, indent)
+            self.evict()
+
+    def compact_index(self, write: Callable[[str, str], None], indent: Optional[int] = None) -> None:
+        """Reescreve o índice completo e descarta o journal já consolidado."""
+        with self.lock:
+            write(str(self.index_path), json.dumps(self.index, indent=indent))
+            self.index_journal.truncate()
+
+    def sync_index(self, fsync: bool = False) -> None:
+        with self.lock:
+            self.index_journal.sync(fsync)
+
+    def close(self) -> None:
+        self.index_journal.close()
@@ -0,0 +1,337 @@
+from fastapi import HTTPException
+import json
+import os
+import sqlite3
+import threading
+import uuid
+from datetime import datetime, timezone
+from typing import Literal, Optional, Any, Iterator
+
+from api.database.interface import DatabaseInterface
+from api.database.local import LocalArchiveStore
+from api.database.context import build_context, append_context
+from api.database.archives import item_archives, referenced_keys
+from api.database.pending import get_pending_store
+from api.database.pagination import CHATS_PAGE_SIZE, decode_cursor, make_page
+from api.schemas.users import User, CreateUser, UserDB
+from api.schemas.messages import Chat, ChatItems, ChatPage, MiniChatBase, MiniChat, SubmitImageMessage, Message
+from api.utils.logger import get_logger
+from api.constraints import config
+
+database_configs = config.get("Database", {})
+# Obter usuário de teste do config
+TEST_USER = config.get("APISettings", {}).get("test_user", "")
+
+logger = get_logger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    user_id TEXT PRIMARY KEY,
+    name TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS chats (
+    chat_id TEXT PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    title TEXT NOT NULL,
+    chat_image TEXT NOT NULL,
+    last_update TEXT NOT NULL,
+    voice_name TEXT NOT NULL DEFAULT 'Kore'
+);
+CREATE INDEX IF NOT EXISTS idx_chats_user ON chats (user_id, last_update DESC);
+
+CREATE TABLE IF NOT EXISTS messages (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    chat_id TEXT NOT NULL REFERENCES chats (chat_id),
+    message_index INTEGER NOT NULL,
+    text_voice TEXT NOT NULL,
+    paint_image TEXT NOT NULL,
+    image TEXT NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_messages_chat ON messages (chat_id, message_index);
+
+CREATE TABLE IF NOT EXISTS submits (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    chat_id TEXT NOT NULL REFERENCES chats (chat_id),
+    message_index INTEGER NOT NULL,
+    is_correct INTEGER NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_submits_chat ON submits (chat_id, is_correct, message_index);
+
+CREATE TABLE IF NOT EXISTS chat_contexts (
+    chat_id TEXT PRIMARY KEY REFERENCES chats (chat_id),
+    history TEXT NOT NULL,
+    painted_items TEXT NOT NULL,
+    last_image TEXT NOT NULL,
+    last_index INTEGER NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS archive_refs (
+    content_key TEXT PRIMARY KEY,
+    refs INTEGER NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS pending_messages (
+    chat_id TEXT PRIMARY KEY,
+    data TEXT NOT NULL,
+    updated_at TEXT NOT NULL
+);
+"""
+
+class SQLiteDatabase(LocalArchiveStore, DatabaseInterface):
+    """
+    Banco local em SQLite com WAL.
+
+    Cada thread usa sua própria conexão: no modo WAL os leitores (rotas) não
+    bloqueiam as threads de pré-processamento que escrevem, e as escritas são
+    serializadas pelo próprio SQLite.
+    """
+
+    def __init__(self) -> None:
+        self.path = database_configs.get('sqlite_path', './temp/louie.db')
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self.local = threading.local()
+        self.temp_chat_ids: dict[str, str] = {}
+
+        with self.connection() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+
+        logger.info(f"Banco SQLite aberto em: {self.path}")
+        # Por padrão as mensagens pré-geradas ficam no próprio arquivo do banco
+        self.pending = get_pending_store('sqlite', sqlite_path=self.path)
+
+    def connection(self) -> sqlite3.Connection:
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA foreign_keys=ON")
+            self.local.conn = conn
+        return conn
+
+    def close(self) -> None:
+        logger.info(f"Mensagens pré-geradas: {self.pending.stats()}")
+
+    def stats(self) -> dict[str, Any]:
+        return {"pending": self.pending.stats()}
+
+    # --- Pending Message Helpers ---
+
+    def set_pending_message(self, chat_id: str, message: Any) -> None:
+        self.pending.set(chat_id, message)
+
+    def pop_pending_message(self, chat_id: str) -> Optional[Any]:
+        return self.pending.pop(chat_id)
+
+    def archive_references(self) -> Iterator[str]:
+        rows = self.connection().execute(
+            """
+            SELECT json_extract(data, '$.image') AS image, json_extract(data, '$.audio') AS audio FROM messages
+            UNION ALL
+            SELECT json_extract(data, '$.image'), json_extract(data, '$.audio') FROM submits
+            """
+        )
+        for row in rows:
+            yield from item_archives(dict(row))
+        for message in self.pending.messages():
+            yield from item_archives(message)
+
+    # --- User Functions ---
+
+    def create_user(self, user_data: CreateUser, user_id: str) -> UserDB:
+        user = UserDB(
+            user_id=user_id,
+            name=user_data.name
+        )
+        with self.connection() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO users (user_id, name) VALUES (?, ?)",
+                (user.user_id, user.name)
+            )
+        return user
+
+    def get_user(self, user_id: str) -> User:
+        row = self.connection().execute(
+            "SELECT user_id, name FROM users WHERE user_id = ?", (user_id,)
+        ).fetchone()
+        if not row:
+            raise ValueError("User not found")
+
+        page = self.get_user_chats(user_id, CHATS_PAGE_SIZE)
+        return User(**dict(row), chats=page.chats, next_cursor=page.next_cursor)
+
+    def verify_user(self, user_id: str) -> bool:
+        # Sempre permitir usuário de teste do config
+        if user_id == TEST_USER:
+            return True
+        row = self.connection().execute(
+            "SELECT 1 FROM users WHERE user_id = ?", (user_id,)
+        ).fetchone()
+        return row is not None
+
+    # --- Chat Functions ---
+
+    def get_user_chats(self, user_id: str, limit: Optional[int] = None, cursor: Optional[str] = None) -> ChatPage:
+        query = "SELECT chat_id, title, chat_image, last_update, voice_name FROM chats WHERE user_id = ?"
+        params: list[Any] = [user_id]
+        if cursor is not None:
+            query += " AND (last_update, chat_id) < (?, ?)"
+            params.extend(decode_cursor(cursor))
+        query += " ORDER BY last_update DESC, chat_id DESC"
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(limit + 1)
+
+        rows = self.connection().execute(query, params).fetchall()
+        return make_page((MiniChat(**dict(row)) for row in rows), limit)
+
+    def get_chat_items(self, chat_id: str) -> ChatItems:
+        row = self.connection().execute(
+            "SELECT history, painted_items, last_image FROM chat_contexts WHERE chat_id = ?",
+            (chat_id,)
+        ).fetchone()
+        if row is not None:
+            return ChatItems(**dict(row))
+
+        # Chats anteriores à tabela de contexto: reconstrói uma única vez
+        with self.connection() as conn:
+            context = self.rebuild_context(conn, chat_id)
+        if context is None:
+            raise ValueError("Chat not found")
+
+        return ChatItems(**context)
+
+    def rebuild_context(self, conn: sqlite3.Connection, chat_id: str) -> Optional[dict]:
+        rows = conn.execute(
+            "SELECT message_index, text_voice, paint_image, image FROM messages WHERE chat_id = ? ORDER BY id",
+            (chat_id,)
+        ).fetchall()
+        context = build_context([dict(row) for row in rows])
+        if context is not None:
+            self.write_context(conn, chat_id, context)
+        return context
+
+    def write_context(self, conn: sqlite3.Connection, chat_id: str, context: dict) -> None:
+        conn.execute(
+            """
+            INSERT OR REPLACE INTO chat_contexts (chat_id, history, painted_items, last_image, last_index)
+            VALUES (:chat_id, :history, :painted_items, :last_image, :last_index)
+            """,
+            {"chat_id": chat_id, **context}
+        )
+
+    def assert_chat_exists(self, chat_id: str, user_id: str) -> dict:
+        row = self.connection().execute(
+            "SELECT * FROM chats WHERE chat_id = ?", (chat_id,)
+        ).fetchone()
+        if row is None:
+            raise HTTPException(status_code=404, detail="Chat not found")
+        if row["user_id"] != user_id:
+            raise HTTPException(status_code=403, detail="Unauthorized access")
+        return dict(row)
+
+    def get_chat(self, chat_id: str, user_id: str) -> Chat:
+        row = self.connection().execute(
+            """
+            SELECT c.*,
+                (SELECT json_group_array(json(data)) FROM (
+                    SELECT data FROM messages WHERE chat_id = c.chat_id
+                    ORDER BY message_index, id)) AS messages,
+                (SELECT json_group_array(json(data)) FROM (
+                    SELECT data FROM submits WHERE chat_id = c.chat_id AND is_correct = 1
+                    ORDER BY message_index, id)) AS subimits
+            FROM chats c WHERE c.chat_id = ?
+            """,
+            (chat_id,)
+        ).fetchone()
+
+        if row is None:
+            raise HTTPException(status_code=404, detail="Chat not found")
+        if row["user_id"] != user_id:
+            raise HTTPException(status_code=403, detail="Unauthorized access")
+
+        chat_data = dict(row)
+        chat_data["messages"] = json.loads(chat_data["messages"])
+        chat_data["subimits"] = json.loads(chat_data["subimits"])
+        return Chat(**chat_data)
+
+    def generate_new_chat_id(self) -> str:
+        # Sem consulta: uma colisão de uuid4 esbarraria na PRIMARY KEY em vez de sobrescrever
+        return str(uuid.uuid4())
+
+    def get_new_chat_id(self, user_id: str) -> str:
+        chat_id = self.generate_new_chat_id()
+        self.temp_chat_ids[user_id] = chat_id
+        return chat_id
+
+    def save_chat(self, user_id: str, chat: MiniChatBase) -> MiniChat:
+        chat_id = self.temp_chat_ids.pop(user_id, None)
+        if chat_id is None:
+            chat_id = self.generate_new_chat_id()
+
+        chat_data = chat.model_dump()
+        if not chat_data.get('voice_name'):
+            chat_data['voice_name'] = "Kore"
+        mini_chat = MiniChat(chat_id=chat_id, **chat_data)
+
+        with self.connection() as conn:
+            conn.execute(
+                """
+                INSERT INTO chats (chat_id, user_id, title, chat_image, last_update, voice_name)
+                VALUES (?, ?, ?, ?, ?, ?)
+                """,
+                (chat_id, user_id, mini_chat.title, mini_chat.chat_image,
+                 mini_chat.last_update.isoformat(), mini_chat.voice_name)
+            )
+        return mini_chat
+
+    def update_chat(self, user_id: str, chat_id: str, target: Literal["messages", "submits"], item: SubmitImageMessage | Message) -> None:
+        assert target in ["messages", "submits"], "Target must be 'messages' or 'submits'"
+
+        data = item.model_dump_json()
+        item_json = item.model_dump()
+
+        with self.connection() as conn:
+            updated = conn.execute(
+                "UPDATE chats SET last_update = ? WHERE chat_id = ? AND user_id = ?",
+                (datetime.now(tz=timezone.utc).isoformat(), chat_id, user_id)
+            ).rowcount
+            if not updated:
+                # Chat inexistente (404) ou de outro usuário (403), como nos outros bancos
+                self.assert_chat_exists(chat_id, user_id)
+
+            if target == "messages":
+                conn.execute(
+                    """
+                    INSERT INTO messages (chat_id, message_index, text_voice, paint_image, image, data)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                    """,
+                    (chat_id, item.message_index, item.text_voice, item.paint_image, item.image, data) # type:ignore
+                )
+                row = conn.execute(
+                    "SELECT history, painted_items, last_image, last_index FROM chat_contexts WHERE chat_id = ?",
+                    (chat_id,)
+                ).fetchone()
+                # Sem contexto ainda (ou mensagem fora de ordem): reconstrói, já incluindo este item
+                context = append_context(dict(row), item_json) if row else None
+                if context is None:
+                    self.rebuild_context(conn, chat_id)
+                else:
+                    self.write_context(conn, chat_id, context)
+            else:
+                conn.execute(
+                    "INSERT INTO submits (chat_id, message_index, is_correct, data) VALUES (?, ?, ?, ?)",
+                    (chat_id, item.message_index, int(item.data.is_correct), data) # type:ignore
+                )
+
+            conn.executemany(
+                """
+                INSERT INTO archive_refs (content_key, refs) VALUES (?, 1)
+                ON CONFLICT (content_key) DO UPDATE SET refs = refs + 1
+                """,
+                [(key,) for key in referenced_keys(item_json)]
+            )
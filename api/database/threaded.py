@@ -0,0 +1,69 @@
+import asyncio
+from typing import Any, Literal, Optional, cast
+
+from fastapi import UploadFile
+
+from api.database.executor import get_database_executor
+from api.database.interface import AsyncDatabaseInterface, DatabaseInterface
+from api.database.local import LocalArchiveStore
+from api.schemas.messages import Chat, ChatItems, ChatPage, Message, MiniChat, MiniChatBase, SubmitImageMessage
+from api.schemas.users import CreateUser, User, UserDB
+from api.utils import get_mime_extension
+
+class ThreadedDatabase(AsyncDatabaseInterface):
+    """
+    Adapta um banco síncrono (local ou SQLite) para as rotas assíncronas.
+
+    Cada chamada roda no pool de threads do banco, então o disco ou o
+    SQLite nunca seguram o loop de eventos.
+    """
+
+    def __init__(self, database: DatabaseInterface) -> None:
+        self.database = database
+        self.executor = get_database_executor()
+
+    async def close(self) -> None:
+        # shutdown aguarda as chamadas em andamento: fora do loop de eventos
+        await asyncio.to_thread(self.executor.shutdown)
+
+    async def set_pending_message(self, chat_id: str, message: Any) -> None:
+        await self.executor.run(self.database.set_pending_message, chat_id, message)
+
+    async def pop_pending_message(self, chat_id: str) -> Optional[Any]:
+        return await self.executor.run(self.database.pop_pending_message, chat_id)
+
+    async def create_user(self, user_data: CreateUser, user_id: str) -> UserDB:
+        return await self.executor.run(self.database.create_user, user_data, user_id)
+
+    async def get_user(self, user_id: str) -> User:
+        return await self.executor.run(self.database.get_user, user_id)
+
+    async def verify_user(self, user_id: str) -> bool:
+        return await self.executor.run(self.database.verify_user, user_id)
+
+    async def get_user_chats(self, user_id: str, limit: Optional[int] = None, cursor: Optional[str] = None) -> ChatPage:
+        return await self.executor.run(self.database.get_user_chats, user_id, limit, cursor)
+
+    async def get_chat_items(self, chat_id: str) -> ChatItems:
+        return await self.executor.run(self.database.get_chat_items, chat_id)
+
+    async def store_user_archive(self, user_id: str, file: UploadFile) -> str:
+        # A leitura do upload é assíncrona; só a gravação em disco vai para o pool
+        content, mime, extension = await get_mime_extension(file)
+        store = cast(LocalArchiveStore, self.database)
+        return await self.executor.run(store.write_user_archive, user_id, content, mime, extension)
+
+    async def upload_generated_archive(self, file_bytes: bytes, destination_path: str, mime_type: str, base_filename: Optional[str] = None) -> str:
+        return await self.executor.run(self.database.upload_generated_archive, file_bytes, destination_path, mime_type, base_filename)
+
+    async def get_chat(self, chat_id: str, user_id: str) -> Chat:
+        return await self.executor.run(self.database.get_chat, chat_id, user_id)
+
+    async def get_new_chat_id(self, user_id: str) -> str:
+        return await self.executor.run(self.database.get_new_chat_id, user_id)
+
+    async def save_chat(self, user_id: str, chat: MiniChatBase) -> MiniChat:
+        return await self.executor.run(self.database.save_chat, user_id, chat)
+
+    async def update_chat(self, user_id: str, chat_id: str, target: Literal["messages", "submits"], item: SubmitImageMessage | Message) -> None:
+        await self.executor.run(self.database.update_chat, user_id, chat_id, target, item)
@@ -1,10 +1,16 @@
 import api.utils.logger
+import asyncio
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 import os
 import json
 
 from api.routes import router as api_router
+from api.database import db, adb
+from api.database.collector import ArchiveCollector
+from api.database.executor import get_database_executor
+from api.services.prefetch import scheduler, shutdown_timeout
+from api.constraints import config
 
 app = FastAPI(
     title="Louie API",
@@ -24,6 +30,22 @@ app.add_middleware(
 
 app.include_router(api_router, prefix="")
 
+archive_collector = ArchiveCollector(db)
+
+@app.on_event("startup")
+def startup():
+    if config.get("ArchiveGC", {}).get("enable", False):
+        archive_collector.start()
+
+@app.on_event("shutdown")
+async def shutdown():
+    archive_collector.stop()
+    # Aguarda os jobs em andamento antes de fechar o banco (em uma thread, sem travar o loop de eventos)
+    await asyncio.to_thread(scheduler.stop, shutdown_timeout)
+    await adb.close()
+    # Garante que escritas agrupadas em background cheguem ao disco
+    await asyncio.to_thread(db.close)
+
 @app.get(
     "/", 
     status_code=200,
@@ -38,3 +60,18 @@ async def root():
         "docs": "/api/docs",
         "redoc": "/api/redoc"
     }
+
+@app.get(
+    "/api/health",
+    status_code=200,
+    summary="Saúde e métricas",
+    description="Métricas em tempo de execução: fila e espera do pool do banco, jobs em background, caches e mensagens pré-geradas.",
+    tags=["Sistema"]
+)
+async def health():
+    return {
+        "status": "ok",
+        "database": db.stats(),
+        "database_executor": get_database_executor().stats(),
+        "scheduler": scheduler.stats()
+    }
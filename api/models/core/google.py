@@ -1,5 +1,5 @@
 from api.constraints import config
-from api.database import db
+from api.database import db, adb
 from api.models.core.interface import CoreModelInterface, models_list
 import api.models.prompts as prompts
 from api.schemas.llm import NewChat, ContinueChat, SubmitImageResponse, AssertContinueChat
@@ -17,6 +17,7 @@ from langchain_google_genai import ChatGoogleGenerativeAI
 import os
 import time
 from typing import Union, List, Literal, Optional, Any, cast
+from uuid import uuid4
 
 logger = get_logger(__name__)
 load_dotenv()
@@ -75,17 +76,24 @@ class GoogleModel(CoreModelInterface):
             google_api_key=GEMINI_API_KEY
         ).with_structured_output(AssertContinueChat)
 
-    def new_chat(self, child_name:str, instruction:str) ->NewChat:
-        messages : List[Union[SystemMessage, HumanMessage]] = [
+    def new_chat_messages(self, child_name:str, instruction:str) -> List[BaseMessage]:
+        return [
             SystemMessage(content=prompts.initial_prompt_schema + prompts.initial_json_input.format(child_name=child_name)),
             HumanMessage(content=instruction)
             ]
-        result = self.new_chat_llm.invoke(messages)
+
+    def new_chat(self, child_name:str, instruction:str) ->NewChat:
+        result = self.new_chat_llm.invoke(self.new_chat_messages(child_name, instruction))
         assert isinstance(result, NewChat)
         return result
 
-    def continue_chat(self, items:ChatItems, user_name:str) -> ContinueChat:
-        messages = [
+    async def anew_chat(self, child_name:str, instruction:str) -> NewChat:
+        result = await self.new_chat_llm.ainvoke(self.new_chat_messages(child_name, instruction))
+        assert isinstance(result, NewChat)
+        return result
+
+    def continue_chat_messages(self, items:ChatItems, user_name:str) -> List[BaseMessage]:
+        return [
             AIMessage(content=[{
                 "type": "image_url",
                 "image_url": items.last_image,
@@ -99,15 +107,29 @@ class GoogleModel(CoreModelInterface):
             
             HumanMessage(content="Continue a história")
         ]
+
+    def continue_chat(self, items:ChatItems, user_name:str) -> ContinueChat:
+        messages = self.continue_chat_messages(items, user_name)
         
         result = self.continue_chat_llm.invoke(messages)
         assert isinstance(result, ContinueChat)
         
         if config.get("Models", {}).get("assert_continue", True):
-            result = self.assert_continue_chat(items, user_name, cast(List[BaseMessage], messages), result)
+            result = self.assert_continue_chat(items, user_name, messages, result)
 
         return result # type:ignore
 
+    async def acontinue_chat(self, items:ChatItems, user_name:str) -> ContinueChat:
+        messages = self.continue_chat_messages(items, user_name)
+
+        result = await self.continue_chat_llm.ainvoke(messages)
+        assert isinstance(result, ContinueChat)
+
+        if config.get("Models", {}).get("assert_continue", True):
+            result = await self.aassert_continue_chat(items, user_name, messages, result)
+
+        return result
+
     async def submit(self, image_file: UploadFile, target:str, user_name:str) -> SubmitImageResponse:
         image_bytes, mime_type, _ = await get_mime_extension(image_file)
 
@@ -126,17 +148,14 @@ class GoogleModel(CoreModelInterface):
             HumanMessage(content=[image_message, f"O meu desenho é de um/uma {target}. O que você achou?"]),
         ]
 
-        result = self.submit_llm.invoke(messages)
+        result = await self.submit_llm.ainvoke(messages)
 
         assert isinstance(result, SubmitImageResponse)
         
         return result
 
-    def assert_continue_chat(self, items: ChatItems, user_name: str,
-                             messages: List[Any], 
-                             result:ContinueChat) -> ContinueChat:
-        
-        messages += [
+    def assert_continue_messages(self, items: ChatItems, result: ContinueChat) -> List[BaseMessage]:
+        return [
             AIMessage(content=result.model_dump_json()),
             SystemMessage(content=prompts.assert_continue_chat_prompt_schema + 
                           prompts.assert_continue_chat_input.format(
@@ -145,6 +164,21 @@ class GoogleModel(CoreModelInterface):
                 requested_item=result.paint_image,
             ))
         ]
+
+    def fix_history_message(self, items: ChatItems, user_name: str, feedback: str) -> SystemMessage:
+        return SystemMessage(content=prompts.fix_history_prompt_schema + 
+                             prompts.fix_history_prompt_input.format(
+                feedback = feedback,
+                history=items.history,
+                painted_items=items.painted_items,
+                child_name=user_name
+            ))
+
+    def assert_continue_chat(self, items: ChatItems, user_name: str,
+                             messages: List[Any], 
+                             result:ContinueChat) -> ContinueChat:
+        
+        messages += self.assert_continue_messages(items, result)
         
         logger.debug(f"Enviando prompt de validação para {self.get_model_name('assert_continue')}")
         start_time = time.time()
@@ -155,13 +189,7 @@ class GoogleModel(CoreModelInterface):
         if not assert_result.is_correct:
             logger.warning(f"Validação do chat para o usuário falhou: {assert_result.feedback}")
             
-            messages.append(SystemMessage(content=prompts.fix_history_prompt_schema + 
-                                          prompts.fix_history_prompt_input.format(
-                    feedback = assert_result.feedback,
-                    history=items.history,
-                    painted_items=items.painted_items,
-                    child_name=user_name
-                )))
+            messages.append(self.fix_history_message(items, user_name, assert_result.feedback))
             
             logger.debug(f"Enviando prompt de correção para {self.get_model_name('continue_chat')}")
             start_time = time.time()
@@ -170,57 +198,84 @@ class GoogleModel(CoreModelInterface):
             logger.debug(f"Resposta de correção recebida: {result} em {time.time() - start_time:.2f} segundos.")
 
         return result
-    
-    def generate_text_to_voice(self, content: str, instructions:str, user_id:str, voice_name:Optional[str]=None,
-                               chat_id: Optional[str] = None, message_id: Optional[int] = None, feedback:bool=False) -> str:
-        
-        if voice_name is None:
-            voice_name = default_voice_name
 
-        response = self.google_client.models.generate_content(
-           model=self.generate_voice_model,
-           contents=instructions + content,
-           config=types.GenerateContentConfig(
-              response_modalities=["AUDIO"],
-              speech_config=types.SpeechConfig(
-                 voice_config=types.VoiceConfig(
-                    prebuilt_voice_config=types.PrebuiltVoiceConfig(
-                       voice_name=voice_name,
-                    )
+    async def aassert_continue_chat(self, items: ChatItems, user_name: str,
+                                    messages: List[Any],
+                                    result:ContinueChat) -> ContinueChat:
+
+        messages += self.assert_continue_messages(items, result)
+
+        logger.debug(f"Enviando prompt de validação para {self.get_model_name('assert_continue')}")
+        start_time = time.time()
+        assert_result = await self.assert_continue_llm.ainvoke(messages)
+        assert isinstance(assert_result, AssertContinueChat)
+        logger.debug(f"Resposta de validação recebida: {assert_result.is_correct} em {time.time() - start_time:.2f} segundos.")
+
+        if not assert_result.is_correct:
+            logger.warning(f"Validação do chat para o usuário falhou: {assert_result.feedback}")
+
+            messages.append(self.fix_history_message(items, user_name, assert_result.feedback))
+
+            logger.debug(f"Enviando prompt de correção para {self.get_model_name('continue_chat')}")
+            start_time = time.time()
+            result = await self.continue_chat_llm.ainvoke(messages) #type:ignore
+            assert isinstance(result, ContinueChat)
+            logger.debug(f"Resposta de correção recebida: {result} em {time.time() - start_time:.2f} segundos.")
+
+        return result
+
+    def voice_config(self, voice_name: Optional[str]) -> types.GenerateContentConfig:
+        return types.GenerateContentConfig(
+           response_modalities=["AUDIO"],
+           speech_config=types.SpeechConfig(
+              voice_config=types.VoiceConfig(
+                 prebuilt_voice_config=types.PrebuiltVoiceConfig(
+                    voice_name=voice_name or default_voice_name,
                  )
-              ),
-           )
+              )
+           ),
         )
 
+    def voice_upload(self, response: types.GenerateContentResponse, user_id:str, chat_id: Optional[str],
+                     message_id: Optional[int], feedback: bool) -> dict[str, Any]:
+        """Argumentos de upload_generated_archive para o áudio da resposta."""
         audio_bytes = convert_raw_audio_to_wav(response.candidates[0].content.parts[0].inline_data.data ) #type:ignore
 
-        del response
-
         destination_path = f"{user_id}/{chat_id}/{message_id}/audio" if chat_id and (message_id is not None) else f"{user_id}/audio"
 
         # Para evitar cache do navegador tocar um feedback antigo no mesmo message_id,
         # use um nome de arquivo único quando for feedback.
-        from uuid import uuid4
-        return db.upload_generated_archive(
-            audio_bytes,
-            destination_path=destination_path,
-            mime_type='audio/wav',
-            base_filename=(f"feedback-{uuid4().hex}") if feedback else None
-        )
+        return {
+            "file_bytes": audio_bytes,
+            "destination_path": destination_path,
+            "mime_type": 'audio/wav',
+            "base_filename": (f"feedback-{uuid4().hex}") if feedback else None
+        }
     
-    def generate_scene_image(self, description: str, user_id:str, 
-                             chat_id:Optional[str] = None, message_id: Optional[int] = None) ->str:
-        
-        contents = ("Crie uma imagem cartunesca a partir dessa descrição: ",  description)
-
+    def generate_text_to_voice(self, content: str, instructions:str, user_id:str, voice_name:Optional[str]=None,
+                               chat_id: Optional[str] = None, message_id: Optional[int] = None, feedback:bool=False) -> str:
         response = self.google_client.models.generate_content(
-            model=self.generate_image_model,
-            contents=contents, #type:ignore
-            config=types.GenerateContentConfig(
-                response_modalities=["TEXT", "IMAGE"],
-            )
+           model=self.generate_voice_model,
+           contents=instructions + content,
+           config=self.voice_config(voice_name)
+        )
+        return db.upload_generated_archive(**self.voice_upload(response, user_id, chat_id, message_id, feedback))
+
+    async def agenerate_text_to_voice(self, content: str, instructions:str, user_id:str, voice_name:Optional[str]=None,
+                                      chat_id: Optional[str] = None, message_id: Optional[int] = None, feedback:bool=False) -> str:
+        response = await self.google_client.aio.models.generate_content(
+           model=self.generate_voice_model,
+           contents=instructions + content,
+           config=self.voice_config(voice_name)
         )
+        return await adb.upload_generated_archive(**self.voice_upload(response, user_id, chat_id, message_id, feedback))
 
+    def scene_image_contents(self, description: str) -> Any:
+        return ("Crie uma imagem cartunesca a partir dessa descrição: ",  description)
+
+    def scene_image_upload(self, response: types.GenerateContentResponse, user_id:str,
+                           chat_id: Optional[str], message_id: Optional[int]) -> dict[str, Any]:
+        """Argumentos de upload_generated_archive para a imagem da resposta."""
         image_bytes = None
         image_mime_type = None
 
@@ -230,13 +285,34 @@ class GoogleModel(CoreModelInterface):
                 image_mime_type = part.inline_data.mime_type
                 break
 
-        if image_bytes and image_mime_type:
-            destination_path = f"{user_id}/{chat_id}/{message_id}/images/scene_image.png" if chat_id and (message_id is not None) else f"{user_id}/images/scene_image.png"
-            url_or_path = db.upload_generated_archive(
-                file_bytes=image_bytes,
-                destination_path=destination_path,
-                mime_type=image_mime_type,
+        if not (image_bytes and image_mime_type):
+            raise ValueError("Nenhuma imagem foi gerada ou encontrada na resposta da API.")
+
+        destination_path = f"{user_id}/{chat_id}/{message_id}/images/scene_image.png" if chat_id and (message_id is not None) else f"{user_id}/images/scene_image.png"
+        return {
+            "file_bytes": image_bytes,
+            "destination_path": destination_path,
+            "mime_type": image_mime_type,
+        }
+    
+    def generate_scene_image(self, description: str, user_id:str, 
+                             chat_id:Optional[str] = None, message_id: Optional[int] = None) ->str:
+        response = self.google_client.models.generate_content(
+            model=self.generate_image_model,
+            contents=self.scene_image_contents(description),
+            config=types.GenerateContentConfig(
+                response_modalities=["TEXT", "IMAGE"],
             )
-            return url_or_path
+        )
+        return db.upload_generated_archive(**self.scene_image_upload(response, user_id, chat_id, message_id))
 
-        raise ValueError("Nenhuma imagem foi gerada ou encontrada na resposta da API.")
\ No newline at end of file
+    async def agenerate_scene_image(self, description: str, user_id:str,
+                                    chat_id:Optional[str] = None, message_id: Optional[int] = None) -> str:
+        response = await self.google_client.aio.models.generate_content(
+            model=self.generate_image_model,
+            contents=self.scene_image_contents(description),
+            config=types.GenerateContentConfig(
+                response_modalities=["TEXT", "IMAGE"],
+            )
+        )
+        return await adb.upload_generated_archive(**self.scene_image_upload(response, user_id, chat_id, message_id))
@@ -43,3 +43,21 @@ class CoreModelInterface(ABC):
     @abstractmethod
     def generate_text_to_voice(self, content: str, instructions:str, user_id:str, voice_name:Optional[str]=None, chat_id: Optional[str] = None, message_id: Optional[int] = None, feedback:bool=False) -> str:
         pass
+
+    # --- Versões assíncronas (clientes assíncronos dos provedores, sem bloquear o loop de eventos) ---
+
+    @abstractmethod
+    async def anew_chat(self, child_name:str, instruction:str) -> NewChat:
+        pass
+
+    @abstractmethod
+    async def acontinue_chat(self, items:ChatItems, user_name:str) -> ContinueChat:
+        pass
+
+    @abstractmethod
+    async def agenerate_scene_image(self, description: str, user_id:str, chat_id:Optional[str] = None, message_id: Optional[int] = None) -> str:
+        pass
+
+    @abstractmethod
+    async def agenerate_text_to_voice(self, content: str, instructions:str, user_id:str, voice_name:Optional[str]=None, chat_id: Optional[str] = None, message_id: Optional[int] = None, feedback:bool=False) -> str:
+        pass
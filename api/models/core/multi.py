@@ -45,41 +45,62 @@ class MultiModels(CoreModelInterface):
         else:
             raise ValueError(f"Unknown voice model: {models_settings.get('generate_voice', 'google')}")
 
-    def new_chat(self, child_name: str, instruction: str) -> NewChat:
-        if models_settings.get("core_model", "google") == "google":
-            return self.google_model.new_chat(child_name, instruction)
-        return self.openai_model.new_chat(child_name, instruction)
-    
-    def continue_chat(self, items:ChatItems, user_name:str) -> ContinueChat:
-        if models_settings.get("core_model", "google") == "google":
-            return self.google_model.continue_chat(items, user_name)
-        return self.openai_model.continue_chat(items, user_name)
-    
-    async def submit(self, image_file: UploadFile, target:str, user_name:str) -> SubmitImageResponse:
+    def core(self) -> CoreModelInterface:
         if models_settings.get("core_model", "google") == "google":
-            return await self.google_model.submit(image_file, target, user_name)
-        return await self.openai_model.submit(image_file, target, user_name)
-    
-    def generate_text_to_voice(self, content: str, instructions:str, user_id:str, voice_name:Optional[str]=None,
-                               chat_id: Optional[str] = None, message_id: Optional[int] = None, feedback:bool=False) -> str:
+            return self.google_model
+        return self.openai_model
+
+    def image_model(self) -> CoreModelInterface:
+        if models_settings.get("generate_image", "google") == "google":
+            return self.google_model
+        return self.openai_model
+
+    def voice_model(self, voice_name: Optional[str]) -> tuple[CoreModelInterface, Optional[str]]:
         model_voice = models_settings.get("generate_voice", "google")
         if model_voice == "google":
-            return self.google_model.generate_text_to_voice(content, instructions, user_id, voice_name, chat_id, message_id, feedback)
+            return self.google_model, voice_name
         elif model_voice == "dual":
             if (voice_name is None):
                 voice_name = "Kore"
             if voice_name in self.google_model.voice_names:
-                return self.google_model.generate_text_to_voice(content, instructions, user_id, voice_name, chat_id, message_id, feedback)
+                return self.google_model, voice_name
             elif voice_name in self.openai_model.voice_names:
-                return self.openai_model.generate_text_to_voice(content, instructions, user_id, voice_name, chat_id, message_id, feedback)
+                return self.openai_model, voice_name
             raise ValueError(f"Unknown voice name: {voice_name}")
         elif model_voice == "openai":
-            return self.openai_model.generate_text_to_voice(content, instructions, user_id, voice_name, chat_id, message_id, feedback)
+            return self.openai_model, voice_name
 
         raise ValueError(f"Unknown voice model: {model_voice}")
 
+    def new_chat(self, child_name: str, instruction: str) -> NewChat:
+        return self.core().new_chat(child_name, instruction)
+
+    async def anew_chat(self, child_name: str, instruction: str) -> NewChat:
+        return await self.core().anew_chat(child_name, instruction)
+    
+    def continue_chat(self, items:ChatItems, user_name:str) -> ContinueChat:
+        return self.core().continue_chat(items, user_name)
+
+    async def acontinue_chat(self, items:ChatItems, user_name:str) -> ContinueChat:
+        return await self.core().acontinue_chat(items, user_name)
+    
+    async def submit(self, image_file: UploadFile, target:str, user_name:str) -> SubmitImageResponse:
+        return await self.core().submit(image_file, target, user_name)
+    
+    def generate_text_to_voice(self, content: str, instructions:str, user_id:str, voice_name:Optional[str]=None,
+                               chat_id: Optional[str] = None, message_id: Optional[int] = None, feedback:bool=False) -> str:
+        model, voice_name = self.voice_model(voice_name)
+        return model.generate_text_to_voice(content, instructions, user_id, voice_name, chat_id, message_id, feedback)
+
+    async def agenerate_text_to_voice(self, content: str, instructions:str, user_id:str, voice_name:Optional[str]=None,
+                                      chat_id: Optional[str] = None, message_id: Optional[int] = None, feedback:bool=False) -> str:
+        model, voice_name = self.voice_model(voice_name)
+        return await model.agenerate_text_to_voice(content, instructions, user_id, voice_name, chat_id, message_id, feedback)
+
     def generate_scene_image(self, description: str, user_id:str, 
                              chat_id:Optional[str] = None, message_id: Optional[int] = None) ->str:
-        if models_settings.get("generate_image", "google") == "google":
-            return self.google_model.generate_scene_image(description, user_id, chat_id, message_id)
-        return self.openai_model.generate_scene_image(description, user_id, chat_id, message_id)
\ No newline at end of file
+        return self.image_model().generate_scene_image(description, user_id, chat_id, message_id)
+
+    async def agenerate_scene_image(self, description: str, user_id:str,
+                                    chat_id:Optional[str] = None, message_id: Optional[int] = None) -> str:
+        return await self.image_model().agenerate_scene_image(description, user_id, chat_id, message_id)
@@ -1,4 +1,4 @@
-from api.database import db
+from api.database import db, adb
 from api.constraints import config
 from api.models.core.interface import CoreModelInterface, models_list
 import api.models.prompts as prompts
@@ -10,10 +10,10 @@ from api.utils import image_part_from_any, get_mime_extension
 import base64
 from dotenv import load_dotenv
 from fastapi import UploadFile
-from openai import OpenAI
+from openai import AsyncOpenAI, OpenAI
 import os
 import time
-from typing import Optional
+from typing import Any, Optional
 import json
 
 logger = get_logger(__name__)
@@ -30,6 +30,7 @@ class OpenAIModel(CoreModelInterface):
             exit(1)
         
         self.client = OpenAI()
+        self.async_client = AsyncOpenAI()
         logger.info
         
         self.global_model = "OpenAI"
@@ -45,31 +46,48 @@ class OpenAIModel(CoreModelInterface):
             "nova", "onyx", "sage", "shimmer"
         ]
         
-    def new_chat(self, child_name:str, instruction:str) ->NewChat:
-        response = self.client.responses.create(
-            model = self.new_chat_model,
-            text=prompts.initial_json_text, #type:ignore
-            input=[
+    def new_chat_request(self, child_name:str, instruction:str) -> dict[str, Any]:
+        return {
+            "model": self.new_chat_model,
+            "text": prompts.initial_json_text,
+            "input": [
                 {"role" : "system", "content" : prompts.initial_json_input.format(child_name=child_name)},
                 {"role" : "user", "content" : instruction}
             ]
-        )
+        }
 
+    def new_chat(self, child_name:str, instruction:str) ->NewChat:
+        response = self.client.responses.create(**self.new_chat_request(child_name, instruction))
         return NewChat(**json.loads(response.output_text))
 
-    def assert_continue_chat(self, items: ChatItems, chat_id:str, result:ContinueChat) -> ContinueChat:
-        
-        logger.debug(f"Enviando prompt de validação para {self.get_model_name('assert_continue')}")
-        start_time = time.time()
-        assert_result_request = self.client.responses.create(
-            model=self.assert_continue_model,
-            text=prompts.assert_continue_chat_json_text, #type:ignore
-            input=prompts.assert_continue_chat_input.format(
+    async def anew_chat(self, child_name:str, instruction:str) -> NewChat:
+        response = await self.async_client.responses.create(**self.new_chat_request(child_name, instruction))
+        return NewChat(**json.loads(response.output_text))
+
+    def assert_continue_request(self, items: ChatItems, result: ContinueChat) -> dict[str, Any]:
+        return {
+            "model": self.assert_continue_model,
+            "text": prompts.assert_continue_chat_json_text,
+            "input": prompts.assert_continue_chat_input.format(
                 history=items.history,
                 painted_items=items.painted_items,
                 requested_item=result.paint_image,
             )
-        )
+        }
+
+    def fix_continue_request(self, chat_id: str, feedback: str) -> dict[str, Any]:
+        return {
+            "previous_response_id": chat_id,
+            "model": self.continue_chat_model,
+            "text": prompts.continue_chat_json_text,
+            "input": feedback
+        }
+
+    def assert_continue_chat(self, items: ChatItems, chat_id:str, result:ContinueChat) -> ContinueChat:
+        
+        logger.debug(f"Enviando prompt de validação para {self.get_model_name('assert_continue')}")
+        start_time = time.time()
+        assert_result_request = self.client.responses.create(**self.assert_continue_request(items, result))
         assert_result = AssertContinueChat(**json.loads(assert_result_request.output_text))
         logger.debug(f"Resposta de validação recebida: {assert_result.is_correct} em {time.time() - start_time:.2f} segundos.")
         
@@ -77,19 +95,33 @@ class OpenAIModel(CoreModelInterface):
             logger.warning(f"Validação do chat para o usuário falhou: {assert_result.feedback}")
             logger.debug(f"Enviando prompt de correção para {self.get_model_name('continue_chat')}")
             start_time = time.time()
-            new_continue = self.client.responses.create(
-                previous_response_id=chat_id,
-                model=self.continue_chat_model,
-                text=prompts.continue_chat_json_text, #type:ignore
-                input=assert_result.feedback
-            )
+            new_continue = self.client.responses.create(**self.fix_continue_request(chat_id, assert_result.feedback))
             logger.debug(f"Resposta de correção recebida: {result} em {time.time() - start_time:.2f} segundos.")
             
             result = ContinueChat(**json.loads(new_continue.output_text))
                
         return result
+
+    async def aassert_continue_chat(self, items: ChatItems, chat_id:str, result:ContinueChat) -> ContinueChat:
+
+        logger.debug(f"Enviando prompt de validação para {self.get_model_name('assert_continue')}")
+        start_time = time.time()
+        assert_result_request = await self.async_client.responses.create(**self.assert_continue_request(items, result))
+        assert_result = AssertContinueChat(**json.loads(assert_result_request.output_text))
+        logger.debug(f"Resposta de validação recebida: {assert_result.is_correct} em {time.time() - start_time:.2f} segundos.")
+
+        if not assert_result.is_correct:
+            logger.warning(f"Validação do chat para o usuário falhou: {assert_result.feedback}")
+            logger.debug(f"Enviando prompt de correção para {self.get_model_name('continue_chat')}")
+            start_time = time.time()
+            new_continue = await self.async_client.responses.create(**self.fix_continue_request(chat_id, assert_result.feedback))
+            logger.debug(f"Resposta de correção recebida: {result} em {time.time() - start_time:.2f} segundos.")
+
+            result = ContinueChat(**json.loads(new_continue.output_text))
+
+        return result
     
-    def continue_chat(self, items:ChatItems, user_name:str) -> ContinueChat:
+    def continue_chat_request(self, items:ChatItems, user_name:str) -> dict[str, Any]:
         messages  = [
             {
                 "role" : "system", 
@@ -109,11 +141,14 @@ class OpenAIModel(CoreModelInterface):
             }
         ]
         
-        response = self.client.responses.create(
-            model=self.continue_chat_model,
-            text=prompts.continue_chat_json_text, #type:ignore
-            input=messages #type:ignore
-        )
+        return {
+            "model": self.continue_chat_model,
+            "text": prompts.continue_chat_json_text,
+            "input": messages
+        }
+
+    def continue_chat(self, items:ChatItems, user_name:str) -> ContinueChat:
+        response = self.client.responses.create(**self.continue_chat_request(items, user_name))
         
         continue_chat = ContinueChat(**json.loads(response.output_text))
         
@@ -122,6 +157,16 @@ class OpenAIModel(CoreModelInterface):
         
         return continue_chat
 
+    async def acontinue_chat(self, items:ChatItems, user_name:str) -> ContinueChat:
+        response = await self.async_client.responses.create(**self.continue_chat_request(items, user_name))
+
+        continue_chat = ContinueChat(**json.loads(response.output_text))
+
+        if config.get("Models", {}).get("assert_continue", True):
+            continue_chat = await self.aassert_continue_chat(items, response.id, continue_chat)
+
+        return continue_chat
+
     async def submit(self, image_file: UploadFile, target:str, user_name:str) -> SubmitImageResponse:
         
         image_bytes, mime_type, _ = await get_mime_extension(image_file)
@@ -137,69 +182,84 @@ class OpenAIModel(CoreModelInterface):
             ]}
         ]
 
-        response = self.client.responses.create(
+        response = await self.async_client.responses.create(
             model=self.submit_model,
             text=prompts.submit_image_json_text, #type:ignore
-            input=messages
+            input=messages #type:ignore
         )
 
         return SubmitImageResponse(**json.loads(response.output_text))
 
+    def voice_request(self, content: str, instructions:str, voice_name:Optional[str]) -> dict[str, Any]:
+        return {
+            "model": self.generate_voice_model,
+            "voice": voice_name or openai_configs.get("voce_name", "shimmer"),
+            "input": content,
+            "instructions": instructions,
+            "response_format": 'wav'
+        }
+
+    def voice_upload(self, audio_data: bytes, user_id:str, chat_id: Optional[str],
+                     message_id: Optional[int], feedback: bool) -> dict[str, Any]:
+        """Argumentos de upload_generated_archive para o áudio gerado."""
+        destination_path = f"{user_id}/{chat_id}/{message_id}/audio" if chat_id and (message_id is not None) else f"{user_id}/audio"
+        return {
+            "file_bytes": audio_data,
+            "destination_path": destination_path,
+            "mime_type": 'audio/wav',
+            "base_filename": "feedback" if  feedback else None
+        }
 
     def generate_text_to_voice(self, content: str, instructions:str, user_id:str, voice_name:Optional[str]=None,
                                chat_id: Optional[str] = None, message_id: Optional[int] = None, feedback:bool=False) -> str:
-        
-        if voice_name is None:
-            voice_name = openai_configs.get("voce_name", "shimmer")
-                
         with self.client.audio.speech.with_streaming_response.create(
-            model=self.generate_voice_model,
-            voice=voice_name, #type:ignore
-            input=content,
-            instructions=instructions,
-            response_format='wav'
+            **self.voice_request(content, instructions, voice_name)
         ) as response:
             audio_data = response.read()
 
-        destination_path = f"{user_id}/{chat_id}/{message_id}/audio" if chat_id and (message_id is not None) else f"{user_id}/audio"
-        
-        return db.upload_generated_archive(
-            audio_data,
-            destination_path=destination_path,
-            mime_type='audio/wav',
-            base_filename="feedback" if  feedback else None
-        )
+        return db.upload_generated_archive(**self.voice_upload(audio_data, user_id, chat_id, message_id, feedback))
 
-    def generate_scene_image(self, description: str, user_id:str, 
-                             chat_id:Optional[str] = None, message_id: Optional[int] = None) ->str:
-        
-        response = self.client.responses.create(
-            model=self.generate_image_model,
-            input=description,
-            tools=[{"type": "image_generation"}],
-        )
-                
+    async def agenerate_text_to_voice(self, content: str, instructions:str, user_id:str, voice_name:Optional[str]=None,
+                                      chat_id: Optional[str] = None, message_id: Optional[int] = None, feedback:bool=False) -> str:
+        async with self.async_client.audio.speech.with_streaming_response.create(
+            **self.voice_request(content, instructions, voice_name)
+        ) as response:
+            audio_data = await response.read()
+
+        return await adb.upload_generated_archive(**self.voice_upload(audio_data, user_id, chat_id, message_id, feedback))
+
+    def scene_image_request(self, description: str) -> dict[str, Any]:
+        return {
+            "model": self.generate_image_model,
+            "input": description,
+            "tools": [{"type": "image_generation"}],
+        }
+
+    def scene_image_upload(self, response: Any, user_id:str,
+                           chat_id: Optional[str], message_id: Optional[int]) -> dict[str, Any]:
+        """Argumentos de upload_generated_archive para a imagem da resposta."""
         image_data = [
             output.result
             for output in response.output
             if output.type == "image_generation_call"
         ]
-        
-        del response
 
         assert image_data
-        image_base64 = image_data[0]
-        
-        del image_data
-        
-        image_bytes = base64.b64decode(image_base64) #type:ignore
+        image_bytes = base64.b64decode(image_data[0]) #type:ignore
         
         destination_path = f"{user_id}/{chat_id}/{message_id}/images/scene_image.png" if chat_id and (message_id is not None) else f"{user_id}/images/scene_image.png"
+        return {
+            "file_bytes": image_bytes,
+            "destination_path": destination_path,
+            "mime_type": "image/png"
+        }
 
-        url_or_path = db.upload_generated_archive(
-            file_bytes=image_bytes,
-            destination_path=destination_path,
-            mime_type="image/png"
-        )
-        
-        return url_or_path
\ No newline at end of file
+    def generate_scene_image(self, description: str, user_id:str, 
+                             chat_id:Optional[str] = None, message_id: Optional[int] = None) ->str:
+        response = self.client.responses.create(**self.scene_image_request(description))
+        return db.upload_generated_archive(**self.scene_image_upload(response, user_id, chat_id, message_id))
+
+    async def agenerate_scene_image(self, description: str, user_id:str,
+                                    chat_id:Optional[str] = None, message_id: Optional[int] = None) -> str:
+        response = await self.async_client.responses.create(**self.scene_image_request(description))
+        return await adb.upload_generated_archive(**self.scene_image_upload(response, user_id, chat_id, message_id))
@@ -1,14 +1,20 @@
-from fastapi import APIRouter, HTTPException, Depends, UploadFile, File, WebSocket, WebSocketDisconnect, Form
-from typing import List
+from fastapi import APIRouter, HTTPException, Depends, UploadFile, File, WebSocket, WebSocketDisconnect, Form, Query
+from typing import List, Optional
 import traceback
 import asyncio
+import base64
 import json
 
 from api.schemas.messages import Chat, MiniChat, SubmitImageMessage, SubmitImageHandler, Message
-from api.services.chat import new_chat, continue_chat, continue_chat_async
+from api.services.chat import new_chat, continue_chat
 from api.utils.logger import get_logger
-from api.services.messages import submit_image, generate_feedback_audio
-from api.database import db
+from api.services.messages import Stage, submit_image, generate_feedback_audio, stream_new_message
+from api.services.events import buffered_upload, sse_response
+from api.services.session import ChatSession, process_submission
+from api.services.prefetch import prefetch_message, wait_prefetch
+from api.database import adb
+from api.database.executor import get_database_executor
+from api.database.pagination import CHATS_PAGE_SIZE, InvalidCursor
 from api.auth import verify_token, verify_token_string
 
 logger = get_logger(__name__)
@@ -63,30 +69,69 @@ async def create_chat(
 
 from api.schemas.messages import ChatsAndVoicesResponse
 
+@router.post(
+    "/stream",
+    status_code=200,
+    summary="Criar novo chat com progresso (SSE)",
+    description="""
+    Mesmo que `POST /api/chats/`, mas responde com Server-Sent Events (`text/event-stream`)
+    enviando cada etapa assim que termina, para clientes sem WebSocket.
+    
+    **Eventos:**
+    - `transcribed`: `{"instruction": "..."}`
+    - `text`: `{"chat_id", "title", "chat_image", "message_index", "paint_image", "text_voice", "intro_voice", "scene_image_description"}`
+    - `audio` / `image`: `{"message_index", "audio"}` / `{"message_index", "image"}`, na ordem em que terminarem
+    - `persisted`: o chat completo, igual à resposta de `POST /api/chats/`
+    - `done` ao final, ou `error` com `{"status_code", "detail"}`
+    
+    Linhas de comentário (`: heartbeat`) mantêm a conexão aberta durante etapas longas.
+    """,
+    responses={
+        200: {"description": "Fluxo de eventos da criação do chat", "content": {"text/event-stream": {}}},
+    }
+)
+async def create_chat_stream(
+    voice_audio: UploadFile,
+    voice_name: str = Form(default="Kore"),
+    user_id: str = Depends(verify_token)
+):
+    audio_file = await buffered_upload(voice_audio)
+    return sse_response(lambda emit: new_chat(user_id, audio_file, voice_name, emit))
+
 @router.get(
     "/", 
     response_model=ChatsAndVoicesResponse, 
     status_code=200,
     summary="Listar chats do usuário",
     description="""
-    Retorna todos os chats (histórias) do usuário autenticado.
+    Retorna os chats (histórias) do usuário autenticado, paginados.
     
     - Lista resumida com informações básicas de cada chat
     - Ordenado por última atualização
     - Inclui título, emoji e timestamp de cada história
+    - Para a próxima página, envie o `next_cursor` recebido em `cursor`
     """,
     responses={
         200: {"description": "Lista de chats retornada com sucesso"},
+        400: {"description": "Cursor inválido"},
     }
 )
-async def get_chats(user_id: str = Depends(verify_token)):
+async def get_chats(
+    limit: int = Query(default=CHATS_PAGE_SIZE, ge=1, le=100, description="Quantidade de chats por página"),
+    cursor: Optional[str] = Query(default=None, description="Cursor retornado na página anterior"),
+    user_id: str = Depends(verify_token)
+):
     from api.models.core import core_model
     try:
-        user = db.get_user(user_id)
+        page = await adb.get_user_chats(user_id, limit, cursor)
         return {
-            "chats": user.chats,
-            "available_voices": getattr(core_model, "voice_names", ["Kore"])
+            "chats": page.chats,
+            "available_voices": getattr(core_model, "voice_names", ["Kore"]),
+            "next_cursor": page.next_cursor
         }
+    except InvalidCursor as e:
+        logger.warning(f"Erro ao buscar chats: {e}")
+        raise HTTPException(status_code=400, detail="Cursor inválido")
     except HTTPException as http_exc:
         logger.error(f"Erro ao buscar chats: {http_exc.detail}")
         raise http_exc
@@ -118,7 +163,7 @@ async def get_chat(
     user_id: str = Depends(verify_token),
 ):
     try:
-        chat = db.get_chat(chat_id, user_id)  # type: ignore
+        chat = await adb.get_chat(chat_id, user_id)
         # Limita as mensagens visíveis a len(submits) + 1 para evitar expor pré-geradas indevidamente
         allowed = len(chat.subimits) + 1
         chat.messages = chat.messages[:allowed]
@@ -159,7 +204,7 @@ async def submit_image_api(
     user_id: str = Depends(verify_token)
 ):
     try:
-        chat = db.get_chat(chat_id, user_id)
+        chat = await adb.get_chat(chat_id, user_id)
         message_index = len(chat.subimits)
         
         logger.debug(f"Submetendo desenho {message_index} do chat : {chat.chat_id}")
@@ -169,33 +214,30 @@ async def submit_image_api(
         image_path = None
         if result.is_correct:
             logger.info(f"Imagem submetida corretamente para o chat: {chat_id}, entregando mensagem pré-processada.")
-            image_path = await db.store_user_archive(user_id, image)
+            image_path = await adb.store_user_archive(user_id, image)
             feedback_audio = "Fale de uma maneira energética, elogiando o desenho da criança com essas palavras: "
 
             # Entregar a pending_message se existir
-            pending = db.pop_pending_message(chat_id)
+            pending = await adb.pop_pending_message(chat_id)
+            if not pending and await wait_prefetch(chat_id, message_index + 1):
+                pending = await adb.pop_pending_message(chat_id)
             if pending:
                 # Adiciona a mensagem pré-processada ao chat
-                db.update_chat(user_id, chat_id, 'messages', Message(**pending))
-                # Iniciar geração da próxima mensagem em background
-                def _generate_next():
-                    try:
-                        logger.info(f"Pré-processando nova mensagem para o chat: {chat_id}")
-                        from api.services.messages import new_message
-                        next_msg = new_message(user_id, chat_id, pending['message_index'] + 1)
-                        db.set_pending_message(chat_id, next_msg.model_dump())
-                        logger.info(f"Nova mensagem pré-processada salva para o chat: {chat_id}")
-                    except Exception as e:
-                        logger.error(f"Erro ao pré-processar nova mensagem: {e}")
-                import threading
-                threading.Thread(target=_generate_next, daemon=True).start()
+                await adb.update_chat(user_id, chat_id, 'messages', Message(**pending))
+                next_index = pending['message_index'] + 1
             else:
-                logger.warning(f"Nenhuma mensagem pré-processada encontrada para o chat: {chat_id}")
+                # Sem pré-geração (restart, outro worker, falha ou TTL): a próxima mensagem é
+                # gerada e salva agora, senão o chat ficaria sem a mensagem a desenhar
+                logger.info(f"Nenhuma mensagem pré-processada para o chat: {chat_id}, gerando agora")
+                await stream_new_message(user_id, chat_id, message_index + 1)
+                next_index = message_index + 2
+            # Iniciar geração da próxima mensagem em background
+            prefetch_message(user_id, chat_id, next_index)
         else:
             logger.info(f"Imagem submetida incorretamente para o chat: {chat_id}, gerando feedback.")
             feedback_audio = "Fale de uma maneira apasiguadora, incentivando a criança a melhorar seu desenho com essas palavras: "
 
-        feedback = generate_feedback_audio(result, feedback_audio, user_id, chat_id, message_index, image_path)
+        feedback = await generate_feedback_audio(result, feedback_audio, user_id, chat_id, message_index, image_path)
         return feedback
     
     except HTTPException as http_exc:
@@ -207,6 +249,45 @@ async def submit_image_api(
         logger.error(traceback.format_exc())
         raise HTTPException(status_code=500, detail="Internal Server Error")
 
+@router.post(
+    "/{chat_id}/submit_image/stream",
+    status_code=200,
+    summary="Submeter desenho com progresso (SSE)",
+    description="""
+    Avalia o desenho como o WebSocket `/submit_image_ws`, mas responde com
+    Server-Sent Events (`text/event-stream`), para clientes sem WebSocket.
+    
+    **Eventos:**
+    - `feedback`: avaliação e áudio de feedback (mesmo formato do WebSocket)
+    - Se o desenho estiver correto e a próxima mensagem ainda não estava pré-gerada:
+      `text`, `audio` e `image` assim que cada parte fica pronta
+    - `persisted`: a nova mensagem completa, já salva no chat
+    - `done` ao final, ou `error` com `{"status_code", "detail"}`
+    """,
+    responses={
+        200: {"description": "Fluxo de eventos da submissão", "content": {"text/event-stream": {}}},
+        404: {"description": "Chat não encontrado"},
+    }
+)
+async def submit_image_stream(
+    chat_id: str,
+    image: UploadFile = File(..., description="Arquivo de imagem com o desenho da criança"),
+    user_id: str = Depends(verify_token)
+):
+    # Chat inexistente ou de outro usuário ainda responde com o status HTTP correto
+    await adb.get_chat(chat_id, user_id)
+    image_bytes = await image.read()
+
+    async def produce(emit: Stage):
+        async def send(frame: dict):
+            # O quadro new_message do WebSocket é enviado depois de salvar a mensagem
+            event = "persisted" if frame["type"] == "new_message" else frame["type"]
+            await emit(event, frame.get("message", {}))
+
+        await process_submission(chat_id, user_id, image_bytes, send)
+
+    return sse_response(produce)
+
 @router.get(
     "/{chat_id}/submit_image_ws/docs",
     status_code=200,
@@ -274,6 +355,28 @@ async def submit_image_api(
     }
     ```
     
+    **Partes da Nova Mensagem (se correto e a mensagem ainda não estava pré-gerada):**
+    Enviadas assim que cada parte fica pronta, antes da mensagem completa:
+    ```json
+    {
+        "type": "text",
+        "message": {
+            "message_index": 2,
+            "paint_image": "casa",
+            "text_voice": "Era uma vez uma casa muito especial...",
+            "intro_voice": "Agora desenhe uma casa!",
+            "scene_image_description": "Uma bela casa colorida no campo"
+        }
+    }
+    ```
+    ```json
+    {"type": "audio", "message": {"message_index": 2, "audio": "path/to/story/audio.wav"}}
+    ```
+    ```json
+    {"type": "image", "message": {"message_index": 2, "image": "path/to/scene/image.jpg"}}
+    ```
+    `audio` e `image` chegam na ordem em que terminarem.
+    
     **Nova Mensagem da História (apenas se desenho correto):**
     ```json
     {
@@ -367,6 +470,7 @@ async def get_websocket_docs(chat_id: str):
     """
     return {
         "websocket_url": f"/api/chats/{chat_id}/submit_image_ws",
+        "session_websocket_url": f"/api/chats/{chat_id}/session_ws",
         "documentation": "Consulte a descrição completa acima para detalhes de implementação",
         "status": "WebSocket ativo e funcional",
         "alternative_rest_endpoint": f"/api/chats/{chat_id}/submit_image"
@@ -389,7 +493,8 @@ async def submit_image_websocket(
     4. **Avaliação**: Servidor analisa o desenho
     5. **Feedback**: Servidor envia feedback de áudio
     6. **Continuação**: Se correto, mantém conexão e gera nova mensagem
-    7. **Notificação**: Servidor envia nova mensagem quando pronta
+    7. **Notificação**: Servidor envia as partes `text`, `audio` e `image` assim que
+       ficam prontas (se a mensagem não estava pré-gerada) e depois a `new_message` completa
     8. **Encerramento**: Conexão é fechada
     
     **Mensagens do Cliente para Servidor:**
@@ -471,9 +576,9 @@ async def submit_image_websocket(
             await websocket.close()
             return
         
-        # Verifica o token
+        # Verifica o token (no modo local consulta o banco; no Firebase pode buscar as chaves públicas)
         try:
-            user_id = verify_token_string(auth_data.get("token"))
+            user_id = await get_database_executor().run(verify_token_string, auth_data.get("token"))
         except Exception:
             await websocket.send_json({
                 "type": "error", 
@@ -493,118 +598,11 @@ async def submit_image_websocket(
             await websocket.close()
             return
         
-        # 3. Processa a submissão da imagem
-        chat = db.get_chat(chat_id, user_id)
-        message_index = len(chat.subimits)
-        
-        logger.debug(f"WebSocket: Submetendo desenho {message_index} do chat: {chat.chat_id}")
-        
-        # Converte dados base64 de volta para UploadFile simulado
-        import base64
-        import io
-        from fastapi import UploadFile
-        
+        # 3. Avalia o desenho, envia o feedback e, se correto, a nova mensagem
         image_bytes = base64.b64decode(image_data.get("image_data"))
-        image_file = UploadFile(
-            filename="drawing.jpg",
-            file=io.BytesIO(image_bytes)
-        )
-        
-        # Avalia o desenho
-        expected_draw = chat.messages[len(chat.subimits)].paint_image
-        result = await submit_image(chat_id, expected_draw, image_file, user_id)
-
-        # 4. Processa resultado e gera feedback
-        image_path = None
-        if result.is_correct:
-            logger.info(f"WebSocket: Imagem submetida corretamente para o chat: {chat_id}")
-            image_path = await db.store_user_archive(user_id, image_file)
-            feedback_audio = "Fale de uma maneira energética, elogiando o desenho da criança com essas palavras: "
-        else:
-            logger.info(f"WebSocket: Imagem submetida incorretamente para o chat: {chat_id}, era esperado um {expected_draw}")
-            feedback_audio = "Fale de uma maneira apasiguadora, incentivando a criança a melhorar seu desenho com essas palavras: "
-        
-        # Gera feedback de áudio
-        feedback = generate_feedback_audio(result, feedback_audio, user_id, chat_id, message_index, image_path)
-        
-        # 5. Envia feedback para o cliente
-        await websocket.send_json({
-            "type": "feedback",
-            "message": {
-                "message_index": feedback.message_index,
-                "audio": feedback.audio,
-                "data": {
-                    "is_correct": result.is_correct,
-                    "feedback": result.feedback
-                },
-                "image": feedback.image
-            }
-        })
-        
-        # 6. Se correto, usa mensagem pré-processada (pending) e dispara a próxima em background
-        if result.is_correct:
-            # Consumir pending message caso exista
-            pending = db.pop_pending_message(chat_id)
-            if pending:
-                try:
-                    msg = Message(**pending)
-                    # Persistir a mensagem e enviar imediatamente
-                    db.update_chat(user_id, chat_id, 'messages', msg)
-                    await websocket.send_json({
-                        "type": "new_message",
-                        "message": {
-                            "message_index": msg.message_index,
-                            "paint_image": msg.paint_image,
-                            "text_voice": msg.text_voice,
-                            "intro_voice": msg.intro_voice,
-                            "scene_image_description": msg.scene_image_description,
-                            "image": msg.image,
-                            "audio": msg.audio
-                        }
-                    })
-                    logger.info(f"WebSocket: Nova mensagem (pending) enviada para o chat: {chat_id}")
-                except Exception as e:
-                    logger.error(f"WebSocket: Erro ao usar mensagem pending: {e}")
-            else:
-                logger.info(f"WebSocket: Sem mensagem pending; gerando nova mensagem agora para o chat: {chat_id}")
-                
-                # Callback para enviar nova mensagem quando pronta
-                async def send_new_message(message: Message):
-                    try:
-                        await websocket.send_json({
-                            "type": "new_message",
-                            "message": {
-                                "message_index": message.message_index,
-                                "paint_image": message.paint_image,
-                                "text_voice": message.text_voice,
-                                "intro_voice": message.intro_voice,
-                                "scene_image_description": message.scene_image_description,
-                                "image": message.image,
-                                "audio": message.audio
-                            }
-                        })
-                        logger.info(f"WebSocket: Nova mensagem enviada para o chat: {chat_id}")
-                    except Exception as e:
-                        logger.error(f"WebSocket: Erro ao enviar nova mensagem: {e}")
-                
-                # Gera nova mensagem de forma assíncrona
-                _ = await continue_chat_async(user_id, chat_id, message_index + 1, send_new_message)
-
-            # Iniciar geração da próxima pending em background
-            import threading
-            from api.services.messages import new_message as generate_new_message
-            def _prefetch_next():
-                try:
-                    next_index = message_index + 1 if not pending else pending.get('message_index', message_index) + 1
-                    logger.info(f"WebSocket: Pré-processando próxima mensagem {next_index} para o chat: {chat_id}")
-                    next_msg = generate_new_message(user_id, chat_id, next_index)
-                    db.set_pending_message(chat_id, next_msg.model_dump())
-                    logger.info(f"WebSocket: Próxima mensagem pré-processada salva para o chat: {chat_id}")
-                except Exception as e:
-                    logger.error(f"WebSocket: Erro ao pré-processar próxima mensagem: {e}")
-            threading.Thread(target=_prefetch_next, daemon=True).start()
+        await process_submission(chat_id, user_id, image_bytes, websocket.send_json)
         
-        # 7. Fecha conexão
+        # 4. Fecha conexão
         await websocket.close()
         
     except WebSocketDisconnect:
@@ -621,4 +619,33 @@ async def submit_image_websocket(
             })
             await websocket.close()
         except:
-            pass
\ No newline at end of file
+            pass
+
+@router.websocket("/{chat_id}/session_ws")
+@router.websocket("/{chat_id}/session_ws/")
+async def chat_session_websocket(
+    websocket: WebSocket,
+    chat_id: str
+):
+    """
+    WebSocket de sessão: uma conexão para a história inteira do chat.
+
+    **Fluxo de Comunicação:**
+
+    1. **Autenticação**: Cliente envia `{"type": "auth", "token": ...}` uma única vez
+    2. **Pronto**: Servidor responde `{"type": "ready", "max_in_flight": 2}`; se o chat não existir
+       ou for de outro usuário, responde `{"type": "error", "status_code": 404 | 403, "message": ...}` e fecha
+    3. **Submissões**: Cliente envia quantas submissões quiser (inclusive novas tentativas),
+       cada uma com um `request_id`:
+       `{"type": "submit_image", "request_id": "1", "image_data": "base64..."}`
+    4. **Respostas**: `feedback`, as partes `text`, `audio` e `image` (quando a mensagem é gerada na hora),
+       `new_message` e por fim `done` (ou `error`), todas com o mesmo `request_id`
+    5. **Heartbeat**: Servidor envia `{"type": "heartbeat"}` periodicamente;
+       o cliente pode enviar `{"type": "ping"}` e recebe `{"type": "pong"}`
+
+    **Limites:**
+    - Submissões são processadas em ordem; acima de `websocket_max_in_flight`
+      pendentes, a nova submissão recebe `error` e pode ser reenviada
+    - Sem mensagens do cliente por `websocket_idle_timeout_seconds`, a conexão é fechada
+    """
+    await ChatSession(websocket, chat_id).run()
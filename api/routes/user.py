@@ -1,5 +1,5 @@
 from fastapi import APIRouter, HTTPException, Depends
-from api.database import db
+from api.database import adb
 from api.utils.logger import get_logger
 from api.schemas.users import CreateUser, UserDB, User
 from api.auth import verify_token
@@ -39,7 +39,7 @@ async def create_user(
     user_id: str = Depends(verify_token)
 ):
     try:
-        user = db.create_user(user_data, user_id)
+        user = await adb.create_user(user_data, user_id)
         return user
 
     except Exception as e:
@@ -56,7 +56,7 @@ async def create_user(
     Retorna os dados completos do usuário autenticado.
     
     - Identifica o usuário automaticamente pelo token
-    - Inclui lista de chats do usuário
+    - Inclui a primeira página de chats do usuário (próximas via GET /api/chats/?cursor=next_cursor)
     - Não requer parâmetros adicionais
     """,
     responses={
@@ -66,7 +66,7 @@ async def create_user(
 )
 async def get_current_user(user_id: str = Depends(verify_token)):
     try:
-        user = db.get_user(user_id)
+        user = await adb.get_user(user_id)
         return user
 
     except ValueError as e:
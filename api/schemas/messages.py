@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import List
+from typing import List, Optional
 
 # ...existing code...
 
@@ -8,6 +8,7 @@ from typing import List
 class ChatsAndVoicesResponse(BaseModel):
     chats: List['MiniChat']
     available_voices: List[str]
+    next_cursor: Optional[str] = None
 from pydantic import BaseModel, Field
 from api.schemas.llm import ContinueChat, SubmitImageResponse
 from typing import List, Optional
@@ -147,6 +148,22 @@ class MiniChat(MiniChatBase):
         examples=["chat_123abc", "story_456def"]
     )
 
+class ChatPage(BaseModel):
+    """
+    Página da listagem de chats de um usuário.
+    
+    Os chats vêm do mais recente para o mais antigo; next_cursor
+    é enviado de volta para buscar a página seguinte.
+    """
+    chats: List[MiniChat] = Field(
+        default=[],
+        description="Chats da página, do mais recente para o mais antigo"
+    )
+    next_cursor: Optional[str] = Field(
+        None,
+        description="Cursor da próxima página (None quando não há mais chats)"
+    )
+
 class Chat(MiniChat):
     """
     Chat completo com todo o histórico.
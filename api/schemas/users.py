@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import List
+from typing import List, Optional
 from api.schemas.messages import MiniChat
 
 class CreateUser(BaseModel):
@@ -45,4 +45,8 @@ class User(UserDB):
     chats: List[MiniChat] = Field(
         default=[],
         description="Lista de chats (histórias) do usuário"
-    )
\ No newline at end of file
+    )
+    next_cursor: Optional[str] = Field(
+        None,
+        description="Cursor da próxima página de chats (None quando a lista está completa)"
+    )
@@ -4,14 +4,15 @@ from api.schemas.messages import Chat, MiniChatBase, Message
 from api.utils.logger import get_logger
 from api.models.speech_to_text import transcribe_audio
 import time
-from api.services.messages import new_message, generate_image_audio
-import threading
+from api.services.messages import Stage, no_stage, stream_image_audio
+from api.services.prefetch import generate_message, prefetch_message
 import asyncio
 import os
 from api.models.core import core_model
 from typing import Union, List, Callable, Optional, Awaitable
-from api.schemas.llm import NewChat
-from api.database import db
+from concurrent.futures import Future
+from api.schemas.llm import ContinueChat, NewChat
+from api.database import db, adb
 from datetime import datetime, timezone
 from api.models.speech_to_text.utils import prepare_audio_file
 import traceback
@@ -20,34 +21,44 @@ logger = get_logger(__name__)
 
 os.makedirs('./temp', exist_ok=True)
 
-async def new_chat(user_id:str, audio_file: UploadFile, voice_name: str = "Kore") -> Chat:
+async def new_chat(user_id:str, audio_file: UploadFile, voice_name: str = "Kore", on_stage: Stage = no_stage) -> Chat:
+    """
+    Cria um chat a partir do áudio com o pedido da criança.
+
+    `on_stage` recebe cada etapa assim que termina: "transcribed", "text",
+    "audio" e "image" (na ordem em que terminarem) e "persisted" com o chat completo.
+    """
     # Trasncrição de Áudio
     #TODO: Sempre está achando que é outro formato mesmo sendo WAV, futuramente resolver !
     audio_path = await prepare_audio_file(audio_file)
     logger.debug("Transcrevendo áudio para texto...")
     start_time = time.time()
-    instruction = transcribe_audio(audio_path)
+    instruction = await asyncio.to_thread(transcribe_audio, audio_path)
     audio_path.unlink(missing_ok=True)
     logger.debug(f"Transcrição concluída em {time.time() - start_time:.2f} segundos.")
+    await on_stage("transcribed", {"instruction": instruction})
     
-    user = db.get_user(user_id)
+    user = await adb.get_user(user_id)
     
     # Geração de História
     logger.debug(f"Enviando prompt para o {core_model.get_model_name('global')} do chat")
     start_time = time.time()
-    result = core_model.new_chat(user.name, instruction)
+    result = await core_model.anew_chat(user.name, instruction)
     logger.debug(f"Resposta do Gemini recebida em {time.time() - start_time:.2f} segundos. Nome da história: {result.title}")
     
     # Salvando o Chat
-    chat = db.save_chat(user_id, MiniChatBase(
+    chat = await adb.save_chat(user_id, MiniChatBase(
         title=result.title,
         chat_image=result.shortcode,
         last_update= datetime.now(timezone.utc),
         voice_name=voice_name or "Kore"
     ))
     
+    await on_stage("text", {"chat_id": chat.chat_id, "title": chat.title, "chat_image": chat.chat_image,
+                            "message_index": 0, **result.model_dump(include=set(ContinueChat.model_fields))})
+    
     # Geração de Audio e Imagem
-    image, audio = generate_image_audio(result, user_id, chat.chat_id, 0, voice_name)
+    image, audio = await stream_image_audio(result, user_id, chat.chat_id, 0, voice_name, on_stage)
     
     # Salvando Mensagem
     logger.debug(f"Salvando nova mensagem no banco de dados para o chat {chat.chat_id}")
@@ -61,43 +72,35 @@ async def new_chat(user_id:str, audio_file: UploadFile, voice_name: str = "Kore"
         audio=audio
     )    
     
-    db.update_chat(user_id, chat.chat_id, 'messages', message)
+    await adb.update_chat(user_id, chat.chat_id, 'messages', message)
     
 
     # Iniciar geração da próxima mensagem em background e salvar em pending_messages
-    def _generate_next():
-        try:
-            logger.info(f"Pré-processando próxima mensagem para o chat: {chat.chat_id}")
-            next_msg = new_message(user_id, chat.chat_id, 1)
-            db.set_pending_message(chat.chat_id, next_msg.model_dump())
-            logger.info(f"Mensagem pré-processada salva para o chat: {chat.chat_id}")
-        except Exception as e:
-            logger.error(f"Erro ao pré-processar próxima mensagem: {e}")
-    threading.Thread(target=_generate_next, daemon=True).start()
+    prefetch_message(user_id, chat.chat_id, 1)
 
-    return Chat(
+    created = Chat(
         messages=[message],
         **chat.model_dump()
     )
+    await on_stage("persisted", created.model_dump(mode="json"))
+    return created
 
 def continue_chat(user_id:str, chat_id: str, message_id: int) -> None:
     """
     Continua o chat gerando a próxima mensagem de forma assíncrona
     """
     
-    def _continue_chat_async():
-        try:
-            logger.info(f"Gerando próxima mensagem para o chat: {chat_id}")
-            new_message(user_id, chat_id, message_id)
+    def _log_result(future: Future) -> None:
+        if future.cancelled():
+            return
+        if (error := future.exception()) is not None:
+            logger.error(f"Erro ao continuar chat {chat_id}: {str(error)}")
+            logger.error("".join(traceback.format_exception(error)))
+        else:
             logger.info(f"Próxima mensagem gerada com sucesso para o chat: {chat_id}")
-            
-        except Exception as e:
-            logger.error(f"Erro ao continuar chat {chat_id}: {str(e)}")
-            logger.error(traceback.format_exc())
-    
-    thread = threading.Thread(target=_continue_chat_async, daemon=True)
+
     logger.info(f"Iniciando geração assíncrona da próxima mensagem para o chat: {chat_id}")
-    thread.start()
+    generate_message(user_id, chat_id, message_id).add_done_callback(_log_result)
 
 async def continue_chat_async(user_id: str, chat_id: str, message_id: int, 
                             callback: Optional[Callable[[Message], Awaitable[None]]] = None) -> Message:
@@ -114,21 +117,15 @@ async def continue_chat_async(user_id: str, chat_id: str, message_id: int,
         Message: A nova mensagem gerada
     """
     
-    def _generate_message():
-        try:
-            logger.info(f"Gerando próxima mensagem para o chat: {chat_id}")
-            message = new_message(user_id, chat_id, message_id)
-            logger.info(f"Próxima mensagem gerada com sucesso para o chat: {chat_id}")
-            return message
-            
-        except Exception as e:
-            logger.error(f"Erro ao continuar chat {chat_id}: {str(e)}")
-            logger.error(traceback.format_exc())
-            raise e
-    
-    # Executa a geração em uma thread separada para não bloquear o loop de eventos
-    loop = asyncio.get_event_loop()
-    message = await loop.run_in_executor(None, _generate_message)
+    logger.info(f"Gerando próxima mensagem para o chat: {chat_id}")
+    try:
+        # Roda no agendador de jobs, à frente da pré-geração e sem bloquear o loop de eventos
+        message = await asyncio.wrap_future(generate_message(user_id, chat_id, message_id))
+    except Exception as e:
+        logger.error(f"Erro ao continuar chat {chat_id}: {str(e)}")
+        logger.error(traceback.format_exc())
+        raise e
+    logger.info(f"Próxima mensagem gerada com sucesso para o chat: {chat_id}")
     
     # Chama o callback se fornecido
     if callback:
@@ -0,0 +1,76 @@
+import asyncio
+import io
+import json
+import traceback
+from typing import Any, AsyncIterator, Awaitable, Callable
+
+from fastapi import HTTPException, UploadFile
+from fastapi.responses import StreamingResponse
+
+from api.constraints import config
+from api.services.messages import Stage
+from api.utils.logger import get_logger
+
+logger = get_logger(__name__)
+api_configs = config.get("APISettings", {})
+
+# Gerações em andamento: continuam até o fim mesmo se o cliente desconectar
+running: set[asyncio.Task] = set()
+
+def sse_event(event: str, data: Any) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str, ensure_ascii=False)}\n\n"
+
+async def buffered_upload(file: UploadFile) -> UploadFile:
+    """Cópia em memória do arquivo enviado, que continua legível depois que a rota retorna."""
+    return UploadFile(filename=file.filename, file=io.BytesIO(await file.read()), headers=file.headers)
+
+async def event_stream(produce: Callable[[Stage], Awaitable[Any]]) -> AsyncIterator[str]:
+    """
+    Executa `produce` e repassa cada etapa emitida como um evento SSE.
+
+    Termina com `done` ou `error`. Enquanto nenhuma etapa fica pronta, envia
+    comentários de heartbeat para proxies não encerrarem a conexão.
+    """
+    queue: asyncio.Queue = asyncio.Queue()
+    heartbeat = api_configs.get("sse_heartbeat_seconds", 15)
+
+    async def emit(event: str, payload: dict) -> None:
+        await queue.put(sse_event(event, payload))
+
+    async def _run() -> None:
+        try:
+            await produce(emit)
+            await queue.put(sse_event("done", {}))
+        except HTTPException as e:
+            await queue.put(sse_event("error", {"status_code": e.status_code, "detail": e.detail}))
+        except Exception as e:
+            logger.error(f"SSE: Erro durante a geração: {e}")
+            logger.error(traceback.format_exc())
+            await queue.put(sse_event("error", {"status_code": 500, "detail": "Internal Server Error"}))
+        finally:
+            await queue.put(None)
+
+    task = asyncio.create_task(_run())
+    running.add(task)
+    task.add_done_callback(running.discard)
+
+    while True:
+        try:
+            event = await asyncio.wait_for(queue.get(), timeout=heartbeat)
+        except asyncio.TimeoutError:
+            yield ": heartbeat\n\n"
+            continue
+        if event is None:
+            return
+        yield event
+
+def sse_response(produce: Callable[[Stage], Awaitable[Any]]) -> StreamingResponse:
+    return StreamingResponse(
+        event_stream(produce),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            # Desativa o buffer do nginx para os eventos chegarem assim que forem emitidos
+            "X-Accel-Buffering": "no",
+        }
+    )
@@ -1,10 +1,11 @@
+import asyncio
 import base64
 from concurrent.futures import ThreadPoolExecutor
 from fastapi import UploadFile
 import time
-from typing import Optional
+from typing import Awaitable, Callable, Optional
 
-from api.database import db
+from api.database import db, adb
 from api.schemas.llm import ContinueChat, SubmitImageResponse
 from api.schemas.messages import SubmitImageMessage, Message
 from api.utils.logger import get_logger
@@ -30,7 +31,32 @@ def generate_image_audio(result: ContinueChat, user_id:str, chat_id:Optional[str
 
     return image, audio
 
-def new_message(user_id:str, chat_id: str, message_id: int) -> Message:    
+Stage = Callable[[str, dict], Awaitable[None]]
+
+async def no_stage(stage: str, payload: dict) -> None:
+    pass
+
+async def stream_image_audio(result: ContinueChat, user_id:str, chat_id:Optional[str]=None, message_id: Optional[int]=None,
+                             voice_name: str = "Kore", on_stage: Stage = no_stage) -> tuple[str, str]:
+    """Gera imagem e áudio em paralelo, chamando `on_stage` ("image" / "audio") quando cada um termina."""
+    audio_prompt = "Narre essa história para uma criança de 5 anos, com uma voz amigável e entusiástica: "
+    audio_content = result.text_voice + ".\n" + result.intro_voice
+    start_time = time.time()
+
+    async def _stage(name: str, generation: Awaitable[str]) -> str:
+        path = await generation
+        logger.debug(f"Etapa {name} da mensagem {message_id} gerada em {time.time() - start_time:.2f} segundos.")
+        await on_stage(name, {"message_index": message_id, name: path})
+        return path
+
+    image, audio = await asyncio.gather(
+        _stage("image", core_model.agenerate_scene_image(result.scene_image_description, user_id, chat_id, message_id)),
+        _stage("audio", core_model.agenerate_text_to_voice(audio_content, audio_prompt, user_id, voice_name, chat_id, message_id))
+    )
+    return image, audio
+
+def new_message(user_id:str, chat_id: str, message_id: int, persist: bool = True) -> Message:
+    """Gera a mensagem `message_id`; com `persist=False` (pré-geração) ela não é salva no chat."""
     logger.debug(f"Recuperando itens do chat {chat_id} para a nova mensagem {message_id}")
     items = db.get_chat_items(chat_id)
     logger.debug(f"Itens do chat {chat_id} obtidos")
@@ -53,12 +79,46 @@ def new_message(user_id:str, chat_id: str, message_id: int) -> Message:
         **result.model_dump()
     )
     
-    db.update_chat(user_id, chat_id, 'messages', message)
+    if persist:
+        db.update_chat(user_id, chat_id, 'messages', message)
     
     return message
 
+async def stream_new_message(user_id: str, chat_id: str, message_id: int, on_stage: Stage = no_stage) -> Message:
+    """
+    Gera a próxima mensagem entregando cada parte assim que fica pronta.
+
+    `on_stage` recebe "text" quando o LLM responde e depois "audio" e "image"
+    na ordem em que terminarem; a mensagem completa é salva no chat e retornada.
+    """
+    items, user, chat = await asyncio.gather(
+        adb.get_chat_items(chat_id),
+        adb.get_user(user_id),
+        adb.get_chat(chat_id, user_id)
+    )
+
+    logger.debug(f"Enviando prompt para o {core_model.get_model_name('global')} do chat {chat_id} e mensagem {message_id}")
+    start_time = time.time()
+    result = await core_model.acontinue_chat(items, user.name)
+    logger.debug(f"Resposta do {core_model.get_model_name('global')} recebida em {time.time() - start_time:.2f} segundos para o chat {chat_id} e mensagem {message_id}")
+    await on_stage("text", {"message_index": message_id, **result.model_dump()})
+
+    voice_name = getattr(chat, 'voice_name', 'Kore')
+    image, audio = await stream_image_audio(result, user_id, chat_id, message_id, voice_name, on_stage)
+
+    message = Message(
+        message_index=message_id,
+        image=image,
+        audio=audio,
+        **result.model_dump()
+    )
+
+    await adb.update_chat(user_id, chat_id, 'messages', message)
+
+    return message
+
 async def submit_image(chat_id: str, target: str, image_file: UploadFile, user_id:str) -> SubmitImageResponse:
-    user = db.get_user(user_id)
+    user = await adb.get_user(user_id)
     
     logger.debug(f"Submetendo nova imagem para o chat: {chat_id}")
     start_time = time.time()
@@ -67,7 +127,7 @@ async def submit_image(chat_id: str, target: str, image_file: UploadFile, user_i
     
     return result
     
-def generate_feedback_audio(
+async def generate_feedback_audio(
         result: SubmitImageResponse, 
         feedback_audio:str, 
         user_id:str, 
@@ -77,9 +137,9 @@ def generate_feedback_audio(
     
     start_time = time.time()
 
-    chat = db.get_chat(chat_id, user_id)
+    chat = await adb.get_chat(chat_id, user_id)
     voice_name = getattr(chat, 'voice_name', 'Kore')
-    feedback_audio = core_model.generate_text_to_voice(result.feedback, feedback_audio, user_id, voice_name, chat_id, message_id, True)
+    feedback_audio = await core_model.agenerate_text_to_voice(result.feedback, feedback_audio, user_id, voice_name, chat_id, message_id, True)
 
     logger.debug(f"Áudio de feedback gerado em {time.time() - start_time:.2f} segundos.")
     
@@ -93,6 +153,6 @@ def generate_feedback_audio(
     )
     
     if result.is_correct:
-        db.update_chat(user_id, chat_id, 'submits', submit_message)
+        await adb.update_chat(user_id, chat_id, 'submits', submit_message)
     
     return submit_message
\ No newline at end of file
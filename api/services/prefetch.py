@@ -0,0 +1,267 @@
+import asyncio
+import heapq
+import itertools
+import threading
+import time
+from concurrent.futures import CancelledError, Future
+from typing import Any, Callable, Optional
+
+from api.constraints import config
+from api.database import db
+from api.schemas.messages import Message
+from api.utils.logger import get_logger
+
+logger = get_logger(__name__)
+prefetch_configs = config.get("Prefetch", {})
+
+# Prioridades (menor roda primeiro): a mensagem que a criança está esperando passa à frente da pré-geração
+INTERACTIVE = 0
+PREFETCH = 10
+
+class Job:
+    def __init__(self, key: tuple, priority: int, func: Callable[["Job"], Any]) -> None:
+        self.key = key
+        self.priority = priority
+        self.func = func
+        self.future: Future = Future()
+        self.cancelled = False
+        self.running = False
+        self.enqueued_at = time.monotonic()
+
+class JobScheduler:
+    """
+    Fila central das gerações de mensagens em background.
+
+    Um número fixo de workers consome a fila por prioridade; a pré-geração
+    ocupa no máximo `max_prefetch` deles, deixando sempre um worker livre
+    para a geração que a criança está esperando. Cada chave
+    (tipo, chat_id, message_index) tem no máximo um job na fila ou rodando:
+    pedidos repetidos recebem o mesmo Future. Jobs cancelados saem da fila;
+    os que já estão rodando terminam e ficam marcados (`job.cancelled`), para
+    que a função descarte o resultado em vez de salvá-lo.
+    """
+
+    def __init__(self, workers: int = 4, max_prefetch: Optional[int] = None) -> None:
+        self.workers = max(workers, 1)
+        self.max_prefetch = max_prefetch if max_prefetch is not None else max(self.workers - 1, 1)
+        self.queue: list[tuple[int, int, Job]] = []
+        self.jobs: dict[tuple, Job] = {}
+        self.counter = itertools.count()
+        self.condition = threading.Condition()
+        self.stopped = False
+        self.running_prefetch = 0
+        self.threads: list[threading.Thread] = []
+        self.metrics = {
+            "submitted": 0,
+            "deduplicated": 0,
+            "completed": 0,
+            "failed": 0,
+            "cancelled": 0,
+            "max_queued": 0,
+        }
+        self.total_run_time = 0.0
+        self.max_run_time = 0.0
+        self.total_wait = 0.0
+
+    def start(self) -> None:
+        with self.condition:
+            if self.threads:
+                return
+            for i in range(self.workers):
+                thread = threading.Thread(target=self.work, name=f"job-scheduler-{i}", daemon=True)
+                self.threads.append(thread)
+                thread.start()
+
+    def submit(self, key: tuple, func: Callable[[Job], Any], priority: int = PREFETCH) -> Future:
+        """Agenda `func(job)`; se já houver um job com a mesma chave, retorna o Future dele."""
+        self.start()
+        with self.condition:
+            job = self.jobs.get(key)
+            if job is not None and not job.cancelled:
+                self.metrics["deduplicated"] += 1
+                self.promote(job, priority)
+                return job.future
+
+            job = Job(key, priority, func)
+            self.jobs[key] = job
+            heapq.heappush(self.queue, (priority, next(self.counter), job))
+            self.metrics["submitted"] += 1
+            self.metrics["max_queued"] = max(self.metrics["max_queued"], self.queued())
+            self.condition.notify()
+            return job.future
+
+    def promote(self, job: Job, priority: int) -> None:
+        # Chamado com o lock: alguém passou a esperar por um job ainda na fila
+        if priority < job.priority and not job.running:
+            job.priority = priority
+            heapq.heappush(self.queue, (priority, next(self.counter), job))
+            self.condition.notify()
+
+    def cancel(self, chat_id: str, before_index: Optional[int] = None) -> int:
+        """Cancela a pré-geração do chat (só índices menores que `before_index`, se informado)."""
+        cancelled = 0
+        with self.condition:
+            for key, job in list(self.jobs.items()):
+                kind, job_chat_id, message_index = key
+                if kind != "prefetch" or job_chat_id != chat_id or job.cancelled:
+                    continue
+                if before_index is not None and message_index >= before_index:
+                    continue
+                self.discard(job)
+                cancelled += 1
+        return cancelled
+
+    def discard(self, job: Job) -> None:
+        # Chamado com o lock; um job na fila é ignorado quando sair do heap
+        job.cancelled = True
+        self.jobs.pop(job.key, None)
+        self.metrics["cancelled"] += 1
+        if not job.running:
+            job.future.cancel()
+
+    def queued(self) -> int:
+        return sum(1 for job in self.jobs.values() if not job.running)
+
+    def next_job(self) -> Optional[Job]:
+        # Chamado com o lock: descarta entradas obsoletas e respeita o limite da pré-geração
+        while self.queue:
+            priority, _, job = self.queue[0]
+            if job.cancelled or job.running or priority != job.priority:
+                heapq.heappop(self.queue)
+                continue
+            if job.priority >= PREFETCH and self.running_prefetch >= self.max_prefetch:
+                return None
+            heapq.heappop(self.queue)
+            return job
+        return None
+
+    def work(self) -> None:
+        while True:
+            with self.condition:
+                while not self.stopped and (job := self.next_job()) is None:
+                    self.condition.wait()
+                if self.stopped:
+                    return
+                job.running = True
+                prefetch = job.priority >= PREFETCH
+                self.running_prefetch += prefetch
+                self.total_wait += time.monotonic() - job.enqueued_at
+
+            start_time = time.monotonic()
+            try:
+                if job.future.set_running_or_notify_cancel():
+                    job.future.set_result(job.func(job))
+                    outcome = "completed"
+                else:
+                    outcome = "cancelled"
+            except Exception as e:
+                job.future.set_exception(e)
+                outcome = "failed"
+            run_time = time.monotonic() - start_time
+
+            with self.condition:
+                self.running_prefetch -= prefetch
+                if self.jobs.get(job.key) is job:
+                    del self.jobs[job.key]
+                if outcome != "cancelled":
+                    self.metrics[outcome] += 1
+                self.total_run_time += run_time
+                self.max_run_time = max(self.max_run_time, run_time)
+                self.condition.notify_all()
+
+    def stats(self) -> dict[str, Any]:
+        with self.condition:
+            finished = self.metrics["completed"] + self.metrics["failed"]
+            return {
+                **self.metrics,
+                "queued": self.queued(),
+                "running": sum(1 for job in self.jobs.values() if job.running),
+                "avg_wait_s": round(self.total_wait / finished, 3) if finished else 0.0,
+                "avg_run_time_s": round(self.total_run_time / finished, 3) if finished else 0.0,
+                "max_run_time_s": round(self.max_run_time, 3),
+            }
+
+    def stop(self, timeout: Optional[float] = 30.0) -> None:
+        """
+        Cancela a fila e aguarda os jobs em andamento (até `timeout` segundos no total).
+
+        Chamado no shutdown antes de fechar o banco, para que nenhum job escreva
+        num banco já fechado.
+        """
+        with self.condition:
+            for job in list(self.jobs.values()):
+                if not job.running:
+                    self.discard(job)
+            self.stopped = True
+            self.condition.notify_all()
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        for thread in self.threads:
+            thread.join(None if deadline is None else max(deadline - time.monotonic(), 0))
+        if alive := sum(thread.is_alive() for thread in self.threads):
+            logger.warning(f"{alive} jobs em background não terminaram em {timeout} segundos")
+        logger.info(f"Jobs em background: {self.stats()}")
+
+scheduler = JobScheduler(
+    workers=prefetch_configs.get("workers", 4),
+    max_prefetch=prefetch_configs.get("max_prefetch")
+)
+shutdown_timeout = prefetch_configs.get("shutdown_timeout_seconds", 30)
+
+def prefetch_message(user_id: str, chat_id: str, message_index: int) -> Future:
+    """
+    Pré-gera a mensagem `message_index` e a guarda como pending do chat.
+
+    Pré-gerações mais antigas do mesmo chat ainda na fila deixam de ser úteis
+    e são canceladas.
+    """
+    from api.services.messages import new_message
+
+    def _prefetch(job: Job) -> Message:
+        logger.info(f"Pré-processando mensagem {message_index} para o chat: {chat_id}")
+        # Só entra no chat quando for entregue (pending consumido); cancelada, não deixa rastro
+        message = new_message(user_id, chat_id, message_index, persist=False)
+        if job.cancelled:
+            logger.info(f"Pré-processamento da mensagem {message_index} cancelado para o chat: {chat_id}")
+            return message
+        db.set_pending_message(chat_id, message.model_dump())
+        logger.info(f"Mensagem {message_index} pré-processada salva para o chat: {chat_id}")
+        return message
+
+    scheduler.cancel(chat_id, before_index=message_index)
+    future = scheduler.submit(("prefetch", chat_id, message_index), _prefetch, PREFETCH)
+    future.add_done_callback(log_failure)
+    return future
+
+async def wait_prefetch(chat_id: str, message_index: int) -> bool:
+    """
+    Aguarda a pré-geração da mensagem, se ela estiver na fila ou rodando.
+
+    Evita gerar a mesma mensagem duas vezes quando a criança acerta o desenho
+    antes de a pré-geração terminar. Retorna True se havia uma pré-geração
+    e ela terminou com sucesso (a mensagem já está em pending).
+    """
+    with scheduler.condition:
+        job = scheduler.jobs.get(("prefetch", chat_id, message_index))
+        if job is None:
+            return False
+        # A criança já está esperando por ela: passa à frente do resto da fila
+        scheduler.promote(job, INTERACTIVE)
+    try:
+        await asyncio.wrap_future(job.future)
+        return True
+    except (Exception, CancelledError):
+        return False
+
+def generate_message(user_id: str, chat_id: str, message_index: int) -> Future:
+    """Gera agora a mensagem `message_index` (interativo: passa à frente da pré-geração)."""
+    from api.services.messages import new_message
+
+    return scheduler.submit(
+        ("message", chat_id, message_index),
+        lambda job: new_message(user_id, chat_id, message_index),
+        INTERACTIVE
+    )
+
+def log_failure(future: Future) -> None:
+    if not future.cancelled() and (error := future.exception()) is not None:
+        logger.error(f"Erro ao pré-processar mensagem: {error}")
@@ -0,0 +1,275 @@
+import asyncio
+import base64
+import io
+import time
+import traceback
+from typing import Any, Awaitable, Callable, Optional
+
+from fastapi import HTTPException, UploadFile, WebSocket, WebSocketDisconnect
+
+from api.auth import verify_token_string
+from api.constraints import config
+from api.database import adb
+from api.database.executor import get_database_executor
+from api.schemas.messages import Message
+from api.services.messages import submit_image, generate_feedback_audio, stream_new_message
+from api.services.prefetch import prefetch_message, wait_prefetch
+from api.utils.logger import get_logger
+
+logger = get_logger(__name__)
+api_configs = config.get("APISettings", {})
+
+Send = Callable[[dict], Awaitable[None]]
+
+# Submissões em andamento: terminam mesmo se o cliente desconectar, senão o chat
+# ficaria com a submissão correta salva e sem a mensagem seguinte
+submissions: set[asyncio.Task] = set()
+
+def message_payload(message: Message) -> dict:
+    return {
+        "message_index": message.message_index,
+        "paint_image": message.paint_image,
+        "text_voice": message.text_voice,
+        "intro_voice": message.intro_voice,
+        "scene_image_description": message.scene_image_description,
+        "image": message.image,
+        "audio": message.audio
+    }
+
+async def process_submission(chat_id: str, user_id: str, image_bytes: bytes, send: Send) -> None:
+    """
+    Avalia um desenho e envia o feedback e, se correto, a próxima mensagem da história.
+
+    Compartilhado pelo WebSocket de submissão única, pela sessão da história e
+    pelo SSE. Falhas de envio (cliente desconectado) só são registradas: a
+    submissão sempre vai até o fim, salvando a próxima mensagem.
+    """
+    async def _send(data: dict) -> None:
+        try:
+            await send(data)
+        except Exception as e:
+            logger.warning(f"WebSocket: Não foi possível enviar {data.get('type')} para o chat {chat_id}: {e}")
+
+    chat = await adb.get_chat(chat_id, user_id)
+    message_index = len(chat.subimits)
+
+    logger.debug(f"WebSocket: Submetendo desenho {message_index} do chat: {chat.chat_id}")
+
+    image_file = UploadFile(
+        filename="drawing.jpg",
+        file=io.BytesIO(image_bytes)
+    )
+
+    # Avalia o desenho
+    expected_draw = chat.messages[len(chat.subimits)].paint_image
+    result = await submit_image(chat_id, expected_draw, image_file, user_id)
+
+    # Processa resultado e gera feedback
+    image_path = None
+    if result.is_correct:
+        logger.info(f"WebSocket: Imagem submetida corretamente para o chat: {chat_id}")
+        image_path = await adb.store_user_archive(user_id, image_file)
+        feedback_audio = "Fale de uma maneira energética, elogiando o desenho da criança com essas palavras: "
+    else:
+        logger.info(f"WebSocket: Imagem submetida incorretamente para o chat: {chat_id}, era esperado um {expected_draw}")
+        feedback_audio = "Fale de uma maneira apasiguadora, incentivando a criança a melhorar seu desenho com essas palavras: "
+
+    # Gera feedback de áudio
+    feedback = await generate_feedback_audio(result, feedback_audio, user_id, chat_id, message_index, image_path)
+
+    await _send({
+        "type": "feedback",
+        "message": {
+            "message_index": feedback.message_index,
+            "audio": feedback.audio,
+            "data": {
+                "is_correct": result.is_correct,
+                "feedback": result.feedback
+            },
+            "image": feedback.image
+        }
+    })
+
+    if not result.is_correct:
+        return
+
+    # Se correto, usa mensagem pré-processada (pending) e dispara a próxima em background
+    pending = await adb.pop_pending_message(chat_id)
+    if not pending and await wait_prefetch(chat_id, message_index + 1):
+        pending = await adb.pop_pending_message(chat_id)
+    if pending:
+        msg = Message(**pending)
+        # Persistir a mensagem e enviar imediatamente
+        await adb.update_chat(user_id, chat_id, 'messages', msg)
+        logger.info(f"WebSocket: Nova mensagem (pending) salva para o chat: {chat_id}")
+    else:
+        logger.info(f"WebSocket: Sem mensagem pending; gerando nova mensagem agora para o chat: {chat_id}")
+
+        # Envia cada parte assim que fica pronta: texto do LLM, depois áudio e imagem
+        async def send_stage(stage: str, message: dict):
+            await _send({"type": stage, "message": message})
+
+        msg = await stream_new_message(user_id, chat_id, message_index + 1, send_stage)
+        logger.info(f"WebSocket: Nova mensagem gerada para o chat: {chat_id}")
+
+    await _send({"type": "new_message", "message": message_payload(msg)})
+
+    # Iniciar geração da próxima pending em background (a mensagem seguinte à que acabou de ser enviada)
+    next_index = pending.get('message_index', message_index + 1) + 1 if pending else message_index + 2
+    prefetch_message(user_id, chat_id, next_index)
+
+class ChatSession:
+    """
+    Sessão WebSocket de uma história inteira.
+
+    Autentica uma única vez e depois aceita várias submissões (inclusive
+    novas tentativas) na mesma conexão. Cada pedido leva um `request_id`,
+    repetido nas respostas. As submissões de um chat são processadas em
+    ordem, no máximo `max_in_flight` por vez entre em andamento e na fila;
+    o servidor envia heartbeats e encerra conexões ociosas.
+    """
+
+    def __init__(self, websocket: WebSocket, chat_id: str) -> None:
+        self.websocket = websocket
+        self.chat_id = chat_id
+        self.user_id: Optional[str] = None
+        self.max_in_flight = api_configs.get("websocket_max_in_flight", 2)
+        self.heartbeat_interval = api_configs.get("websocket_heartbeat_seconds", 20)
+        self.idle_timeout = api_configs.get("websocket_idle_timeout_seconds", 900)
+        self.in_flight = 0
+        # Submissões do mesmo chat em ordem: o índice da próxima depende da anterior
+        self.submission_lock = asyncio.Lock()
+        self.send_lock = asyncio.Lock()
+        self.last_activity = time.monotonic()
+        self.closed = False
+
+    async def send(self, data: dict) -> None:
+        """Envia um quadro; com o socket já fechado, o quadro é descartado."""
+        if self.closed:
+            return
+        async with self.send_lock:
+            try:
+                await self.websocket.send_json(data)
+            except (WebSocketDisconnect, RuntimeError) as e:
+                self.closed = True
+                logger.info(f"WebSocket: Sessão do chat {self.chat_id} fechada, descartando {data.get('type')}: {e}")
+
+    async def authenticate(self) -> bool:
+        auth_data = await asyncio.wait_for(self.websocket.receive_json(), timeout=self.heartbeat_interval * 3)
+        if auth_data.get("type") != "auth":
+            await self.send({"type": "error", "message": "Primeira mensagem deve ser de autenticação"})
+            return False
+        try:
+            self.user_id = await get_database_executor().run(verify_token_string, auth_data.get("token"))
+        except Exception:
+            await self.send({"type": "error", "message": "Token de autenticação inválido"})
+            return False
+
+        # Confere a posse do chat uma única vez, antes de aceitar submissões
+        try:
+            await adb.get_chat(self.chat_id, self.user_id)
+        except HTTPException as e:
+            # Chat inexistente (404) ou de outro usuário (403): o cliente recebe o motivo real
+            await self.send({"type": "error", "status_code": e.status_code, "message": e.detail})
+            return False
+        await self.send({"type": "ready", "chat_id": self.chat_id, "max_in_flight": self.max_in_flight})
+        return True
+
+    async def heartbeat(self) -> None:
+        try:
+            while not self.closed:
+                await asyncio.sleep(self.heartbeat_interval)
+                if time.monotonic() - self.last_activity > self.idle_timeout:
+                    logger.info(f"WebSocket: Sessão ociosa encerrada para o chat: {self.chat_id}")
+                    # Marca antes de fechar: o receive_json pendente em run() vai falhar em seguida
+                    self.closed = True
+                    await self.websocket.close()
+                    return
+                await self.send({"type": "heartbeat"})
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"WebSocket: Heartbeat da sessão do chat {self.chat_id} interrompido: {e}")
+
+    async def handle_submission(self, request_id: Any, image_bytes: bytes) -> None:
+        async def send(data: dict) -> None:
+            await self.send({**data, "request_id": request_id})
+
+        try:
+            async with self.submission_lock:
+                await process_submission(self.chat_id, self.user_id or "", image_bytes, send)
+            await send({"type": "done"})
+        except Exception as e:
+            logger.error(f"WebSocket: Erro durante submissão de imagem na sessão: {e}")
+            logger.error(traceback.format_exc())
+            try:
+                await send({"type": "error", "message": "Erro interno do servidor"})
+            except Exception:
+                pass
+        finally:
+            self.in_flight -= 1
+
+    async def dispatch(self, data: dict) -> None:
+        request_type = data.get("type")
+        request_id = data.get("request_id")
+
+        if request_type == "ping":
+            await self.send({"type": "pong", "request_id": request_id})
+            return
+
+        if request_type != "submit_image":
+            await self.send({"type": "error", "request_id": request_id, "message": f"Tipo de mensagem desconhecido: {request_type}"})
+            return
+
+        if self.in_flight >= self.max_in_flight:
+            await self.send({"type": "error", "request_id": request_id, "message": "Muitas submissões em andamento"})
+            return
+
+        try:
+            image_bytes = base64.b64decode(data.get("image_data") or "", validate=True)
+        except Exception:
+            await self.send({"type": "error", "request_id": request_id, "message": "Imagem inválida"})
+            return
+
+        self.in_flight += 1
+        task = asyncio.create_task(self.handle_submission(request_id, image_bytes))
+        submissions.add(task)
+        task.add_done_callback(submissions.discard)
+
+    async def run(self) -> None:
+        await self.websocket.accept()
+        heartbeat: Optional[asyncio.Task] = None
+        try:
+            if not await self.authenticate():
+                await self.websocket.close()
+                return
+
+            heartbeat = asyncio.create_task(self.heartbeat())
+            while True:
+                data = await self.websocket.receive_json()
+                self.last_activity = time.monotonic()
+                await self.dispatch(data)
+
+        except WebSocketDisconnect:
+            logger.info(f"WebSocket: Cliente desconectou da sessão do chat: {self.chat_id}")
+        except RuntimeError as e:
+            if not self.closed:
+                raise
+            # receive_json depois do fechamento por ociosidade
+            logger.debug(f"WebSocket: Leitura encerrada na sessão fechada do chat {self.chat_id}: {e}")
+        except asyncio.TimeoutError:
+            logger.info(f"WebSocket: Sessão sem autenticação encerrada para o chat: {self.chat_id}")
+            await self.websocket.close()
+        except Exception as e:
+            logger.error(f"WebSocket: Erro na sessão do chat {self.chat_id}: {e}")
+            logger.error(traceback.format_exc())
+            try:
+                await self.send({"type": "error", "message": "Erro interno do servidor"})
+                await self.websocket.close()
+            except Exception:
+                pass
+        finally:
+            self.closed = True
+            if heartbeat is not None:
+                heartbeat.cancel()
+            # As submissões em andamento não são canceladas: terminam e salvam a próxima mensagem
@@ -0,0 +1,24 @@
+import os
+import shutil
+import sys
+import tempfile
+
+import tomlkit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# O config.toml é lido do diretório atual e o banco local grava em ./temp:
+# os testes rodam numa cópia isolada, com o banco local e sem arquivo de log
+WORKDIR = tempfile.mkdtemp(prefix="louie-tests-")
+with open(os.path.join(ROOT, "config.toml")) as f:
+    test_config = tomlkit.parse(f.read())
+test_config["Database"]["backend"] = "local"
+test_config["Logger"]["file_handler"] = False
+with open(os.path.join(WORKDIR, "config.toml"), "w") as f:
+    f.write(tomlkit.dumps(test_config))
+os.chdir(WORKDIR)
+
+def pytest_unconfigure(config):
+    os.chdir(ROOT)
+    shutil.rmtree(WORKDIR, ignore_errors=True)
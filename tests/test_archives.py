@@ -0,0 +1,120 @@
+import os
+import time
+from datetime import datetime, timezone
+
+import pytest
+from google.api_core.exceptions import NotFound
+
+from api.database.archives import ArchiveInfo, content_hash
+from api.database.firebase import FirebaseDB
+from api.database.local import LocalArchiveStore
+
+def test_content_hit_refreshes_mtime():
+    store = LocalArchiveStore()
+    path = store.store_content(b"desenho", ".png")
+    old = time.time() - 30 * 24 * 3600
+    os.utime(path, (old, old))
+
+    # Conteúdo repetido reutiliza o arquivo e o marca como recente para a coleta
+    assert store.store_content(b"desenho", ".png") == path
+    assert os.path.getmtime(path) > old + 24 * 3600
+
+def test_content_hit_after_collection_stores_again():
+    store = LocalArchiveStore()
+    path = store.store_content(b"audio", ".wav")
+    os.remove(path)
+
+    assert store.store_content(b"audio", ".wav") == path
+    with open(path, "rb") as f:
+        assert f.read() == b"audio"
+
+class FakeBlob:
+    def __init__(self, bucket, name):
+        self.bucket = bucket
+        self.name = name
+
+    @property
+    def storage_class(self):
+        return self.bucket.classes[self.name]
+
+    def patch(self):
+        if self.name not in self.bucket.classes:
+            raise NotFound(self.name)
+
+    def update_storage_class(self, storage_class):
+        self.bucket.classes[self.name] = storage_class
+
+    def delete(self):
+        del self.bucket.classes[self.name]
+
+class FakeBucket:
+    name = "louie"
+
+    def __init__(self):
+        self.classes = {}
+
+    def blob(self, name):
+        return FakeBlob(self, name)
+
+class FakeSnapshot:
+    def __init__(self, data):
+        self.data = data
+        self.exists = data is not None
+
+    def get(self, field):
+        return self.data[field]
+
+class FakeRefs:
+    def __init__(self):
+        self.docs = {}
+
+    def collection(self, name):
+        return self
+
+    def document(self, key):
+        refs = self
+
+        class Ref:
+            def get(self):
+                return FakeSnapshot(refs.docs.get(key))
+
+            def set(self, data, merge=False):
+                refs.docs[key] = {**refs.docs.get(key, {}), **data}
+
+            def delete(self):
+                refs.docs.pop(key, None)
+
+        return Ref()
+
+@pytest.fixture
+def firebase_store():
+    store = object.__new__(FirebaseDB)
+    store.bucket = FakeBucket()
+    store.db = FakeRefs()
+
+    def upload_blob(file_bytes, blob_path, mime_type):
+        store.bucket.classes[blob_path] = "STANDARD"
+        return f"https://storage.googleapis.com/louie/{blob_path}"
+
+    store.upload_blob = upload_blob
+    return store
+
+def test_cold_retire_clears_the_refs_document(firebase_store):
+    url = firebase_store.upload_content(b"desenho", ".png", "image/png")
+    key = content_hash(b"desenho")
+    firebase_store.retire_archive(ArchiveInfo(ref=url, size=7, updated=datetime.now(tz=timezone.utc)), cold=True)
+
+    assert firebase_store.bucket.classes[f"cas/{key}.png"] == "COLDLINE"
+    assert key not in firebase_store.db.docs
+    # Conteúdo repetido depois da retirada volta como um objeto novo na classe padrão
+    assert firebase_store.upload_content(b"desenho", ".png", "image/png") == url
+    assert firebase_store.bucket.classes[f"cas/{key}.png"] == "STANDARD"
+
+def test_cold_blob_referenced_again_is_restored(firebase_store):
+    # Arquivo retirado para o frio com o documento de referências ainda presente
+    url = firebase_store.upload_content(b"audio", ".wav", "audio/wav")
+    path = f"cas/{content_hash(b'audio')}.wav"
+    firebase_store.bucket.classes[path] = "COLDLINE"
+
+    assert firebase_store.upload_content(b"audio", ".wav", "audio/wav") == url
+    assert firebase_store.bucket.classes[path] == "STANDARD"
@@ -0,0 +1,88 @@
+import asyncio
+import io
+
+import pytest
+from fastapi import UploadFile
+
+# As rotas importam os modelos de IA; sem os SDKs instalados os testes são pulados
+pytest.importorskip("openai")
+pytest.importorskip("google.genai")
+
+import api.routes.chat as chat_routes
+from api.schemas.llm import SubmitImageResponse
+from api.schemas.messages import Chat, Message, SubmitImageMessage
+
+def message(index: int) -> Message:
+    return Message(
+        message_index=index, paint_image="gato", text_voice="Era uma vez", intro_voice="Desenhe",
+        scene_image_description="Um gato", image=f"{index}.png", audio=f"{index}.wav"
+    )
+
+class FakeDatabase:
+    def __init__(self, pending: dict | None = None) -> None:
+        self.pending = pending
+        self.messages = [message(0)]
+
+    async def get_chat(self, chat_id: str, user_id: str) -> Chat:
+        return Chat(
+            chat_id=chat_id, title="Gato", chat_image="🐱", voice_name="Kore",
+            last_update="2026-01-01T00:00:00+00:00", messages=list(self.messages), subimits=[]
+        )
+
+    async def store_user_archive(self, user_id, file) -> str:
+        return "drawing.jpg"
+
+    async def pop_pending_message(self, chat_id: str):
+        pending, self.pending = self.pending, None
+        return pending
+
+    async def update_chat(self, user_id, chat_id, target, item) -> None:
+        if target == "messages":
+            self.messages.append(item)
+
+@pytest.fixture
+def routes(monkeypatch):
+    prefetched: list[int] = []
+
+    async def submit_image(chat_id, target, image_file, user_id):
+        return SubmitImageResponse(is_correct=True, feedback="Muito bem!")
+
+    async def generate_feedback_audio(result, feedback_audio, user_id, chat_id, message_id, image=None):
+        return SubmitImageMessage(message_index=message_id, audio="feedback.wav", data=result, image=image)
+
+    async def wait_prefetch(chat_id, message_index):
+        return False
+
+    async def stream_new_message(user_id, chat_id, message_id):
+        # Como a versão real: gera e salva a mensagem no chat
+        generated = message(message_id)
+        await chat_routes.adb.update_chat(user_id, chat_id, "messages", generated)
+        return generated
+
+    monkeypatch.setattr(chat_routes, "submit_image", submit_image)
+    monkeypatch.setattr(chat_routes, "generate_feedback_audio", generate_feedback_audio)
+    monkeypatch.setattr(chat_routes, "wait_prefetch", wait_prefetch)
+    monkeypatch.setattr(chat_routes, "stream_new_message", stream_new_message)
+    monkeypatch.setattr(chat_routes, "prefetch_message", lambda user_id, chat_id, index: prefetched.append(index))
+    return prefetched
+
+def submit(monkeypatch, database: FakeDatabase) -> SubmitImageMessage:
+    monkeypatch.setattr(chat_routes, "adb", database)
+    image = UploadFile(filename="drawing.jpg", file=io.BytesIO(b"jpeg"))
+    return asyncio.run(chat_routes.submit_image_api("c1", image=image, user_id="u1"))
+
+def test_submit_delivers_the_pending_message(routes, monkeypatch):
+    database = FakeDatabase(pending=message(1).model_dump())
+    feedback = submit(monkeypatch, database)
+
+    assert feedback.data.is_correct
+    assert [item.message_index for item in database.messages] == [0, 1]
+    assert routes == [2]
+
+def test_submit_without_pending_generates_the_next_message(routes, monkeypatch):
+    # Pré-geração perdida (restart, outro worker, falha ou TTL)
+    database = FakeDatabase(pending=None)
+    submit(monkeypatch, database)
+
+    assert [item.message_index for item in database.messages] == [0, 1]
+    assert routes == [2]
@@ -0,0 +1,16 @@
+from api.database.context import append_context, build_context
+
+def message(index: int) -> dict:
+    return {"message_index": index, "text_voice": f"Parte {index}", "paint_image": f"gato {index}", "image": f"{index}.png"}
+
+def test_append_context_matches_a_full_rebuild():
+    context = None
+    for index in range(3):
+        context = append_context(context, message(index))
+    assert context == build_context([message(index) for index in range(3)])
+
+def test_append_context_asks_for_a_rebuild_out_of_order_or_after_a_gap():
+    context = build_context([message(0), message(1)])
+    assert append_context(context, message(0)) is None
+    # A mensagem 2 está no chat mas não chegou ao contexto: acrescentar a 3 deixaria a lacuna para sempre
+    assert append_context(context, message(3)) is None
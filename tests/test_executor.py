@@ -0,0 +1,41 @@
+import asyncio
+import threading
+
+from api.database.executor import DatabaseExecutor
+from api.database.threaded import ThreadedDatabase
+
+def test_stats_show_the_queue_while_calls_wait():
+    executor = DatabaseExecutor(max_workers=1)
+    release = threading.Event()
+
+    async def _run():
+        calls = [asyncio.ensure_future(executor.run(release.wait)) for _ in range(3)]
+        await asyncio.sleep(0.05)
+        # Com um worker ocupado, as outras chamadas aparecem na fila em tempo de execução
+        stats = executor.stats()
+        release.set()
+        await asyncio.gather(*calls)
+        return stats
+
+    stats = asyncio.run(_run())
+    assert stats["active"] == 1 and stats["queued"] == 2
+    assert executor.stats()["completed"] == 3
+    executor.shutdown()
+
+def test_close_does_not_block_the_event_loop():
+    database = object.__new__(ThreadedDatabase)
+    database.executor = DatabaseExecutor(max_workers=1)
+    release = threading.Event()
+
+    async def _run():
+        # Com timeout: um close bloqueante travaria o loop só até a chamada terminar sozinha
+        call = asyncio.ensure_future(database.executor.run(release.wait, 2))
+        await asyncio.sleep(0.05)
+        close = asyncio.ensure_future(database.close())
+        await asyncio.sleep(0.05)
+        # O shutdown espera a chamada em andamento, mas o loop continua atendendo
+        assert not close.done()
+        release.set()
+        await asyncio.wait_for(asyncio.gather(call, close), timeout=5)
+
+    asyncio.run(_run())
@@ -0,0 +1,197 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+from google.api_core.exceptions import NotFound
+
+import api.database.firebase as firebase
+from api.database.cache import TTLCache
+from api.database.firebase import FirebaseDB
+from api.database.firebase_async import AsyncFirebaseDB
+from api.schemas.llm import SubmitImageResponse
+from api.schemas.messages import Message, SubmitImageMessage
+
+CHAT = {
+    "chat_id": "c1", "user_id": "u1", "title": "Gato", "chat_image": "🐱",
+    "voice_name": "Kore", "last_update": "2026-01-01T00:00:00+00:00"
+}
+
+class FakeSnapshot:
+    def __init__(self, data):
+        self.data = data
+        self.exists = data is not None
+
+    def to_dict(self):
+        return dict(self.data) if self.data is not None else None
+
+class FakeDocument:
+    def __init__(self, client, collection, id):
+        self.client = client
+        self.collection = collection
+        self.id = id
+
+    def get(self, transaction=None):
+        self.client.reads.append((self.collection, transaction is not None))
+        return self.client.result(FakeSnapshot(self.client.store.get(self.collection, {}).get(self.id)))
+
+class FakeQuery:
+    def __init__(self, client, collection, filters=()):
+        self.client = client
+        self.collection = collection
+        self.filters = filters
+
+    def document(self, id):
+        return FakeDocument(self.client, self.collection, id)
+
+    def where(self, field, op, value):
+        return FakeQuery(self.client, self.collection, self.filters + ((field, value),))
+
+    def stream(self, transaction=None):
+        self.client.reads.append((self.collection, transaction is not None))
+        docs = [FakeSnapshot(data) for data in self.client.store.get(self.collection, {}).values()
+                if all(data.get(field) == value for field, value in self.filters)]
+        if not self.client.is_async:
+            return iter(docs)
+
+        async def _stream():
+            for doc in docs:
+                yield doc
+        return _stream()
+
+class FakeWrites:
+    """Batch ou transação: as escritas só são aplicadas no commit, todas ou nenhuma."""
+
+    def __init__(self, client):
+        self.client = client
+        self.writes = []
+
+    def update(self, ref, data):
+        self.writes.append(("update", ref, data))
+
+    def set(self, ref, data, merge=False):
+        self.writes.append(("set", ref, data))
+
+    def apply(self):
+        store = self.client.store
+        for kind, ref, _ in self.writes:
+            if kind == "update" and ref.id not in store.get(ref.collection, {}):
+                raise NotFound(ref.id)
+        for kind, ref, data in self.writes:
+            documents = store.setdefault(ref.collection, {})
+            documents[ref.id] = {**documents[ref.id], **data} if kind == "update" else dict(data)
+        self.client.commits += 1
+
+    def commit(self):
+        self.apply()
+        return self.client.result(None)
+
+class FakeClient:
+    def __init__(self, store, is_async=False):
+        self.store = store
+        self.is_async = is_async
+        self.commits = 0
+        self.reads = []
+
+    def result(self, value):
+        if not self.is_async:
+            return value
+
+        async def _result():
+            return value
+        return _result()
+
+    def collection(self, name):
+        return FakeQuery(self, name)
+
+    def batch(self):
+        return FakeWrites(self)
+
+    def transaction(self):
+        return FakeWrites(self)
+
+@pytest.fixture
+def store(monkeypatch):
+    def transactional(function):
+        def run(transaction):
+            function(transaction)
+            transaction.apply()
+        return run
+
+    def async_transactional(function):
+        async def run(transaction):
+            await function(transaction)
+            transaction.apply()
+        return run
+
+    monkeypatch.setattr(firebase.firestore, "transactional", transactional)
+    monkeypatch.setattr(firebase.firestore, "async_transactional", async_transactional)
+    return {"chats": {"c1": dict(CHAT)}}
+
+@pytest.fixture
+def database(store):
+    database = object.__new__(FirebaseDB)
+    database.db = FakeClient(store)
+    database.user_cache = TTLCache(16, 60)
+    database.chat_cache = TTLCache(16, 60)
+    database.hot_chats = None
+    return database
+
+@pytest.fixture
+def async_database(database, store):
+    async_database = object.__new__(AsyncFirebaseDB)
+    async_database.database = database
+    async_database.db = FakeClient(store, is_async=True)
+    return async_database
+
+def message(index: int) -> Message:
+    return Message(
+        message_index=index, paint_image=f"gato {index}", text_voice=f"Parte {index}", intro_voice="Desenhe",
+        scene_image_description="Um gato", image=f"{index}.png", audio=f"{index}.wav"
+    )
+
+def test_message_and_context_in_one_commit(database, store):
+    database.update_chat("u1", "c1", "messages", message(0))
+    database.update_chat("u1", "c1", "messages", message(1))
+
+    assert database.db.commits == 2
+    assert store["chat_contexts"]["c1"]["history"] == "Parte 0\nParte 1"
+    assert store["chat_contexts"]["c1"]["last_index"] == 1
+    assert store["chats"]["c1"]["last_update"] != CHAT["last_update"]
+    assert len(store["messages"]) == 2
+
+def test_missing_context_is_rebuilt_in_the_same_transaction(database, store):
+    # Chat anterior à coleção de contexto, ou com uma mensagem que nunca chegou ao contexto
+    store["messages"] = {"m0": {**message(0).model_dump(), "chat_id": "c1"}, "m1": {**message(1).model_dump(), "chat_id": "c1"}}
+    store["chat_contexts"] = {"c1": {"history": "Parte 0", "painted_items": "gato 0", "last_image": "0.png", "last_index": 0}}
+
+    database.update_chat("u1", "c1", "messages", message(2))
+
+    assert database.db.commits == 1
+    assert store["chat_contexts"]["c1"]["history"] == "Parte 0\nParte 1\nParte 2"
+    # As leituras do contexto e das mensagens fazem parte da transação
+    assert all(in_transaction for collection, in_transaction in database.db.reads if collection != "chats")
+
+def test_submit_is_a_single_batch(database, store):
+    submit = SubmitImageMessage(message_index=0, audio="f.wav", data=SubmitImageResponse(is_correct=True, feedback="Muito bem!"))
+    database.update_chat("u1", "c1", "submits", submit)
+
+    assert database.db.commits == 1
+    assert "chat_contexts" not in store
+
+def test_removed_chat_writes_nothing(database, store):
+    database.assert_chat_exists("c1", "u1")
+    del store["chats"]["c1"]
+
+    with pytest.raises(HTTPException) as error:
+        database.update_chat("u1", "c1", "messages", message(0))
+    assert error.value.status_code == 404
+    assert "messages" not in store and "chat_contexts" not in store
+
+def test_async_message_and_context_in_one_commit(async_database, store):
+    async def _update():
+        await async_database.update_chat("u1", "c1", "messages", message(0))
+        await async_database.update_chat("u1", "c1", "messages", message(1))
+
+    asyncio.run(_update())
+    assert async_database.db.commits == 2
+    assert store["chat_contexts"]["c1"]["history"] == "Parte 0\nParte 1"
@@ -0,0 +1,83 @@
+import json
+import os
+
+import pytest
+
+from api.database.journal import Journal
+from api.database.local import save_json, write_atomic
+
+@pytest.fixture
+def journal_path(tmp_path):
+    return str(tmp_path / "journal.jsonl")
+
+def test_replay_returns_records_after_a_crash(journal_path):
+    journal = Journal(journal_path)
+    for index in range(3):
+        journal.append({"op": "set", "index": index})
+    # Crash: o processo morre sem close(), com o buffer já enviado ao sistema operacional
+    journal._file.flush()
+
+    reopened = Journal(journal_path)
+    assert [record["index"] for record in reopened.replay()] == [0, 1, 2]
+    assert reopened.pending_records == 3
+    reopened.close()
+    journal.close()
+
+def test_replay_ignores_a_torn_last_line(journal_path):
+    journal = Journal(journal_path)
+    journal.append({"op": "set", "index": 0})
+    journal.close()
+    with open(journal_path, "a", encoding="utf-8") as f:
+        f.write('{"op": "set", "ind')
+
+    reopened = Journal(journal_path)
+    assert list(reopened.replay()) == [{"op": "set", "index": 0}]
+    assert reopened.pending_records == 1
+    reopened.close()
+
+def test_compaction_threshold_and_truncate(journal_path):
+    journal = Journal(journal_path, compact_every=2)
+    journal.append({"index": 0})
+    assert not journal.should_compact()
+    journal.append({"index": 1})
+    assert journal.should_compact()
+
+    journal.truncate()
+    assert journal.pending_records == 0
+    assert os.path.getsize(journal_path) == 0
+
+    # Depois de truncado, o journal continua recebendo registros
+    journal.append({"index": 2})
+    journal.close()
+    assert list(Journal(journal_path).replay()) == [{"index": 2}]
+
+def test_compact_every_zero_never_compacts(journal_path):
+    journal = Journal(journal_path, compact_every=0)
+    for index in range(10):
+        journal.append({"index": index}, flush=False)
+    assert not journal.should_compact()
+    journal.close()
+
+def test_save_json_replaces_the_file_without_leftovers(tmp_path):
+    file_path = str(tmp_path / "users.json")
+    save_json(file_path, {"u1": {"name": "Ana"}})
+    save_json(file_path, {"u2": {"name": "Bia"}}, fsync=True)
+
+    with open(file_path) as f:
+        assert json.load(f) == {"u2": {"name": "Bia"}}
+    assert os.listdir(tmp_path) == ["users.json"]
+
+def test_write_atomic_keeps_the_old_file_when_the_rename_fails(tmp_path, monkeypatch):
+    file_path = str(tmp_path / "chats.json")
+    write_atomic(file_path, '{"old": true}')
+
+    def _replace(src, dst):
+        raise OSError("disco cheio")
+
+    monkeypatch.setattr(os, "replace", _replace)
+    with pytest.raises(OSError):
+        write_atomic(file_path, '{"new": true}')
+
+    # O snapshot anterior continua inteiro; só o temporário ficou para trás
+    with open(file_path) as f:
+        assert json.load(f) == {"old": True}
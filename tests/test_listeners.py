@@ -0,0 +1,62 @@
+import threading
+import time
+
+from api.database.listeners import HotChatCache
+
+class FakeWatch:
+    def __init__(self, client):
+        self.client = client
+
+    def unsubscribe(self):
+        self.client.unsubscribed.append(threading.current_thread().name)
+
+class FakeQuery:
+    def __init__(self, client):
+        self.client = client
+
+    def document(self, *args):
+        return self
+
+    def where(self, *args):
+        return self
+
+    def on_snapshot(self, callback):
+        self.client.subscribed.append(threading.current_thread().name)
+        return FakeWatch(self.client)
+
+class FakeClient:
+    def __init__(self):
+        self.subscribed = []
+        self.unsubscribed = []
+
+    def collection(self, name):
+        return FakeQuery(self)
+
+def wait_until(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+def test_miss_subscribes_off_the_calling_thread():
+    client = FakeClient()
+    cache = HotChatCache(client)
+    try:
+        assert cache.get("c1") is None
+        assert cache.get_items("c1") is None
+        wait_until(lambda: len(client.subscribed) == 3)
+        assert set(client.subscribed) == {"hot-chats"}
+    finally:
+        cache.close()
+
+def test_sweep_unsubscribes_idle_chats():
+    client = FakeClient()
+    cache = HotChatCache(client, idle_minutes=0.1 / 60, sweep_seconds=0.05)
+    try:
+        cache.get("c1")
+        # Sem novos acessos, a varredura periódica encerra os listeners sozinha
+        wait_until(lambda: len(client.unsubscribed) == 3)
+        assert set(client.unsubscribed) == {"hot-chats"}
+        assert cache.stats()["chats"] == 0
+    finally:
+        cache.close()
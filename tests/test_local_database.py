@@ -0,0 +1,191 @@
+import os
+import threading
+
+import pytest
+
+import api.database.local as local
+from api.database.context import build_context
+from api.database.local import LocalDatabase
+from api.schemas.messages import Message, MiniChatBase
+from api.schemas.users import CreateUser
+
+@pytest.fixture
+def open_db(monkeypatch, tmp_path):
+    """Abre LocalDatabases com as opções dadas, todos gravando em tmp_path/temp."""
+    monkeypatch.chdir(tmp_path)
+    opened = []
+
+    def _open(**options) -> LocalDatabase:
+        for key, value in {"save_local": True, "flush_mode": "sync", "fsync": "none", **options}.items():
+            monkeypatch.setitem(local.database_configs, key, value)
+        database = LocalDatabase()
+        opened.append(database)
+        return database
+
+    yield _open
+    for database in opened:
+        database.close()
+
+def new_chat(database: LocalDatabase, user_id: str = "u1", title: str = "Gato") -> str:
+    chat = MiniChatBase(title=title, chat_image="🐱", voice_name="Kore", last_update="2026-01-01T00:00:00+00:00")
+    return database.save_chat(user_id, chat).chat_id
+
+def message(index: int) -> Message:
+    return Message(
+        message_index=index, paint_image=f"gato {index}", text_voice=f"Era uma vez {index}", intro_voice="Desenhe",
+        scene_image_description="Um gato", image=f"temp/archives/{index}.png", audio=f"temp/archives/{index}.wav"
+    )
+
+def test_sharded_write_touches_only_the_changed_chat(open_db):
+    database = open_db(local_storage="sharded", compact_every=500)
+    database.create_user(CreateUser(name="Ana"), "u1")
+    first = new_chat(database)
+    second = new_chat(database, title="Cachorro")
+    users_mtime = os.path.getmtime("temp/users.json")
+    first_mtime = os.path.getmtime(f"temp/chats/{first}.json")
+
+    database.update_chat("u1", second, "messages", message(0))
+
+    # Sem reescrever o índice, os usuários nem os outros chats: só o chat e uma linha no journal do índice
+    assert not os.path.exists("temp/chats_index.json")
+    assert os.path.getmtime("temp/users.json") == users_mtime
+    assert os.path.getmtime(f"temp/chats/{first}.json") == first_mtime
+    with open("temp/chats_index.jsonl") as f:
+        assert len(f.readlines()) == 3
+
+def test_sharded_index_survives_reopen_and_compaction(open_db):
+    database = open_db(local_storage="sharded", compact_every=4)
+    database.create_user(CreateUser(name="Ana"), "u1")
+    chat_ids = [new_chat(database, title=f"Chat {i}") for i in range(3)]
+    database.update_chat("u1", chat_ids[0], "messages", message(0))
+    database.close()
+
+    # A quarta entrada atingiu compact_every: índice completo gravado e journal zerado
+    assert os.path.exists("temp/chats_index.json")
+    assert os.path.getsize("temp/chats_index.jsonl") == 0
+
+    reopened = open_db(local_storage="sharded", compact_every=4)
+    page = reopened.get_user_chats("u1")
+    assert [chat.chat_id for chat in page.chats][0] == chat_ids[0]
+    assert set(chat.chat_id for chat in page.chats) == set(chat_ids)
+    assert reopened.get_chat(chat_ids[0], "u1").messages[0].message_index == 0
+
+@pytest.fixture
+def fsyncs(monkeypatch):
+    calls = []
+    real_fsync = os.fsync
+
+    def _fsync(fd):
+        calls.append(fd)
+        real_fsync(fd)
+
+    monkeypatch.setattr(os, "fsync", _fsync)
+    return calls
+
+@pytest.mark.parametrize("flush_mode", ["sync", "background"])
+@pytest.mark.parametrize("storage", ["json", "journal", "sharded"])
+def test_fsync_always_before_write_returns(open_db, fsyncs, flush_mode, storage):
+    database = open_db(local_storage=storage, flush_mode=flush_mode, fsync="always", flush_interval=60)
+    database.create_user(CreateUser(name="Ana"), "u1")
+    fsyncs.clear()
+
+    new_chat(database)
+    assert fsyncs
+
+@pytest.mark.parametrize("flush_mode", ["sync", "background"])
+@pytest.mark.parametrize("storage", ["json", "journal", "sharded"])
+def test_fsync_interval_defers_to_the_background(open_db, fsyncs, flush_mode, storage):
+    database = open_db(local_storage=storage, flush_mode=flush_mode, fsync="interval", flush_interval=60)
+    database.create_user(CreateUser(name="Ana"), "u1")
+    new_chat(database)
+    assert not fsyncs
+
+    # O fsync fica para o ciclo em background (aqui, o último, feito no close)
+    database.close()
+    assert fsyncs
+
+def test_journal_replays_after_a_crash(open_db):
+    database = open_db(local_storage="journal", compact_every=500)
+    database.create_user(CreateUser(name="Ana"), "u1")
+    chat_id = new_chat(database)
+    database.update_chat("u1", chat_id, "messages", message(0))
+    database.update_chat("u1", chat_id, "messages", message(1))
+    # Crash durante a próxima escrita: a última linha do journal ficou pela metade
+    with open("temp/journal.jsonl", "a", encoding="utf-8") as f:
+        f.write('{"op": "update_chat", "chat_id": "')
+    assert not os.path.exists("temp/chats.json")
+
+    reopened = open_db(local_storage="journal", compact_every=500)
+    chat = reopened.get_chat(chat_id, "u1")
+    assert [item.message_index for item in chat.messages] == [0, 1]
+    assert reopened.get_user("u1").name == "Ana"
+    # O replay é consolidado em um snapshot e o journal recomeça vazio
+    assert os.path.exists("temp/chats.json")
+    assert os.path.getsize("temp/journal.jsonl") == 0
+
+def test_journal_compaction_keeps_later_writes(open_db):
+    database = open_db(local_storage="journal", compact_every=3)
+    database.create_user(CreateUser(name="Ana"), "u1")
+    chat_id = new_chat(database)
+    database.update_chat("u1", chat_id, "messages", message(0))
+    # O terceiro registro gerou o snapshot; o próximo vai para um journal novo
+    assert os.path.getsize("temp/journal.jsonl") == 0
+    database.update_chat("u1", chat_id, "messages", message(1))
+    database.close()
+
+    with open("temp/journal.jsonl") as f:
+        assert len(f.readlines()) == 1
+    reopened = open_db(local_storage="journal", compact_every=3)
+    assert [item.message_index for item in reopened.get_chat(chat_id, "u1").messages] == [0, 1]
+
+@pytest.mark.parametrize("storage", ["json", "journal", "sharded"])
+def test_concurrent_writers_keep_every_message(open_db, storage):
+    database = open_db(local_storage=storage, compact_every=50)
+    database.create_user(CreateUser(name="Ana"), "u1")
+    chat_ids = [new_chat(database, title=f"Chat {i}") for i in range(4)]
+    writes_per_thread = 10
+    errors = []
+
+    def writer(thread_index: int) -> None:
+        # Três threads por chat, cada uma com seus próprios índices, lendo o contexto entre as escritas
+        chat_id = chat_ids[thread_index % 4]
+        offset = thread_index // 4
+        try:
+            for step in range(writes_per_thread):
+                database.update_chat("u1", chat_id, "messages", message(step * 3 + offset))
+                database.get_chat_items(chat_id)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=writer, args=(index,)) for index in range(12)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+
+    def check(database: LocalDatabase) -> None:
+        for chat_id in chat_ids:
+            messages = database.get_chat(chat_id, "u1").messages
+            assert sorted(item.message_index for item in messages) == list(range(3 * writes_per_thread))
+            items = database.get_chat_items(chat_id)
+            expected = build_context([item.model_dump() for item in messages])
+            assert items.history == expected["history"]
+            assert items.painted_items == expected["painted_items"]
+
+    check(database)
+    database.close()
+    check(open_db(local_storage=storage, compact_every=50))
+
+def test_journal_record_for_a_missing_chat_is_skipped(open_db):
+    database = open_db(local_storage="journal", compact_every=500)
+    database.create_user(CreateUser(name="Ana"), "u1")
+    chat_id = new_chat(database)
+    database.close()
+    # Journal truncado: a atualização sobreviveu, mas a criação do chat não
+    with open("temp/journal.jsonl", "a", encoding="utf-8") as f:
+        f.write('{"op": "update_chat", "chat_id": "lost", "target": "messages", "item": {}, "last_update": "2026-01-01T00:00:00+00:00", "position": 0}\n')
+
+    reopened = open_db(local_storage="journal", compact_every=500)
+    assert reopened.get_chat(chat_id, "u1").chat_id == chat_id
+    assert "lost" not in reopened.chats
@@ -0,0 +1,123 @@
+import threading
+import time
+
+import pytest
+
+from api.services.prefetch import INTERACTIVE, PREFETCH, JobScheduler
+
+@pytest.fixture
+def scheduler():
+    scheduler = JobScheduler(workers=1)
+    yield scheduler
+    scheduler.stop(timeout=5)
+
+def blocker(scheduler: JobScheduler, key=("message", "bloqueio", 0), priority=INTERACTIVE) -> threading.Event:
+    """Ocupa um worker até o evento retornado ser liberado."""
+    release = threading.Event()
+    started = threading.Event()
+
+    def _block(job):
+        started.set()
+        release.wait(5)
+
+    scheduler.submit(key, _block, priority)
+    assert started.wait(5)
+    return release
+
+def recorder(order: list, name: str):
+    def _record(job):
+        order.append(name)
+        return name
+    return _record
+
+def test_interactive_runs_before_queued_prefetch(scheduler):
+    release = blocker(scheduler)
+    order = []
+    prefetch = scheduler.submit(("prefetch", "c1", 1), recorder(order, "prefetch"), PREFETCH)
+    interactive = scheduler.submit(("message", "c2", 1), recorder(order, "interactive"), INTERACTIVE)
+
+    release.set()
+    assert prefetch.result(5) == "prefetch"
+    assert interactive.result(5) == "interactive"
+    assert order == ["interactive", "prefetch"]
+
+def test_duplicate_key_shares_future(scheduler):
+    release = blocker(scheduler)
+    calls = []
+    first = scheduler.submit(("prefetch", "c1", 1), recorder(calls, "a"), PREFETCH)
+    second = scheduler.submit(("prefetch", "c1", 1), recorder(calls, "b"), PREFETCH)
+
+    release.set()
+    assert first is second
+    assert first.result(5) == "a"
+    assert calls == ["a"]
+    assert scheduler.stats()["deduplicated"] == 1
+
+def test_duplicate_with_higher_priority_promotes_job(scheduler):
+    release = blocker(scheduler)
+    order = []
+    first = scheduler.submit(("prefetch", "c1", 1), recorder(order, "c1"), PREFETCH)
+    promoted = scheduler.submit(("prefetch", "c2", 1), recorder(order, "c2"), PREFETCH)
+    assert scheduler.submit(("prefetch", "c2", 1), recorder(order, "c2"), INTERACTIVE) is promoted
+
+    release.set()
+    first.result(5)
+    promoted.result(5)
+    assert order == ["c2", "c1"]
+
+def test_prefetch_leaves_a_worker_free():
+    scheduler = JobScheduler(workers=2, max_prefetch=1)
+    try:
+        release = blocker(scheduler, ("prefetch", "c1", 1), PREFETCH)
+        waiting = scheduler.submit(("prefetch", "c2", 1), lambda job: "c2", PREFETCH)
+        time.sleep(0.1)
+        # O segundo worker está livre, mas não pega outra pré-geração
+        assert not waiting.done()
+        assert scheduler.submit(("message", "c3", 1), lambda job: "c3", INTERACTIVE).result(5) == "c3"
+        assert not waiting.done()
+
+        release.set()
+        assert waiting.result(5) == "c2"
+    finally:
+        scheduler.stop(timeout=5)
+
+def test_cancel_drops_queued_and_marks_running(scheduler):
+    started = threading.Event()
+    release = threading.Event()
+    jobs = []
+
+    def _running(job):
+        jobs.append(job)
+        started.set()
+        release.wait(5)
+        return "descartado" if job.cancelled else "salvo"
+
+    running = scheduler.submit(("prefetch", "c1", 1), _running, PREFETCH)
+    assert started.wait(5)
+    queued = scheduler.submit(("prefetch", "c1", 2), lambda job: "c1", PREFETCH)
+    other = scheduler.submit(("prefetch", "c2", 1), lambda job: "c2", PREFETCH)
+
+    assert scheduler.cancel("c1", before_index=3) == 2
+    assert queued.cancelled()
+    release.set()
+    assert running.result(5) == "descartado"
+    assert other.result(5) == "c2"
+
+def test_stop_waits_for_running_jobs():
+    scheduler = JobScheduler(workers=1)
+    finished = threading.Event()
+    started = threading.Event()
+
+    def _slow(job):
+        started.set()
+        time.sleep(0.2)
+        finished.set()
+
+    scheduler.submit(("message", "c1", 1), _slow, INTERACTIVE)
+    queued = scheduler.submit(("prefetch", "c1", 2), lambda job: None, PREFETCH)
+    assert started.wait(5)
+    scheduler.stop(timeout=5)
+
+    assert finished.is_set()
+    assert queued.cancelled()
+    assert not any(thread.is_alive() for thread in scheduler.threads)
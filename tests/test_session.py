@@ -0,0 +1,145 @@
+import asyncio
+import base64
+
+import pytest
+from fastapi import HTTPException, WebSocketDisconnect
+
+# A sessão importa os modelos de IA; sem os SDKs instalados os testes são pulados
+pytest.importorskip("openai")
+pytest.importorskip("google.genai")
+
+import api.services.session as session
+from api.schemas.llm import SubmitImageResponse
+from api.schemas.messages import Chat, Message, SubmitImageMessage
+
+CHAT_ID = "chat-1"
+USER_ID = "u1"
+
+def message(index: int) -> Message:
+    return Message(
+        message_index=index, paint_image="gato", text_voice="Era uma vez", intro_voice="Desenhe",
+        scene_image_description="Um gato", image=f"{index}.png", audio=f"{index}.wav"
+    )
+
+class FakeDatabase:
+    def __init__(self, pending: dict | None = None) -> None:
+        self.pending = pending
+        self.updates: list[tuple[str, int]] = []
+
+    async def get_chat(self, chat_id: str, user_id: str) -> Chat:
+        if user_id != USER_ID:
+            raise HTTPException(status_code=403, detail="Unauthorized access")
+        return Chat(
+            chat_id=chat_id, title="Gato", chat_image="🐱", voice_name="Kore",
+            last_update="2026-01-01T00:00:00+00:00", messages=[message(0)], subimits=[]
+        )
+
+    async def store_user_archive(self, user_id, file) -> str:
+        return "drawing.jpg"
+
+    async def pop_pending_message(self, chat_id: str):
+        pending, self.pending = self.pending, None
+        return pending
+
+    async def update_chat(self, user_id, chat_id, target, item) -> None:
+        await asyncio.sleep(0)
+        self.updates.append((target, item.message_index))
+
+class FakeWebSocket:
+    """Cliente que autentica, envia as mensagens dadas e desconecta (ao receber o done, se `wait_done`)."""
+
+    def __init__(self, frames: list[dict], fail_sends: bool = False, wait_done: bool = True) -> None:
+        self.frames = [{"type": "auth", "token": "token"}, *frames]
+        self.fail_sends = fail_sends
+        self.wait_done = wait_done
+        self.done = asyncio.Event()
+        self.sent: list[dict] = []
+
+    async def accept(self) -> None:
+        pass
+
+    async def receive_json(self) -> dict:
+        if not self.frames:
+            if self.wait_done:
+                await self.done.wait()
+            raise WebSocketDisconnect()
+        return self.frames.pop(0)
+
+    async def send_json(self, data: dict) -> None:
+        if self.fail_sends and data.get("type") != "ready":
+            raise RuntimeError('Cannot call "send" once a close message has been sent.')
+        self.sent.append(data)
+        if data.get("type") == "done":
+            self.done.set()
+
+    async def close(self) -> None:
+        pass
+
+@pytest.fixture
+def fake_db(monkeypatch):
+    database = FakeDatabase(pending=message(1).model_dump())
+    prefetched: list[int] = []
+
+    async def submit_image(chat_id, target, image_file, user_id):
+        return SubmitImageResponse(is_correct=True, feedback="Muito bem!")
+
+    async def generate_feedback_audio(result, feedback_audio, user_id, chat_id, message_id, image=None):
+        await database.update_chat(user_id, chat_id, "submits", SubmitImageMessage(
+            message_index=message_id, audio="feedback.wav", data=result, image=image
+        ))
+        return SubmitImageMessage(message_index=message_id, audio="feedback.wav", data=result, image=image)
+
+    async def wait_prefetch(chat_id, message_index):
+        return False
+
+    monkeypatch.setattr(session, "adb", database)
+    monkeypatch.setattr(session, "submit_image", submit_image)
+    monkeypatch.setattr(session, "generate_feedback_audio", generate_feedback_audio)
+    monkeypatch.setattr(session, "wait_prefetch", wait_prefetch)
+    monkeypatch.setattr(session, "prefetch_message", lambda user_id, chat_id, index: prefetched.append(index))
+    monkeypatch.setattr(session, "verify_token_string", lambda token: USER_ID)
+    database.prefetched = prefetched
+    return database
+
+def submit_frame(request_id: int) -> dict:
+    return {"type": "submit_image", "request_id": request_id, "image_data": base64.b64encode(b"jpeg").decode()}
+
+async def run_session(websocket: FakeWebSocket) -> None:
+    await session.ChatSession(websocket, CHAT_ID).run()
+    # As submissões seguem depois do fim da sessão
+    await asyncio.gather(*session.submissions)
+
+def test_submission_delivers_feedback_and_pending_message(fake_db):
+    websocket = FakeWebSocket([submit_frame(1)])
+    asyncio.run(run_session(websocket))
+
+    assert [frame["type"] for frame in websocket.sent] == ["ready", "feedback", "new_message", "done"]
+    assert all(frame["request_id"] == 1 for frame in websocket.sent[1:])
+    assert fake_db.updates == [("submits", 0), ("messages", 1)]
+    assert fake_db.prefetched == [2]
+
+def test_disconnect_does_not_cancel_the_submission(fake_db):
+    # O cliente desconecta logo depois de enviar o desenho e todo envio falha
+    websocket = FakeWebSocket([submit_frame(1)], fail_sends=True, wait_done=False)
+    asyncio.run(run_session(websocket))
+
+    # A submissão foi até o fim: a próxima mensagem está salva e a seguinte em pré-geração
+    assert fake_db.updates == [("submits", 0), ("messages", 1)]
+    assert fake_db.prefetched == [2]
+
+def test_rejects_submissions_over_the_in_flight_limit(fake_db, monkeypatch):
+    monkeypatch.setitem(session.api_configs, "websocket_max_in_flight", 1)
+    websocket = FakeWebSocket([submit_frame(1), submit_frame(2), {"type": "ping", "request_id": 3}])
+    asyncio.run(run_session(websocket))
+
+    errors = [frame for frame in websocket.sent if frame["type"] == "error"]
+    assert [frame["request_id"] for frame in errors] == [2]
+    assert {"type": "pong", "request_id": 3} in websocket.sent
+
+def test_foreign_chat_reports_the_real_error(fake_db, monkeypatch):
+    monkeypatch.setattr(session, "verify_token_string", lambda token: "u2")
+    websocket = FakeWebSocket([submit_frame(1)])
+    asyncio.run(run_session(websocket))
+
+    assert websocket.sent == [{"type": "error", "status_code": 403, "message": "Unauthorized access"}]
+    assert fake_db.updates == []
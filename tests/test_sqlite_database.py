@@ -0,0 +1,111 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi import HTTPException
+
+import api.database.sqlite as sqlite
+from api.database.sqlite import SQLiteDatabase
+from api.schemas.llm import SubmitImageResponse
+from api.schemas.messages import Message, MiniChatBase, SubmitImageMessage
+from api.schemas.users import CreateUser
+
+@pytest.fixture
+def database(monkeypatch, tmp_path):
+    monkeypatch.setitem(sqlite.database_configs, "sqlite_path", str(tmp_path / "louie.db"))
+    database = SQLiteDatabase()
+    yield database
+    database.close()
+
+def new_chat(database: SQLiteDatabase, user_id: str = "u1", title: str = "Gato", last_update: str = "2026-01-01T00:00:00+00:00") -> str:
+    chat = MiniChatBase(title=title, chat_image="🐱", voice_name="Kore", last_update=last_update)
+    return database.save_chat(user_id, chat).chat_id
+
+def message(index: int) -> Message:
+    return Message(
+        message_index=index, paint_image=f"gato {index}", text_voice=f"Parte {index}", intro_voice="Desenhe",
+        scene_image_description="Um gato", image=f"temp/archives/{index}.png", audio=f"temp/archives/{index}.wav"
+    )
+
+def submit(index: int, is_correct: bool) -> SubmitImageMessage:
+    return SubmitImageMessage(
+        message_index=index, audio=f"temp/archives/feedback_{index}.wav",
+        data=SubmitImageResponse(is_correct=is_correct, feedback="Muito bem!")
+    )
+
+def test_create_user_and_get_chat(database):
+    database.create_user(CreateUser(name="Ana"), "u1")
+    chat_id = new_chat(database)
+    database.update_chat("u1", chat_id, "messages", message(0))
+    database.update_chat("u1", chat_id, "submits", submit(0, False))
+    database.update_chat("u1", chat_id, "submits", submit(0, True))
+
+    user = database.get_user("u1")
+    assert user.name == "Ana"
+    assert [chat.chat_id for chat in user.chats] == [chat_id]
+    assert database.verify_user("u1")
+    assert not database.verify_user("u2")
+
+    chat = database.get_chat(chat_id, "u1")
+    assert [item.message_index for item in chat.messages] == [0]
+    # Só as submissões corretas fazem parte do chat
+    assert [item.data.is_correct for item in chat.subimits] == [True]
+
+def test_get_chat_checks_ownership(database):
+    chat_id = new_chat(database)
+    with pytest.raises(HTTPException) as error:
+        database.get_chat(chat_id, "u2")
+    assert error.value.status_code == 403
+    with pytest.raises(HTTPException) as error:
+        database.get_chat("missing", "u1")
+    assert error.value.status_code == 404
+
+def test_update_chat_checks_ownership(database):
+    chat_id = new_chat(database)
+    with pytest.raises(HTTPException) as error:
+        database.update_chat("u2", chat_id, "messages", message(0))
+    assert error.value.status_code == 403
+    with pytest.raises(HTTPException) as error:
+        database.update_chat("u1", "missing", "messages", message(0))
+    assert error.value.status_code == 404
+    # Nada foi gravado pela escrita recusada
+    assert database.get_chat(chat_id, "u1").messages == []
+
+def test_chat_items_follow_each_message(database):
+    chat_id = new_chat(database)
+    for index in range(3):
+        database.update_chat("u1", chat_id, "messages", message(index))
+
+    items = database.get_chat_items(chat_id)
+    assert items.history == "Parte 0\nParte 1\nParte 2"
+    assert items.painted_items == "gato 0, gato 1, gato 2"
+    assert items.last_image == "temp/archives/2.png"
+
+    # Sem a linha de contexto (chat antigo), o contexto é reconstruído a partir das mensagens
+    with database.connection() as conn:
+        conn.execute("DELETE FROM chat_contexts WHERE chat_id = ?", (chat_id,))
+    assert database.get_chat_items(chat_id) == items
+
+def test_get_user_chats_pages_with_a_cursor(database):
+    chat_ids = [new_chat(database, title=f"Chat {i}", last_update=f"2026-01-0{i + 1}T00:00:00+00:00") for i in range(5)]
+    newest_first = list(reversed(chat_ids))
+
+    pages, cursor = [], None
+    while True:
+        page = database.get_user_chats("u1", 2, cursor)
+        pages.append([chat.chat_id for chat in page.chats])
+        cursor = page.next_cursor
+        if cursor is None:
+            break
+
+    assert pages == [newest_first[:2], newest_first[2:4], newest_first[4:]]
+    assert database.get_user_chats("u2", 2).chats == []
+
+def test_pending_messages_expire_after_the_ttl(database):
+    database.set_pending_message("chat-1", message(1).model_dump())
+    assert database.pop_pending_message("chat-1") == message(1).model_dump()
+    assert database.pop_pending_message("chat-1") is None
+
+    stale = datetime.now(tz=timezone.utc) - timedelta(seconds=database.pending.ttl + 60)
+    database.pending.put("chat-2", message(2).model_dump(), stale)
+    assert database.pop_pending_message("chat-2") is None
+    assert database.pending.stats()["expired"] == 1